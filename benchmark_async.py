@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+DataNexus WSGI vs ASGI Benchmark
+Fires concurrent POSTs at weather/fetch/ while the upstream API is slow
+
+Starts a stub OpenWeather server that answers after --upstream-delay
+seconds, then runs the same load against:
+
+  * WSGI: ``gunicorn datanexus.wsgi:application`` (the Procfile setup,
+    sync workers) hitting the sync ``/api/external/weather/fetch/``
+  * ASGI: ``gunicorn datanexus.asgi:application -k uvicorn.workers.UvicornWorker``
+    hitting the async ``/api/async/external/weather/fetch/``
+
+with the same number of workers, against a throwaway SQLite database.
+
+Usage:
+    python benchmark_async.py [--requests 100] [--concurrency 100]
+                              [--upstream-delay 0.5] [--workers 1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+UPSTREAM_BODY = json.dumps({
+    'name': 'Benchmark City',
+    'sys': {'country': 'US'},
+    'main': {'temp': 21.5, 'feels_like': 20.9, 'humidity': 55, 'pressure': 1013},
+    'weather': [{'description': 'clear sky'}],
+    'wind': {'speed': 3.2},
+    'visibility': 10000,
+}).encode()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_upstream(port, delay):
+    """Run a keep-alive stub of the OpenWeather API in a background thread"""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                if not head:
+                    break
+                await asyncio.sleep(delay)
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n%s' % (len(UPSTREAM_BODY), UPSTREAM_BODY)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+
+
+def start_server(target, port, workers, env, worker_class=None):
+    command = [
+        sys.executable, '-m', 'gunicorn', target,
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--backlog', '4096',
+        '--timeout', '600',
+    ]
+    if worker_class:
+        command += ['--worker-class', worker_class]
+    process = subprocess.Popen(
+        command, env=env, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{target} did not start on port {port}')
+
+
+async def run_load(url, total, concurrency):
+    """POST ``total`` fetches with at most ``concurrency`` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def one(i):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json={'city': f'City {i % 50}'}) as response:
+                        await response.read()
+                        ok = response.status == 201
+                except aiohttp.ClientError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, latencies, failures
+
+
+def report(name, total, elapsed, latencies, failures):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"\n📊 {name}")
+    print(f"   Completed:   {len(latencies)}/{total} ({failures} failed)")
+    print(f"   Wall time:   {elapsed:8.2f} s")
+    print(f"   Throughput:  {len(latencies) / elapsed:8.1f} req/s")
+    if latencies:
+        print(f"   Latency p50: {statistics.median(latencies) * 1000:8.0f} ms")
+        print(f"   Latency p95: {p95 * 1000:8.0f} ms")
+    return len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--upstream-delay', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    start_upstream(upstream_port, args.upstream_delay)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='datanexus.settings',
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'benchmark.sqlite3')}",
+            DEBUG='False',
+            OPENWEATHER_API_KEY='benchmark',
+            OPENWEATHER_BASE_URL=f'http://127.0.0.1:{upstream_port}/data/2.5/weather',
+        )
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+            env=env, cwd=BASE_DIR, check=True,
+        )
+
+        print(f"🚀 {args.requests} fetches, {args.concurrency} concurrent, "
+              f"upstream delay {args.upstream_delay * 1000:.0f} ms, {args.workers} worker(s)")
+
+        setups = [
+            ('WSGI (gunicorn sync workers)', 'datanexus.wsgi:application', None,
+             '/api/external/weather/fetch/'),
+            ('ASGI (gunicorn + uvicorn worker)', 'datanexus.asgi:application',
+             'uvicorn.workers.UvicornWorker', '/api/async/external/weather/fetch/'),
+        ]
+        throughput = []
+        for name, target, worker_class, path in setups:
+            port = free_port()
+            process = start_server(target, port, args.workers, env, worker_class)
+            try:
+                result = asyncio.run(
+                    run_load(f'http://127.0.0.1:{port}{path}', args.requests, args.concurrency)
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            throughput.append(report(name, args.requests, *result))
+
+    if throughput[0]:
+        print(f"\n   ASGI speedup: {throughput[1] / throughput[0]:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
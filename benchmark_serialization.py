@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+DataNexus List Serialization Benchmark
+Compares the ModelSerializer list path against the values() + orjson fast path
+
+Runs against a throwaway SQLite database, checks that both paths return
+byte-identical responses, and reports the speedup.
+
+Usage:
+    python benchmark_serialization.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+
+def setup_django(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'datanexus.settings')
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def seed(rows):
+    """Insert `rows` books and weather records"""
+    import random
+    from django.utils import timezone
+    from books.models import Book
+    from external_api.models import WeatherData
+
+    now = timezone.now()
+    Book.objects.bulk_create([
+        Book(
+            title=f'Benchmark Book {i}',
+            author=f'Author {i % 500}',
+            published_date=(now - timedelta(days=i)).date(),
+            description='A reasonably sized description for a benchmark book. ' * 3,
+            created_at=now - timedelta(seconds=i),
+        )
+        for i in range(rows)
+    ], batch_size=1000)
+    WeatherData.objects.bulk_create([
+        WeatherData(
+            city=f'City {i % 200}',
+            country='US',
+            temperature=round(random.uniform(-10, 35), 1),
+            feels_like=round(random.uniform(-10, 35), 1),
+            humidity=random.randint(30, 90),
+            pressure=random.randint(990, 1030),
+            description='scattered clouds',
+            wind_speed=round(random.uniform(0, 15), 1),
+            visibility=random.randint(5000, 10000),
+            fetched_at=now - timedelta(seconds=i),
+        )
+        for i in range(rows)
+    ], batch_size=1000)
+
+
+def render(view_class, path, rows, fast):
+    """Run one list request through the view and return the response bytes"""
+    from django.test import override_settings
+    from rest_framework.test import APIRequestFactory
+
+    request = APIRequestFactory().get(path, {'page_size': rows})
+    with override_settings(API_FAST_SERIALIZATION=fast, API_MAX_PAGE_SIZE=rows):
+        response = view_class.as_view()(request)
+        response.render()
+    return response.content
+
+
+def benchmark(name, view_class, path, rows, repeat):
+    timings = {}
+    bodies = {}
+    for fast in (False, True):
+        render(view_class, path, rows, fast)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            bodies[fast] = render(view_class, path, rows, fast)
+        timings[fast] = (time.perf_counter() - start) / repeat
+
+    identical = bodies[False] == bodies[True]
+    print(f"\n📊 {name} ({rows} rows, mean of {repeat})")
+    print(f"   ModelSerializer: {timings[False] * 1000:8.1f} ms")
+    print(f"   Fast path:       {timings[True] * 1000:8.1f} ms")
+    print(f"   Speedup:         {timings[False] / timings[True]:8.1f}x")
+    print(f"   Byte-identical:  {'✅ yes' if identical else '❌ NO'}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'benchmark.sqlite3'))
+        seed(args.rows)
+
+        from books.views import BookListCreateView
+        from external_api.views import WeatherDataListView
+
+        results = [
+            benchmark('GET /api/books/', BookListCreateView, '/api/books/', args.rows, args.repeat),
+            benchmark('GET /api/external/weather/', WeatherDataListView,
+                      '/api/external/weather/', args.rows, args.repeat),
+        ]
+
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
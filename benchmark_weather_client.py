@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+DataNexus Weather Client Benchmark
+Compares one-off requests.get calls against the pooled keep-alive session
+
+Runs a local stub of the OpenWeather API and times sequential
+``OpenWeatherService.get_weather_by_city`` calls made the old way (a new
+connection per call through module-level ``requests.get``) and through the
+service's pooled session. --tls serves the stub over HTTPS with a
+throwaway self-signed certificate (needs the ``openssl`` CLI) so the
+handshake the pool saves is included. With --fail-every N the stub answers
+every Nth request with a 503 to show the retries absorbing transient errors.
+
+Usage:
+    python benchmark_weather_client.py [--calls 500] [--tls] [--fail-every 0]
+"""
+
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+UPSTREAM_BODY = json.dumps({
+    'name': 'Benchmark City',
+    'sys': {'country': 'US'},
+    'main': {'temp': 21.5, 'feels_like': 20.9, 'humidity': 55, 'pressure': 1013},
+    'weather': [{'description': 'clear sky'}],
+    'wind': {'speed': 3.2},
+    'visibility': 10000,
+}).encode()
+
+
+def make_certificate(directory):
+    """Create a self-signed certificate for 127.0.0.1; returns (cert, key) paths"""
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+        '-keyout', key, '-out', cert,
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+def start_upstream(fail_every, certificate=None):
+    """Serve a keep-alive OpenWeather stub on a free port in a background thread"""
+    counter = {'requests': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Send each response in one segment so keep-alive isn't stalled by Nagle
+        wbufsize = 64 * 1024
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            with lock:
+                counter['requests'] += 1
+                fail = fail_every and counter['requests'] % fail_every == 0
+            body = b'{"message": "unavailable"}' if fail else UPSTREAM_BODY
+            self.send_response(503 if fail else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counter
+
+
+def setup_django(base_url):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'datanexus.settings')
+    os.environ['OPENWEATHER_API_KEY'] = 'benchmark'
+    os.environ['OPENWEATHER_BASE_URL'] = base_url
+    os.environ['OPENWEATHER_BACKOFF_FACTOR'] = '0.01'
+
+    import django
+    django.setup()
+
+
+def run(calls, pooled):
+    """Time ``calls`` sequential lookups; returns (latencies, failures)"""
+    import requests
+    from external_api.services import OpenWeatherService
+
+    service = OpenWeatherService()
+    latencies = []
+    failures = 0
+
+    # The pre-pooling client: a fresh connection and no retries on every call
+    patch = None if pooled else mock.patch(
+        'external_api.services.get_http_session', return_value=requests
+    )
+    if patch:
+        patch.start()
+    try:
+        service.get_weather_by_city('Warmup')
+        for i in range(calls):
+            start = time.perf_counter()
+            data = service.get_weather_by_city(f'City {i}')
+            latencies.append(time.perf_counter() - start)
+            if data is None:
+                failures += 1
+    finally:
+        if patch:
+            patch.stop()
+    return latencies, failures
+
+
+def report(name, calls, latencies, failures):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    mean = statistics.mean(latencies)
+    print(f"\n📊 {name} ({calls} sequential calls)")
+    print(f"   Mean:     {mean * 1000:8.2f} ms")
+    print(f"   p50:      {statistics.median(latencies) * 1000:8.2f} ms")
+    print(f"   p95:      {p95 * 1000:8.2f} ms")
+    print(f"   Failed:   {failures:8d}")
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--tls', action='store_true')
+    parser.add_argument('--fail-every', type=int, default=0)
+    args = parser.parse_args()
+
+    certificate = None
+    cert_dir = tempfile.TemporaryDirectory()
+    if args.tls:
+        certificate = make_certificate(cert_dir.name)
+        # Trusted by both requests.get and the pooled session
+        os.environ['REQUESTS_CA_BUNDLE'] = certificate[0]
+    server, _ = start_upstream(args.fail_every, certificate)
+    scheme = 'https' if args.tls else 'http'
+    setup_django(f'{scheme}://127.0.0.1:{server.server_port}/data/2.5/weather')
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    before = report('requests.get per call', args.calls, *run(args.calls, pooled=False))
+    after = report('Pooled session', args.calls, *run(args.calls, pooled=True))
+    print(f"\n   Per-call speedup: {before / after:.1f}x")
+
+    server.shutdown()
+    cert_dir.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
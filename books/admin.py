@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Book
+from .search import search_books
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
@@ -8,3 +9,9 @@ class BookAdmin(admin.ModelAdmin):
     search_fields = ('title', 'author', 'description')
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-created_at',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans over search_fields
+        if not search_term:
+            return queryset, False
+        return search_books(queryset, search_term), False
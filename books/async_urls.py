@@ -0,0 +1,9 @@
+from django.urls import path
+from . import async_views
+
+app_name = 'books_async'
+
+urlpatterns = [
+    path('', async_views.book_list, name='book-list'),
+    path('<int:pk>/', async_views.book_detail, name='book-detail'),
+]
@@ -0,0 +1,53 @@
+"""
+Async (ASGI) versions of the book read endpoints
+
+Same filters, pagination, validators and JSON bytes as the DRF views in
+``books.views``; the queries run on the async ORM. JSON only - use the
+regular endpoints for the browsable API and for writes.
+"""
+
+from django.http import Http404, HttpResponse
+from datanexus.asyncviews import async_api_view, bind_view, json_response
+from datanexus.conditional import async_conditional_get, atable_state
+from .cache import aget_cached_detail, aset_cached_detail
+from .models import Book
+from .serializers import BookSerializer
+from .views import BookListCreateView
+
+async def abook_list_state(request, *args, **kwargs):
+    return await atable_state(Book.objects.all(), 'updated_at')
+
+async def abook_detail_state(request, pk, *args, **kwargs):
+    updated_at = await Book.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+    return (updated_at, pk) if updated_at else None
+
+@async_api_view(['GET'])
+@async_conditional_get(abook_list_state)
+async def book_list(request):
+    """
+    Async ``GET /api/books/`` (accepts the same query parameters)
+    """
+    view = bind_view(BookListCreateView, request)
+    return json_response(await view.alist(request))
+
+@async_api_view(['GET'])
+@async_conditional_get(abook_detail_state)
+async def book_detail(request, pk):
+    """
+    Async ``GET /api/books/<pk>/``, sharing the detail response cache
+    """
+    state = request._conditional_state
+    if state is None:
+        raise Http404
+
+    updated_at, pk = state
+    content = await aget_cached_detail(pk, updated_at)
+    if content is None:
+        try:
+            book = await Book.objects.aget(pk=pk)
+        except Book.DoesNotExist:
+            raise Http404
+        content = json_response(BookSerializer(book).data).content
+        await aset_cached_detail(pk, updated_at, content)
+
+    return HttpResponse(content, content_type='application/json')
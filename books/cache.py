@@ -0,0 +1,50 @@
+"""
+Read-through cache of rendered ``BookDetailView`` JSON.
+
+Entries live in the ``api`` cache under ``book-detail:<pk>`` and hold the
+book's ``updated_at`` stamp next to the response bytes, so an entry written
+by a request that raced with an update is detected and replaced instead of
+being served. Receivers in ``books.signals`` evict entries on writes.
+"""
+
+from django.core.cache import caches
+
+# Bump when the detail representation changes to orphan old entries
+CACHE_VERSION = 1
+
+
+def _key(pk):
+    return f'book-detail:{pk}'
+
+
+def _content(entry, updated_at):
+    if entry is None:
+        return None
+    stamp, content = entry
+    return content if stamp == updated_at.isoformat() else None
+
+
+def get_cached_detail(pk, updated_at):
+    """
+    Return cached response bytes for this version of the book, or None
+    """
+    return _content(caches['api'].get(_key(pk), version=CACHE_VERSION), updated_at)
+
+
+async def aget_cached_detail(pk, updated_at):
+    """
+    Async ``get_cached_detail``
+    """
+    return _content(await caches['api'].aget(_key(pk), version=CACHE_VERSION), updated_at)
+
+
+def set_cached_detail(pk, updated_at, content):
+    caches['api'].set(_key(pk), (updated_at.isoformat(), content), version=CACHE_VERSION)
+
+
+async def aset_cached_detail(pk, updated_at, content):
+    await caches['api'].aset(_key(pk), (updated_at.isoformat(), content), version=CACHE_VERSION)
+
+
+def evict_details(pks):
+    caches['api'].delete_many([_key(pk) for pk in pks], version=CACHE_VERSION)
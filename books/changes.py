@@ -0,0 +1,157 @@
+"""
+Delta-sync change feed over the ``BookChange`` log.
+
+Clients pass back the opaque ``next`` token as ``since`` and receive only
+the books written or deleted after it, newest state per book. Sequence
+numbers are allocated when a row is inserted but become visible at commit,
+so a gap in ``seq`` may be a transaction that has not committed yet. The
+feed stops at a gap while it may still be filled, so no change is ever
+skipped, however long the writing transaction runs:
+
+* PostgreSQL: while another transaction that started before the entry
+  after the gap still holds a write lock on the log table;
+* SQLite: never, as writers are serialized and commit in ``seq`` order;
+* elsewhere: until the gap is older than ``CHANGE_FEED_GAP_TIMEOUT``.
+"""
+
+import base64
+import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Book, BookChange
+from .serializers import BookSerializer
+
+
+class InvalidToken(ValueError):
+    """
+    Raised when a ``since`` token cannot be decoded
+    """
+
+
+# Largest value of the 64-bit ``seq`` column
+MAX_SEQ = 2 ** 63 - 1
+
+
+def encode_token(seq):
+    return base64.urlsafe_b64encode(f'seq:{seq}'.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    if not token:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        prefix, seq = raw.split(':')
+        if prefix != 'seq':
+            raise ValueError(raw)
+        seq = int(seq)
+        if not 0 <= seq <= MAX_SEQ:
+            raise ValueError(raw)
+        return seq
+    except (ValueError, UnicodeError):
+        raise InvalidToken(token)
+
+
+def _open_writers():
+    """
+    ``(last seq allocated, start of the oldest other transaction holding a
+    write lock on the log table or None)`` on PostgreSQL. A holder whose
+    start is hidden from this role counts as older than everything.
+
+    The sequence is read first: every seq up to it was allocated by a
+    transaction that held its lock then, so it either shows up here or has
+    finished by the time the log is read.
+    """
+    table = BookChange._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_sequence_last_value(pg_get_serial_sequence(%s, 'seq'))", [table]
+        )
+        last_seq = cursor.fetchone()[0] or 0
+        cursor.execute(
+            'SELECT bool_or(activity.xact_start IS NULL), min(activity.xact_start) '
+            'FROM pg_locks JOIN pg_stat_activity activity ON activity.pid = pg_locks.pid '
+            "WHERE pg_locks.relation = to_regclass(%s) AND pg_locks.mode = 'RowExclusiveLock' "
+            'AND pg_locks.pid <> pg_backend_pid()',
+            [table],
+        )
+        hidden, oldest = cursor.fetchone()
+    if hidden:
+        oldest = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    return last_seq, oldest
+
+
+def read_changes(since, limit):
+    """
+    Return ``(changes, next_seq, has_more)`` for changes after ``since``
+    """
+    rows = BookChange.objects.filter(seq__gt=since)
+    if connection.vendor == 'postgresql':
+        last_seq, oldest = _open_writers()
+        rows = rows.filter(seq__lte=last_seq)
+        # Written by a transaction that started before the entry after the gap
+        gap_may_fill = lambda row: oldest is not None and oldest < row.changed_at
+    elif connection.vendor == 'sqlite':
+        gap_may_fill = lambda row: False
+    else:
+        cutoff = timezone.now() - datetime.timedelta(seconds=settings.CHANGE_FEED_GAP_TIMEOUT)
+        gap_may_fill = lambda row: row.changed_at > cutoff
+
+    rows = list(rows.order_by('seq')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    stable = []
+    expected = since + 1
+    for row in rows:
+        if row.seq != expected and gap_may_fill(row):
+            # An earlier seq may still commit; resume here next time
+            has_more = True
+            break
+        stable.append(row)
+        expected = row.seq + 1
+
+    # Latest entry per book wins within the page
+    latest = {}
+    for row in stable:
+        latest.pop(row.book_id, None)
+        latest[row.book_id] = row
+
+    books = Book.objects.in_bulk([
+        book_id for book_id, row in latest.items() if row.op == BookChange.UPSERT
+    ])
+    changes = []
+    for book_id, row in latest.items():
+        book = books.get(book_id) if row.op == BookChange.UPSERT else None
+        if book is None:
+            # Deleted after this entry was logged; its tombstone follows
+            changes.append({'seq': row.seq, 'op': BookChange.DELETE, 'id': book_id})
+        else:
+            changes.append({
+                'seq': row.seq,
+                'op': BookChange.UPSERT,
+                'id': book_id,
+                'book': BookSerializer(book).data,
+            })
+
+    next_seq = stable[-1].seq if stable else since
+    return changes, next_seq, has_more
+
+
+def compact_changes(older_than=None):
+    """
+    Delete log entries superseded by a newer entry for the same book.
+
+    Only entries older than the gap timeout are touched, so in-flight
+    readers never see fresh gaps. Returns the number of rows removed.
+    """
+    cutoff = older_than or (
+        timezone.now() - datetime.timedelta(seconds=settings.CHANGE_FEED_GAP_TIMEOUT)
+    )
+    newer = BookChange.objects.filter(book_id=OuterRef('book_id'), seq__gt=OuterRef('seq'))
+    deleted, _ = BookChange.objects.filter(changed_at__lt=cutoff).filter(Exists(newer)).delete()
+    return deleted
@@ -0,0 +1,117 @@
+"""
+Incrementally maintained facet counts for the book catalogue.
+
+``BookFacet`` holds one row per (facet, value) with the number of books
+carrying it. Signal receivers in ``books.signals`` apply +1/-1 deltas as
+books are created, changed and deleted, so reading every facet costs
+O(number of facet values) rather than a scan of the books table.
+"""
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractYear
+
+from .models import Book, BookFacet
+
+FACETS = ('author', 'year')
+
+
+def facet_values(book):
+    """
+    Return the ``(facet, value)`` pairs a book contributes to
+    """
+    published_date = Book._meta.get_field('published_date').to_python(book.published_date)
+    return [('author', book.author), ('year', str(published_date.year))]
+
+
+def count_facets(books):
+    """
+    Sum the facet pairs of ``books`` into a Counter
+    """
+    counts = Counter()
+    for book in books:
+        counts.update(facet_values(book))
+    return counts
+
+
+def apply_facet_deltas(deltas):
+    """
+    Add ``deltas`` ({(facet, value): delta}) to the summary table
+    """
+    emptied = []
+    for (facet, value), delta in deltas.items():
+        if not delta:
+            continue
+        updated = BookFacet.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    BookFacet.objects.create(facet=facet, value=value, count=delta)
+            except IntegrityError:
+                # Another writer created the row first
+                BookFacet.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+        if delta < 0:
+            emptied.append((facet, value))
+
+    for facet, value in emptied:
+        BookFacet.objects.filter(facet=facet, value=value, count__lte=0).delete()
+
+
+def rebuild_facets():
+    """
+    Recompute the summary table from scratch
+    """
+    counts = Counter()
+    for row in Book.objects.values('author').annotate(n=Count('id')).order_by():
+        counts[('author', row['author'])] = row['n']
+    years = Book.objects.annotate(year=ExtractYear('published_date'))
+    for row in years.values('year').annotate(n=Count('id')).order_by():
+        counts[('year', str(row['year']))] = row['n']
+
+    with transaction.atomic():
+        BookFacet.objects.all().delete()
+        BookFacet.objects.bulk_create(
+            [BookFacet(facet=facet, value=value, count=n) for (facet, value), n in counts.items()],
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def _as_output(facet, value):
+    return int(value) if facet == 'year' else value
+
+
+def read_facets(facets=FACETS, limit=None):
+    """
+    Read facet counts from the summary table, most common first
+    """
+    result = {}
+    for facet in facets:
+        rows = BookFacet.objects.filter(facet=facet, count__gt=0).order_by('-count', 'value')
+        if limit:
+            rows = rows[:limit]
+        result[facet] = [
+            {'value': _as_output(facet, value), 'count': count}
+            for value, count in rows.values_list('value', 'count')
+        ]
+    return result
+
+
+def aggregate_facets(queryset, facets=FACETS, limit=None):
+    """
+    Compute facet counts with GROUP BY over an arbitrary (filtered) queryset
+    """
+    queryset = queryset.order_by()
+    columns = {
+        'author': queryset.values('author'),
+        'year': queryset.annotate(year=ExtractYear('published_date')).values('year'),
+    }
+    result = {}
+    for facet in facets:
+        rows = columns[facet].annotate(count=Count('id')).order_by('-count', facet)
+        if limit:
+            rows = rows[:limit]
+        result[facet] = [{'value': row[facet], 'count': row['count']} for row in rows]
+    return result
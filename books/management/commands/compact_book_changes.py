@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from books.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Drop change-feed entries superseded by a newer entry for the same book'
+
+    def handle(self, *args, **options):
+        removed = compact_changes()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} superseded change entries'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from books.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the book facet summary table from the books table'
+
+    def handle(self, *args, **options):
+        values = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {values} facet values'))
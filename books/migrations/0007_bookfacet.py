@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:03
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+
+def populate_facets(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookFacet = apps.get_model('books', 'BookFacet')
+    db_alias = schema_editor.connection.alias
+    books = Book.objects.using(db_alias)
+    facets = [
+        BookFacet(facet='author', value=row['author'], count=row['n'])
+        for row in books.values('author').annotate(n=Count('id')).order_by()
+    ]
+    years = books.annotate(year=ExtractYear('published_date'))
+    facets += [
+        BookFacet(facet='year', value=str(row['year']), count=row['n'])
+        for row in years.values('year').annotate(n=Count('id')).order_by()
+    ]
+    BookFacet.objects.using(db_alias).bulk_create(facets, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['facet', '-count'], name='bookfacet_facet_count_idx')],
+                'unique_together': {('facet', 'value')},
+            },
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
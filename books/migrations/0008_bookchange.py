@@ -0,0 +1,101 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE FUNCTION books_book_log_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO books_bookchange (book_id, op, changed_at)
+            VALUES (OLD.id, 'delete', clock_timestamp());
+            RETURN OLD;
+        END IF;
+        INSERT INTO books_bookchange (book_id, op, changed_at)
+        VALUES (NEW.id, 'upsert', clock_timestamp());
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER books_book_log_change
+    AFTER INSERT OR UPDATE OR DELETE ON books_book
+    FOR EACH ROW EXECUTE FUNCTION books_book_log_change()
+    """,
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP TRIGGER IF EXISTS books_book_log_change ON books_book",
+    "DROP FUNCTION IF EXISTS books_book_log_change()",
+]
+
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE TRIGGER books_book_log_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_bookchange (book_id, op, changed_at)
+        VALUES (new.id, 'upsert', {SQLITE_NOW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER books_book_log_update AFTER UPDATE ON books_book BEGIN
+        INSERT INTO books_bookchange (book_id, op, changed_at)
+        VALUES (new.id, 'upsert', {SQLITE_NOW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER books_book_log_delete AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_bookchange (book_id, op, changed_at)
+        VALUES (old.id, 'delete', {SQLITE_NOW});
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS books_book_log_insert",
+    "DROP TRIGGER IF EXISTS books_book_log_update",
+    "DROP TRIGGER IF EXISTS books_book_log_delete",
+]
+
+# Existing books enter the feed as upserts in modification order
+BACKFILL = """
+    INSERT INTO books_bookchange (book_id, op, changed_at)
+    SELECT id, 'upsert', updated_at FROM books_book ORDER BY updated_at, id
+"""
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_bookfacet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('book_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=6)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book_id', '-seq'], name='bookchange_book_seq_idx')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRESQL_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -11,6 +11,61 @@ class Book(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination seeks on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='book_created_id_idx'),
+            # max(updated_at) drives list ETag / Last-Modified validators
+            models.Index(fields=['updated_at'], name='book_updated_at_idx'),
+            # ?author= filter (and admin list_filter) in keyset order
+            models.Index(fields=['author', '-created_at', '-id'], name='book_author_created_idx'),
+            # published_date ranges and ?ordering=published_date
+            models.Index(fields=['published_date', 'id'], name='book_published_id_idx'),
+        ]
         
     def __str__(self):
         return f"{self.title} by {self.author}"
+
+
+class BookFacet(models.Model):
+    """
+    Running count of books per facet value (e.g. author or publication year)
+    """
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('facet', 'value')
+        indexes = [
+            models.Index(fields=['facet', '-count'], name='bookfacet_facet_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+
+class BookChange(models.Model):
+    """
+    Append-only log of book writes behind the delta-sync change feed.
+
+    Rows are written by database triggers (see migration 0008), so every
+    write path - ORM, bulk endpoint, COPY imports - is captured. ``seq`` is
+    the feed's monotonic position; deletes leave ``op='delete'`` tombstones.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OP_CHOICES = [(UPSERT, 'Upsert'), (DELETE, 'Delete')]
+
+    seq = models.BigAutoField(primary_key=True)
+    # Plain integer rather than a foreign key: tombstones outlive their book
+    book_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book_id', '-seq'], name='bookchange_book_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} book {self.book_id}"
@@ -0,0 +1,77 @@
+"""
+Ranked full-text search over book title, author and description
+
+PostgreSQL uses the generated ``search_vector`` tsvector column and its GIN
+index; SQLite uses the ``books_book_fts`` FTS5 shadow table. Both are created
+by migration 0004 and kept in sync by the database itself (generated column
+on PostgreSQL, triggers on SQLite), so every write path - including bulk
+operations - updates the index. Other backends fall back to ``icontains``.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Relative weights for title, author and description matches
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_books(queryset, query):
+    """
+    Filter ``queryset`` to books matching ``query``, annotated with ``rank``
+    and ordered best match first
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return _search_postgresql(queryset, query)
+    if vendor == 'sqlite':
+        return _search_sqlite(queryset, query)
+
+    return queryset.filter(
+        Q(title__icontains=query)
+        | Q(author__icontains=query)
+        | Q(description__icontains=query)
+    ).annotate(rank=Value(0.0, output_field=FloatField())).order_by('-rank', '-id')
+
+
+def _search_postgresql(queryset, query):
+    tsquery = "websearch_to_tsquery('english', %s)"
+    return queryset.extra(
+        where=[f'"books_book"."search_vector" @@ {tsquery}'],
+        params=[query],
+    ).annotate(
+        rank=RawSQL(
+            f'ts_rank("books_book"."search_vector", {tsquery})::float8',
+            [query],
+            output_field=FloatField(),
+        )
+    ).order_by('-rank', '-id')
+
+
+def _search_sqlite(queryset, query):
+    # Quote every token so user input can never hit FTS5 query syntax
+    terms = TOKEN_RE.findall(query)
+    if not terms:
+        return queryset.none()
+    match = ' '.join('"%s"' % term for term in terms)
+
+    weights = ', '.join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+    return queryset.extra(
+        tables=['books_book_fts'],
+        where=[
+            '"books_book_fts"."rowid" = "books_book"."id"',
+            '"books_book_fts" MATCH %s',
+        ],
+        params=[match],
+    ).annotate(
+        # bm25() is lower-is-better; negate it so rank sorts like ts_rank
+        rank=RawSQL(f'-bm25("books_book_fts", {weights})', [], output_field=FloatField())
+    ).order_by('-rank', '-id')
@@ -0,0 +1,70 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from datanexus.signals import post_bulk_create, post_bulk_update, pre_bulk_update
+from .cache import evict_details
+from .facets import apply_facet_deltas, count_facets, facet_values
+from .models import Book
+
+
+@receiver(pre_save, sender=Book)
+def remember_facet_values(sender, instance, raw=False, **kwargs):
+    # Snapshot the stored values so post_save can move the counts
+    instance._previous_facets = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    previous = Book.objects.filter(pk=instance.pk).only('author', 'published_date').first()
+    if previous is not None:
+        instance._previous_facets = facet_values(previous)
+
+
+@receiver(post_save, sender=Book)
+def update_facets_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = Counter(facet_values(instance))
+    if not created:
+        previous = getattr(instance, '_previous_facets', None)
+        if previous is None:
+            return
+        deltas.subtract(previous)
+    apply_facet_deltas(deltas)
+
+
+@receiver(post_delete, sender=Book)
+def update_facets_on_delete(sender, instance, **kwargs):
+    deltas = Counter()
+    deltas.subtract(facet_values(instance))
+    apply_facet_deltas(deltas)
+
+
+@receiver(post_bulk_create, sender=Book)
+def update_facets_on_bulk_create(sender, instances, **kwargs):
+    apply_facet_deltas(count_facets(instances))
+
+
+@receiver(pre_bulk_update, sender=Book)
+def remember_facets_before_bulk_update(sender, instances, **kwargs):
+    for instance in instances:
+        instance._previous_facets = facet_values(instance)
+
+
+@receiver(post_bulk_update, sender=Book)
+def update_facets_after_bulk_update(sender, instances, **kwargs):
+    deltas = count_facets(instances)
+    for instance in instances:
+        deltas.subtract(getattr(instance, '_previous_facets', []))
+    apply_facet_deltas(deltas)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def evict_cached_detail(sender, instance, **kwargs):
+    evict_details([instance.pk])
+
+
+@receiver(post_bulk_update, sender=Book)
+def evict_cached_details_after_bulk_update(sender, instances, **kwargs):
+    evict_details([instance.pk for instance in instances])
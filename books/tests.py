@@ -1,3 +1,665 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connection, connections
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from datanexus.cache import BoundedLocMemCache
+from datanexus.routers import ReplicaRouter, replica_aliases
+from .cache import CACHE_VERSION, aget_cached_detail
+from .changes import compact_changes, encode_token, read_changes
+from .models import Book, BookChange
+from .views import BookListCreateView
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Query plans are PostgreSQL specific')
+class BookFilterIndexTests(TestCase):
+    """
+    Every list filter/ordering must be answerable from a composite index
+    """
+
+    def filtered_queryset(self, query):
+        request = Request(APIRequestFactory().get('/api/books/', query))
+        view = BookListCreateView(request=request, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def assertUsesIndex(self, query, index_name):
+        queryset = self.filtered_queryset(query)
+        with connection.cursor() as cursor:
+            # Empty test tables would otherwise always get a sequential scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_default_ordering(self):
+        self.assertUsesIndex({}, 'book_created_id_idx')
+
+    def test_author_filter(self):
+        self.assertUsesIndex({'author': 'Ursula K. Le Guin'}, 'book_author_created_idx')
+
+    def test_published_date_range(self):
+        self.assertUsesIndex(
+            {'published_after': '1960-01-01', 'published_before': '1970-01-01',
+             'ordering': 'published_date'},
+            'book_published_id_idx',
+        )
+
+    def test_search_uses_gin_index(self):
+        self.assertUsesIndex({'q': 'dispossessed'}, 'book_search_vector_idx')
+
+
+def make_book(title, **fields):
+    fields.setdefault('author', 'Author')
+    fields.setdefault('published_date', datetime.date(2000, 1, 1))
+    return Book.objects.create(title=title, **fields)
+
+
+class BookListFilterTests(TestCase):
+    """
+    List filters and orderings return the right books in index order
+    """
+
+    def setUp(self):
+        for i, (author, year) in enumerate([
+            ('Le Guin', 1969), ('Le Guin', 1974), ('Butler', 1979), ('Butler', 1974), ('Banks', 1987),
+        ]):
+            make_book(f'Book {i}', author=author, published_date=datetime.date(year, 1, 1))
+
+    def titles(self, query):
+        response = self.client.get('/api/books/', query, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        titles = [book['title'] for book in response.json()['results']]
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'], HTTP_ACCEPT='application/json')
+            titles += [book['title'] for book in response.json()['results']]
+        return titles
+
+    def test_filters(self):
+        self.assertEqual(self.titles({'author': 'Butler'}), ['Book 3', 'Book 2'])
+        self.assertEqual(
+            self.titles({'published_after': '1970-01-01', 'published_before': '1980-01-01'}),
+            ['Book 3', 'Book 2', 'Book 1'],
+        )
+
+    def test_ordering_with_id_tiebreaker(self):
+        # Equal dates keep id order across page boundaries
+        self.assertEqual(
+            self.titles({'ordering': 'published_date', 'page_size': 2}),
+            ['Book 0', 'Book 1', 'Book 3', 'Book 2', 'Book 4'],
+        )
+        self.assertEqual(
+            self.titles({'ordering': '-published_date', 'page_size': 2}),
+            ['Book 4', 'Book 2', 'Book 3', 'Book 1', 'Book 0'],
+        )
+
+    def test_invalid_filter_value(self):
+        response = self.client.get('/api/books/', {'published_after': 'last year'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('published_after', response.json())
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Cursors must round-trip and reject tampering with a 404
+    """
+
+    def setUp(self):
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        # Two books per timestamp exercise the id tiebreaker
+        for i in range(7):
+            make_book(f'Book {i}', created_at=start + datetime.timedelta(hours=i // 2))
+
+    def get_page(self, url):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [book['title'] for book in body['results']], body['next'], body['previous']
+
+    def test_next_and_previous_round_trip(self):
+        pages = []
+        url = '/api/books/?page_size=3'
+        while url:
+            titles, url, previous = self.get_page(url)
+            pages.append((titles, previous))
+        self.assertEqual(
+            [titles for titles, _ in pages],
+            [['Book 6', 'Book 5', 'Book 4'], ['Book 3', 'Book 2', 'Book 1'], ['Book 0']],
+        )
+        self.assertIsNone(pages[0][1])
+
+        titles, _, previous = self.get_page(pages[2][1])
+        self.assertEqual(titles, ['Book 3', 'Book 2', 'Book 1'])
+        titles, _, previous = self.get_page(previous)
+        self.assertEqual(titles, ['Book 6', 'Book 5', 'Book 4'])
+        self.assertIsNone(previous)
+
+    def test_tampered_cursors(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        cursors = [
+            'not base64!', token([1]), token({'id': 1}),
+            token({'v': None, 'id': 1}), token({'v': [1], 'id': 1}), token({'v': 'soon', 'id': 1}),
+            token({'v': '2024-01-01T00:00:00Z', 'id': 'x'}),
+            token({'v': '2024-01-01T00:00:00Z', 'id': 2 ** 64}),
+        ]
+        for cursor in cursors:
+            response = self.client.get('/api/books/', {'cursor': cursor}, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class BookFacetsTests(TestCase):
+    """
+    Facet counts and their parameter validation
+    """
+
+    def test_limit(self):
+        for author in ('Le Guin', 'Le Guin', 'Butler'):
+            make_book('Title', author=author)
+        response = self.client.get('/api/books/facets/', {'facet': 'author', 'limit': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['facets']['author']), 1)
+
+        for limit in ('-1', '0', 'abc'):
+            response = self.client.get('/api/books/facets/', {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+
+class BookBatchTests(TestCase):
+    """
+    Batch lookups keep the requested order and validate the ids
+    """
+
+    def test_batch(self):
+        books = [make_book(f'Book {i}') for i in range(3)]
+        ids = [books[2].pk, 999999, books[0].pk, books[2].pk]
+        response = self.client.get('/api/books/batch/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book['title'] for book in response.json()['results']], ['Book 2', 'Book 0'])
+        self.assertEqual(response.json()['missing'], [999999])
+
+    def test_ids_out_of_range(self):
+        for ids in ('99999999999999999999', '0', '-1', '1,x'):
+            response = self.client.get('/api/books/batch/', {'ids': ids})
+            self.assertEqual(response.status_code, 400, ids)
+        response = self.client.post('/api/books/batch/', {'ids': [2 ** 63]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BookBulkTests(TestCase):
+    """
+    Bulk writes apply every operation in one transaction or none of them
+    """
+
+    def setUp(self):
+        self.kept = make_book('Kept')
+        self.doomed = make_book('Doomed')
+
+    def post(self, items, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        if kwargs['content_type'] == 'application/json':
+            items = json.dumps(items)
+        return self.client.post('/api/books/bulk/', items, HTTP_ACCEPT='application/json', **kwargs)
+
+    def test_mixed_operations(self):
+        response = self.post([
+            {'title': 'New', 'author': 'Author', 'published_date': '2001-01-01'},
+            {'op': 'update', 'id': self.kept.pk, 'title': 'Renamed'},
+            {'op': 'delete', 'id': str(self.doomed.pk)},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['deleted']), (1, 1, 1))
+        self.assertEqual([result['op'] for result in body['results']], ['create', 'update', 'delete'])
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['New', 'Renamed'])
+
+    def test_item_errors(self):
+        response = self.post([
+            {'title': 'No author', 'published_date': '2001-01-01'},
+            {'op': 'update', 'id': 2 ** 64, 'title': 'Overflow'},
+            {'op': 'delete', 'id': True},
+            {'op': 'delete', 'id': 0},
+            {'op': 'delete', 'id': 1.5},
+            {'op': 'update', 'id': 999999, 'title': 'Missing'},
+            {'op': 'rename', 'id': self.kept.pk},
+            'not an object',
+            {'op': 'delete', 'id': self.doomed.pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error['index'] for error in errors], list(range(8)))
+        self.assertIn('author', errors[0]['errors'])
+        self.assertEqual(errors[1]['errors']['id'], [f'id must be between 1 and {2 ** 63 - 1}'])
+        # Nothing was written, the valid delete included
+        self.assertEqual(Book.objects.count(), 2)
+
+    def test_ndjson(self):
+        lines = [
+            {'title': 'First', 'author': 'Author', 'published_date': '2001-01-01'},
+            {'title': 'Second', 'author': 'Author', 'published_date': '2002-01-01'},
+            {'op': 'delete', 'id': self.doomed.pk},
+        ]
+        response = self.post(
+            '\n'.join(json.dumps(line) for line in lines) + '\n', content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['First', 'Kept', 'Second'])
+
+    def test_failed_batch_rolls_back(self):
+        items = [
+            {'title': 'New', 'author': 'Author', 'published_date': '2001-01-01'},
+            {'op': 'update', 'id': self.kept.pk, 'title': 'Renamed'},
+            {'op': 'delete', 'id': self.doomed.pk},
+        ]
+        with mock.patch.object(QuerySet, 'delete', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.post(items)
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Doomed', 'Kept'])
+
+
+@unittest.skipUnless(connection.vendor in ('postgresql', 'sqlite'), 'Needs a full-text index')
+class BookSearchTests(TestCase):
+    """
+    Ranked search with user input taken literally and an index that
+    follows writes (SQLite FTS5 triggers or the PostgreSQL generated column)
+    """
+
+    def setUp(self):
+        self.in_title = make_book('Dune', author='Frank Herbert', description='Desert planet')
+        self.in_description = make_book('Children', author='Someone', description='A sequel to dune')
+        make_book('Emma', author='Jane Austen', description='Matchmaking')
+
+    def search(self, query):
+        response = self.client.get('/api/books/', {'q': query}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, query)
+        return [book['title'] for book in response.json()['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('dune'), ['Dune', 'Children'])
+        self.assertEqual(self.search('herbert dune'), ['Dune'])
+
+    def test_punctuation_and_quotes(self):
+        self.assertEqual(self.search('"dune"'), ['Dune', 'Children'])
+        # Unbalanced quotes and FTS5 operators are plain text, not syntax errors
+        self.assertEqual(self.search('"dune'), ['Dune', 'Children'])
+        self.assertEqual(self.search('title:dune NOT'), [])
+        self.assertEqual(self.search('dune: "desert" (planet)!'), ['Dune'])
+        self.assertEqual(self.search('*:^-'), [])
+
+    def test_index_follows_writes(self):
+        self.in_title.title = 'Arrakis'
+        self.in_title.save()
+        self.assertEqual(self.search('arrakis'), ['Arrakis'])
+        self.assertEqual(self.search('dune'), ['Children'])
+
+        Book.objects.filter(pk=self.in_description.pk).update(description='Unrelated')
+        self.assertEqual(self.search('dune'), [])
+        self.in_title.delete()
+        self.assertEqual(self.search('arrakis'), [])
+
+
+class FastListTests(TestCase):
+    """
+    The values() fast path renders the same bytes as the serializers
+    """
+
+    def setUp(self):
+        make_book('Dune', author='Frank Herbert', description='Spice «melange»',
+                  created_at=datetime.datetime(2024, 1, 1, 12, 30, 15, 250000, tzinfo=datetime.timezone.utc))
+        make_book('Emma', author='Jane Austen', published_date=datetime.date(1815, 12, 23))
+
+    def assertSameBytes(self, query):
+        contents = []
+        for fast in (True, False):
+            caches['api'].clear()
+            with self.settings(API_FAST_SERIALIZATION=fast):
+                response = self.client.get('/api/books/', query, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200)
+            contents.append(response.content)
+        self.assertEqual(contents[0], contents[1])
+
+    def test_same_bytes(self):
+        self.assertIsNotNone(BookListCreateView().get_fast_fields())
+        self.assertSameBytes({})
+        self.assertSameBytes({'q': 'dune', 'page_size': 1})
+        with timezone.override('America/New_York'):
+            self.assertSameBytes({'ordering': 'published_date'})
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Book endpoints answer 304 until a write changes their ETag
+    """
+
+    def setUp(self):
+        self.books = [make_book(f'Book {i}') for i in range(3)]
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, HTTP_ACCEPT='application/json', **headers)
+
+    def assertChangesETag(self, url, write):
+        etag = self.get(url)['ETag']
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        write()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list(self):
+        def update():
+            self.books[0].title = 'Renamed'
+            self.books[0].save()
+
+        self.assertChangesETag('/api/books/', update)
+        self.assertChangesETag('/api/books/?author=Author', self.books[1].delete)
+        self.assertChangesETag('/api/books/', lambda: make_book('New'))
+
+    def test_detail(self):
+        book = self.books[0]
+
+        def update():
+            book.title = 'Renamed'
+            book.save()
+
+        url = f'/api/books/{book.pk}/'
+        self.assertChangesETag(url, update)
+        etag = self.get(url)['ETag']
+        book.delete()
+        self.assertEqual(self.get(url, etag).status_code, 404)
+
+
+class AsyncBookViewTests(TestCase):
+    """
+    The async endpoints answer like the sync ones and share the detail cache
+    """
+
+    def setUp(self):
+        caches['api'].clear()
+        self.books = [make_book(f'Book {i}') for i in range(3)]
+
+    async def test_list_matches_sync(self):
+        response = await self.async_client.get('/api/async/books/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        sync_response = await sync_to_async(self.client.get)(
+            '/api/books/', {'page_size': 2}, HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json()['results'], sync_response.json()['results'])
+
+    async def test_detail_uses_cache(self):
+        book = self.books[0]
+        response = await self.async_client.get(f'/api/async/books/{book.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Book 0')
+        self.assertIsNotNone(await aget_cached_detail(book.pk, book.updated_at))
+
+        response = await self.async_client.get('/api/async/books/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_not_modified(self):
+        url = f'/api/async/books/{self.books[1].pk}/'
+        response = await self.async_client.get(url)
+        etag = response.headers['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        response = await self.async_client.get('/api/async/books/')
+        response = await self.async_client.get('/api/async/books/', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class BoundedLocMemCacheTests(TestCase):
+    """
+    The bounded cache evicts least recently used entries first
+    """
+
+    def make_cache(self, **options):
+        cache = BoundedLocMemCache(f'test-{self._testMethodName}', {'OPTIONS': options})
+        self.addCleanup(cache.clear)
+        return cache
+
+    def test_entry_limit_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=3)
+        for key in 'abc':
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        cache.set('e', 'e')
+        self.assertEqual(cache.get_many('abcde'), {'a': 'a', 'd': 'd', 'e': 'e'})
+
+    def test_byte_limit(self):
+        cache = self.make_cache(MAX_BYTES=3000)
+        for key in 'abc':
+            cache.set(key, 'x' * 900)
+        cache.get('a')
+        cache.set('d', 'x' * 1800)
+        self.assertEqual(sorted(cache.get_many('abcd')), ['a', 'd'])
+        self.assertLessEqual(cache.size_bytes, 3000)
+
+        cache.delete('a')
+        cache.set('d', 'small')
+        self.assertLess(cache.size_bytes, 100)
+
+
+class BookDetailCacheTests(TestCase):
+    """
+    Writes through any path evict the book's cached detail rendering
+    """
+
+    def setUp(self):
+        caches['api'].clear()
+        self.book = make_book('Dune')
+        self.pk = self.book.pk
+
+    def cached(self):
+        return caches['api'].get(f'book-detail:{self.pk}', version=CACHE_VERSION)
+
+    def warm(self):
+        response = self.client.get(f'/api/books/{self.pk}/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(self.cached())
+        return response
+
+    def test_update_evicts(self):
+        self.warm()
+        response = self.client.patch(f'/api/books/{self.pk}/', {'title': 'Arrakis'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.warm().json()['title'], 'Arrakis')
+
+    def test_bulk_update_evicts(self):
+        self.warm()
+        response = self.client.post('/api/books/bulk/', [{'op': 'update', 'id': self.pk, 'title': 'Arrakis'}],
+                                    content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.warm().json()['title'], 'Arrakis')
+
+    def test_delete_evicts(self):
+        self.warm()
+        self.book.delete()
+        self.assertIsNone(self.cached())
+        response = self.client.get(f'/api/books/{self.pk}/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class ChangeFeedTests(TestCase):
+    """
+    The change feed reports upserts and tombstones, validates its token and
+    passes gaps that can no longer be filled
+    """
+
+    def test_skips_gap_of_compacted_entry(self):
+        books = [make_book(f'Book {i}') for i in range(3)]
+        BookChange.objects.filter(book_id=books[1].pk).delete()
+
+        changes, next_seq, has_more = read_changes(0, 10)
+        self.assertEqual([change['id'] for change in changes], [books[0].pk, books[2].pk])
+        self.assertFalse(has_more)
+        self.assertEqual(next_seq, BookChange.objects.order_by('-seq').first().seq)
+
+    def test_deleted_book_leaves_tombstone(self):
+        kept = make_book('Kept')
+        _, since, _ = read_changes(0, 10)
+        doomed = make_book('Doomed')
+        doomed_id = doomed.pk
+        doomed.delete()
+
+        # Read from the start, the delete replaces the book's upsert
+        changes, _, _ = read_changes(0, 10)
+        self.assertEqual([(change['op'], change['id']) for change in changes],
+                         [('upsert', kept.pk), ('delete', doomed_id)])
+        response = self.client.get('/api/books/changes/', {'since': encode_token(since)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(change['op'], change['id']) for change in response.json()['changes']],
+                         [('delete', doomed_id)])
+
+    def test_compaction_keeps_latest_entries(self):
+        book = make_book('Draft')
+        for title in ('Second draft', 'Final'):
+            book.title = title
+            book.save()
+        other = make_book('Other')
+        self.assertEqual(compact_changes(), 0)
+
+        removed = compact_changes(older_than=timezone.now() + datetime.timedelta(seconds=1))
+        self.assertEqual(removed, 2)
+        self.assertEqual(BookChange.objects.count(), 2)
+        changes, _, has_more = read_changes(0, 10)
+        self.assertEqual([change['id'] for change in changes], [book.pk, other.pk])
+        self.assertEqual(changes[0]['book']['title'], 'Final')
+        self.assertFalse(has_more)
+
+    def test_since_token_out_of_range(self):
+        for seq in (2 ** 63, 2 ** 64, -1):
+            since = base64.urlsafe_b64encode(f'seq:{seq}'.encode()).decode()
+            response = self.client.get('/api/books/changes/', {'since': since})
+            self.assertEqual(response.status_code, 400, seq)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Needs concurrent PostgreSQL transactions')
+class ChangeFeedOpenTransactionTests(TransactionTestCase):
+    """
+    A gap left by a transaction still in progress holds the feed back,
+    however old it is
+    """
+
+    def test_waits_for_long_transaction(self):
+        other = connection.get_new_connection(connection.get_connection_params())
+        try:
+            with other.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO books_book (title, author, published_date, description, created_at, updated_at) "
+                    "VALUES ('Slow import', 'Author', '2000-01-01', '', now(), now())"
+                )
+            written = make_book('Written later')
+
+            with self.settings(CHANGE_FEED_GAP_TIMEOUT=0):
+                changes, next_seq, has_more = read_changes(0, 10)
+                self.assertEqual((changes, next_seq, has_more), ([], 0, True))
+
+                other.commit()
+                changes, _, has_more = read_changes(next_seq, 10)
+            self.assertEqual([change['book']['title'] for change in changes], ['Slow import', 'Written later'])
+            self.assertEqual(changes[1]['id'], written.pk)
+            self.assertFalse(has_more)
+        finally:
+            other.close()
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Safe requests read from a replica until the client writes
+
+    Replicas mirror the primary's test database, so the queries each
+    connection ran show which database served a request. Without
+    ``DATABASE_REPLICA_URLS`` a mirror is registered as ``replica0`` for
+    this class.
+    """
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.added_replica = not replica_aliases()
+        if cls.added_replica:
+            replica = connections.configure_settings({
+                'default': connections['default'].settings_dict,
+                'replica0': {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}},
+            })['replica0']
+            connections.settings['replica0'] = settings.DATABASES['replica0'] = replica
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.added_replica:
+            connections['replica0'].close()
+            del connections['replica0']
+            connections.settings.pop('replica0', None)
+            settings.DATABASES.pop('replica0', None)
+
+    def setUp(self):
+        make_book('Stored')
+
+    def read_aliases(self):
+        """
+        Aliases whose connection queried the books table during a list request
+        """
+        captured = {alias: CaptureQueriesContext(connections[alias]) for alias in ['default', *replica_aliases()]}
+        for context in captured.values():
+            context.__enter__()
+        try:
+            response = self.client.get('/api/books/', HTTP_ACCEPT='application/json')
+        finally:
+            for context in captured.values():
+                context.__exit__(None, None, None)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book['title'] for book in response.json()['results']][-1], 'Stored')
+        return sorted(
+            alias for alias, context in captured.items()
+            if any('books_book' in query['sql'] for query in context.captured_queries)
+        )
+
+    def test_safe_requests_read_replica(self):
+        aliases = self.read_aliases()
+        self.assertEqual(len(aliases), 1)
+        self.assertIn(aliases[0], replica_aliases())
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post('/api/books/', {
+            'title': 'Just written', 'author': 'Primary',
+            'published_date': '2001-01-01', 'description': 'Written through the API',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        self.assertEqual(self.read_aliases(), ['default'])
+
+        del self.client.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertNotIn('default', self.read_aliases())
+
+    def test_reads_outside_requests_use_primary(self):
+        with CaptureQueriesContext(connections['default']) as primary:
+            self.assertTrue(Book.objects.filter(title='Stored').exists())
+        self.assertEqual(len(primary.captured_queries), 1)
+
+    def test_migrations_only_on_primary(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'books'))
+        for alias in replica_aliases():
+            self.assertFalse(router.allow_migrate(alias, 'books'))
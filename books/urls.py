@@ -5,5 +5,10 @@ app_name = 'books'
 
 urlpatterns = [
     path('', views.BookListCreateView.as_view(), name='book-list'),
+    path('changes/', views.BookChangesView.as_view(), name='book-changes'),
+    path('facets/', views.BookFacetsView.as_view(), name='book-facets'),
+    path('export/', views.export_books, name='book-export'),
+    path('batch/', views.BookBatchView.as_view(), name='book-batch'),
+    path('bulk/', views.BookBulkView.as_view(), name='book-bulk'),
     path('<int:pk>/', views.BookDetailView.as_view(), name='book-detail'),
 ]
\ No newline at end of file
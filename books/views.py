@@ -1,17 +1,375 @@
-from rest_framework import generics
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
+from rest_framework import generics, status
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from datanexus.conditional import conditional_get, get_conditional_state, table_state
+from datanexus.export import export_response
+from datanexus.fastpath import FastListMixin
+from datanexus.filters import QueryParamFilterBackend
+from datanexus.pagination import KeysetPagination
+from datanexus.parsers import NDJSONParser
+from datanexus.signals import post_bulk_create, post_bulk_update, pre_bulk_update
+from .cache import get_cached_detail, set_cached_detail
+from .changes import InvalidToken, decode_token, encode_token, read_changes
+from .facets import FACETS, aggregate_facets, read_facets
 from .models import Book
+from .search import search_books
 from .serializers import BookSerializer
 
-class BookListCreateView(generics.ListCreateAPIView):
+def book_list_state(request, *args, **kwargs):
+    return table_state(Book.objects.all(), 'updated_at')
+
+def book_detail_state(request, pk, *args, **kwargs):
+    updated_at = Book.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    return (updated_at, pk) if updated_at else None
+
+class BookListCreateView(FastListMixin, generics.ListCreateAPIView):
     """
     List all books or create a new book
+
+    Pass ``?q=`` to run a ranked full-text search over title, author and
+    description instead of listing in creation order. Filter with
+    ``author``, ``published_after`` and ``published_before``; reorder with
+    ``ordering`` (``created_at`` or ``published_date``, ``-`` for descending).
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilterBackend, OrderingFilter]
+    query_filters = {
+        'author': ('author', str),
+        'published_after': ('published_date__gte', parse_date),
+        'published_before': ('published_date__lte', parse_date),
+    }
+    ordering_fields = ['created_at', 'published_date']
+
+    @method_decorator(conditional_get(book_list_state))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        query = self.request.query_params.get('q')
+        if query:
+            queryset = search_books(queryset, query)
+        return queryset
 
 class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a book instance
+
+    JSON renderings are served from a per-book read-through cache that is
+    evicted whenever the book changes.
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+
+    @method_decorator(conditional_get(book_detail_state))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        state = get_conditional_state(request)
+        if (
+            state is None
+            or not isinstance(renderer, JSONRenderer)
+            or request.accepted_media_type != renderer.media_type
+        ):
+            return super().retrieve(request, *args, **kwargs)
+
+        updated_at, pk = state
+        content = get_cached_detail(pk, updated_at)
+        if content is None:
+            instance = self.get_object()
+            data = self.get_serializer(instance).data
+            content = renderer.render(data, renderer.media_type, self.get_renderer_context())
+            # Key by the stamp we looked up, which can't be newer than what we rendered
+            set_cached_detail(pk, updated_at, content)
+
+        return HttpResponse(content, content_type=renderer.media_type)
+
+class BookFacetsView(generics.GenericAPIView):
+    """
+    Book counts grouped by author and by publication year
+
+    Unfiltered requests read the incrementally maintained summary table.
+    Accepts the list filters (and ``q``), in which case counts are
+    aggregated over the matching books. ``facet`` picks facets
+    (comma-separated) and ``limit`` caps values per facet.
+    """
+    queryset = Book.objects.all()
+    filter_backends = [QueryParamFilterBackend]
+    query_filters = BookListCreateView.query_filters
+    default_limit = 50
+
+    @method_decorator(conditional_get(book_list_state))
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        facets = [name for name in params.get('facet', ','.join(FACETS)).split(',') if name]
+        unknown = sorted(set(facets) - set(FACETS))
+        if unknown:
+            return Response({
+                'error': f'Unknown facet(s): {", ".join(unknown)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, settings.API_MAX_PAGE_SIZE)
+
+        filtered = params.get('q') or any(params.get(name) for name in self.query_filters)
+        if filtered:
+            queryset = self.filter_queryset(self.get_queryset())
+            if params.get('q'):
+                queryset = search_books(queryset, params['q'])
+            data = aggregate_facets(queryset, facets, limit)
+        else:
+            data = read_facets(facets, limit)
+
+        return Response({'facets': data})
+
+class BookChangesView(generics.GenericAPIView):
+    """
+    Delta-sync feed of book upserts and delete tombstones
+
+    Start without ``since`` to receive every book, then pass the returned
+    ``next`` token to fetch only what changed. Keep following ``next``
+    while ``has_more`` is true. ``limit`` caps entries per response.
+    """
+    queryset = Book.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = decode_token(request.query_params.get('since'))
+        except InvalidToken:
+            return Response({'error': 'Invalid since token'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', settings.API_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+        changes, next_seq, has_more = read_changes(since, limit)
+        return Response({
+            'changes': changes,
+            'next': encode_token(next_seq),
+            'has_more': has_more,
+        })
+
+# Largest value of the 64-bit primary key; bigger ids overflow the query
+MAX_BOOK_ID = 2 ** 63 - 1
+
+class BookBatchView(generics.GenericAPIView):
+    """
+    Fetch many books by id with a single query
+
+    ``GET ?ids=1,2,3`` or, for long lists, ``POST {"ids": [1, 2, 3]}``.
+    Results keep the requested order (repeated ids appear once); ids with
+    no matching book are listed under ``missing``.
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    # POST only carries the id list; it never writes
+    replica_safe = True
+
+    def get(self, request):
+        raw_ids = [value for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        return self.batch(raw_ids)
+
+    def post(self, request):
+        raw_ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(raw_ids, list):
+            return Response({
+                'error': 'Expected {"ids": [...]}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return self.batch(raw_ids)
+
+    def batch(self, raw_ids):
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if any(not 0 < pk <= MAX_BOOK_ID for pk in ids):
+            return Response({
+                'error': f'ids must be between 1 and {MAX_BOOK_ID}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not ids:
+            return Response({'error': 'Provide at least one id'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.BOOK_BATCH_MAX_IDS:
+            return Response({
+                'error': f'At most {settings.BOOK_BATCH_MAX_IDS} ids per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        books = self.get_queryset().in_bulk(ids)
+        found = [books[pk] for pk in ids if pk in books]
+        return Response({
+            'results': self.get_serializer(found, many=True).data,
+            'missing': [pk for pk in ids if pk not in books],
+        })
+
+class BookBulkView(generics.GenericAPIView):
+    """
+    Create, update or delete many books in a single transaction
+
+    Accepts a JSON array or an NDJSON stream. Each item is a book payload
+    with an optional ``op`` of ``create`` (default), ``update`` or
+    ``delete``; updates and deletes must carry the book ``id``. Nothing is
+    written unless every item is valid.
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({
+                'error': 'Expected a list of operations'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > settings.BOOK_BULK_MAX_ITEMS:
+            return Response({
+                'error': f'At most {settings.BOOK_BULK_MAX_ITEMS} operations per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        creates, updates, deletes, errors = self.split_operations(items)
+
+        # Validate each group with a single list serializer pass
+        create_serializer = BookSerializer(data=[payload for _, payload in creates], many=True)
+        update_serializer = BookSerializer(
+            data=[payload for _, payload in updates], many=True, partial=True
+        )
+        for group, serializer in ((creates, create_serializer), (updates, update_serializer)):
+            if group and not serializer.is_valid():
+                errors.extend(
+                    {'index': index, 'errors': item_errors}
+                    for (index, _), item_errors in zip(group, serializer.errors)
+                    if item_errors
+                )
+
+        target_ids = [payload['id'] for _, payload in updates + deletes]
+        existing = Book.objects.in_bulk(target_ids)
+        errors.extend(
+            {'index': index, 'errors': {'id': [f'Book {payload["id"]} does not exist']}}
+            for index, payload in updates + deletes
+            if payload['id'] not in existing
+        )
+
+        if errors:
+            return Response({
+                'errors': sorted(errors, key=lambda error: error['index'])
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        batch_size = settings.BOOK_BULK_BATCH_SIZE
+        results = []
+
+        with transaction.atomic():
+            if creates:
+                books = Book.objects.bulk_create(
+                    [Book(**data) for data in create_serializer.validated_data],
+                    batch_size=batch_size,
+                )
+                post_bulk_create.send(sender=Book, instances=books)
+                results.extend(
+                    {'index': index, 'op': 'create', 'id': book.pk}
+                    for (index, _), book in zip(creates, books)
+                )
+
+            if updates:
+                now = timezone.now()
+                update_fields = {'updated_at'}
+                targets = {payload['id']: existing[payload['id']] for _, payload in updates}
+                pre_bulk_update.send(sender=Book, instances=list(targets.values()))
+                for (index, payload), data in zip(updates, update_serializer.validated_data):
+                    book = existing[payload['id']]
+                    for field, value in data.items():
+                        setattr(book, field, value)
+                    book.updated_at = now
+                    update_fields.update(data)
+                    results.append({'index': index, 'op': 'update', 'id': book.pk})
+                Book.objects.bulk_update(
+                    list(targets.values()), sorted(update_fields), batch_size=batch_size
+                )
+                post_bulk_update.send(sender=Book, instances=list(targets.values()))
+
+            if deletes:
+                Book.objects.filter(pk__in=[payload['id'] for _, payload in deletes]).delete()
+                results.extend(
+                    {'index': index, 'op': 'delete', 'id': payload['id']}
+                    for index, payload in deletes
+                )
+
+        results.sort(key=lambda result: result['index'])
+        return Response({
+            'created': len(creates),
+            'updated': len(updates),
+            'deleted': len(deletes),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+    def split_operations(self, items):
+        """
+        Group raw items into ``(index, payload)`` lists per operation
+        """
+        creates, updates, deletes, errors = [], [], [], []
+        groups = {'create': creates, 'update': updates, 'delete': deletes}
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'errors': {'non_field_errors': ['Expected an object']}})
+                continue
+
+            payload = dict(item)
+            op = payload.pop('op', 'create')
+            if op not in groups:
+                errors.append({'index': index, 'errors': {'op': [f'Unknown operation "{op}"']}})
+                continue
+
+            if op != 'create':
+                raw_id = payload.get('id')
+                try:
+                    # int() would also take True and truncate 1.5
+                    if not isinstance(raw_id, (int, str)) or isinstance(raw_id, bool):
+                        raise TypeError(raw_id)
+                    payload['id'] = int(raw_id)
+                except (TypeError, ValueError):
+                    errors.append({'index': index, 'errors': {'id': [f'A valid id is required to {op}']}})
+                    continue
+                if not 0 < payload['id'] <= MAX_BOOK_ID:
+                    errors.append({'index': index, 'errors': {'id': [f'id must be between 1 and {MAX_BOOK_ID}']}})
+                    continue
+
+            groups[op].append((index, payload))
+
+        return creates, updates, deletes, errors
+
+@require_GET
+def export_books(request):
+    """
+    Stream all books as CSV or NDJSON
+
+    Query params: ``format`` (csv|ndjson), ``gzip``, ``start``/``end`` on
+    ``created_at``, and ``author``.
+    """
+    return export_response(
+        request,
+        Book.objects.all(),
+        fields=[field.attname for field in Book._meta.concrete_fields],
+        name='books',
+        time_field='created_at',
+        filter_fields=('author',),
+    )
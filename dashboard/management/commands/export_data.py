@@ -0,0 +1,66 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.models import Book
+from datanexus.export import EXPORT_FORMATS, ExportError, filter_export_queryset, stream_export
+from external_api.models import WeatherData
+
+# table name -> (model, time field for --start/--end, exact-match filters)
+EXPORT_TABLES = {
+    'books': (Book, 'created_at', ('author',)),
+    'weather': (WeatherData, 'fetched_at', ('city', 'country')),
+}
+
+
+class Command(BaseCommand):
+    help = 'Stream a table to CSV or NDJSON with flat memory use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(EXPORT_TABLES))
+        parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output (implied by a .gz output name)')
+        parser.add_argument('--start', help='Earliest date/datetime to include')
+        parser.add_argument('--end', help='Latest date/datetime to include')
+        parser.add_argument('--author', help='Books only: exact author')
+        parser.add_argument('--city', help='Weather only: exact city')
+        parser.add_argument('--country', help='Weather only: exact country')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        model, time_field, filter_fields = EXPORT_TABLES[options['table']]
+        output = options['output']
+        compress = options['gzip'] or bool(output and output.endswith('.gz'))
+
+        try:
+            queryset = filter_export_queryset(model.objects.all(), options, time_field, filter_fields)
+            chunks = stream_export(
+                queryset,
+                [field.attname for field in model._meta.concrete_fields],
+                options['export_format'],
+                compress=compress,
+                chunk_size=options['chunk_size'],
+            )
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        start = time.monotonic()
+        written = 0
+        stream = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if output:
+                stream.close()
+            else:
+                stream.flush()
+
+        if output:
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {options["table"]} to {output} ({written} bytes in {elapsed:.1f}s)'
+            ))
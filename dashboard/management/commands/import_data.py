@@ -0,0 +1,198 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from books.serializers import BookSerializer
+from dashboard.models import ImportCheckpoint
+from datanexus.signals import post_bulk_create
+from external_api.serializers import WeatherDataSerializer
+
+
+class BookImportSerializer(BookSerializer):
+    """
+    BookSerializer that keeps ``created_at`` from the source when present
+    """
+    class Meta(BookSerializer.Meta):
+        read_only_fields = ('updated_at',)
+
+
+IMPORT_TABLES = {
+    'books': BookImportSerializer,
+    'weather': WeatherDataSerializer,
+}
+
+# Invalid rows echoed to stderr before the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def open_source(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_rows(stream, source_format, nullable=()):
+    """
+    Yield one dict per input row from a CSV (with header) or NDJSON stream
+
+    CSV has no null, so an empty value of a ``nullable`` column (how
+    ``export_data`` writes null) is read as ``None``.
+    """
+    if source_format == 'csv':
+        for row in csv.DictReader(stream):
+            for name in nullable:
+                if row.get(name) == '':
+                    row[name] = None
+            yield row
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load books or weather history from CSV/NDJSON files (resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(IMPORT_TABLES))
+        parser.add_argument('path', help='CSV or NDJSON file, optionally .gz')
+        parser.add_argument('--format', dest='source_format', choices=('csv', 'ndjson'),
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE)
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the last committed batch of a previous run')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+
+        source_format = options['source_format'] or self.guess_format(path)
+        serializer_class = IMPORT_TABLES[options['table']]
+        model = serializer_class.Meta.model
+        batch_size = options['batch_size']
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        nullable = [field.attname for field in model._meta.concrete_fields if field.null]
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(table=options['table'], source=path)
+        skip = checkpoint.rows_done if options['resume'] else 0
+        if skip:
+            self.stdout.write(f'Resuming after {skip} rows')
+
+        self.imported = self.invalid = 0
+        rows_done = skip
+        start = time.monotonic()
+
+        with open_source(path) as stream:
+            batch = []
+            for index, row in enumerate(read_rows(stream, source_format, nullable)):
+                if index < skip:
+                    continue
+                batch.append((index, row))
+                if len(batch) >= batch_size:
+                    rows_done = self.load_batch(batch, serializer_class, model, checkpoint, use_copy)
+                    batch = []
+                    self.report_progress(rows_done - skip, start)
+            if batch:
+                rows_done = self.load_batch(batch, serializer_class, model, checkpoint, use_copy)
+
+        elapsed = max(time.monotonic() - start, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} {options["table"]} rows '
+            f'({self.invalid} invalid) in {elapsed:.1f}s - {self.imported / elapsed:,.0f} rows/sec'
+        ))
+
+    def guess_format(self, path):
+        name = path[:-3] if path.endswith('.gz') else path
+        if name.endswith('.csv'):
+            return 'csv'
+        if name.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+        raise CommandError('Cannot tell the input format from the file name; pass --format')
+
+    def load_batch(self, batch, serializer_class, model, checkpoint, use_copy):
+        """
+        Validate and write one batch, committing the checkpoint with it.
+        Returns the number of input rows consumed so far.
+        """
+        rows = [{key: value for key, value in row.items() if key != 'id'} for _, row in batch]
+        serializer = serializer_class(data=rows, many=True)
+        if not serializer.is_valid():
+            # errors line up with the input; drop the bad rows and validate the rest
+            valid_rows = []
+            for (index, _), row, errors in zip(batch, rows, serializer.errors):
+                if errors:
+                    self.invalid += 1
+                    if self.invalid <= MAX_REPORTED_ERRORS:
+                        self.stderr.write(f'Row {index + 1}: {errors}')
+                else:
+                    valid_rows.append(row)
+            serializer = serializer_class(data=valid_rows, many=True)
+            serializer.is_valid(raise_exception=True)
+
+        instances = [model(**data) for data in serializer.validated_data]
+
+        rows_done = batch[-1][0] + 1
+        with transaction.atomic():
+            if instances:
+                if use_copy:
+                    self.copy_instances(model, instances)
+                else:
+                    model.objects.bulk_create(instances, batch_size=len(instances))
+                post_bulk_create.send(sender=model, instances=instances)
+            checkpoint.rows_done = rows_done
+            checkpoint.save(update_fields=['rows_done', 'updated_at'])
+
+        self.imported += len(instances)
+        return rows_done
+
+    def copy_instances(self, model, instances):
+        """
+        Stream instances into the table with PostgreSQL ``COPY FROM STDIN``
+
+        ``COPY`` cannot return the generated ids, so they are drawn from the
+        table's sequence first and copied explicitly; the instances end up
+        with their pks set, like after ``bulk_create``.
+        """
+        table = model._meta.db_table
+        pk_column = model._meta.pk.column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                [connection.ops.quote_name(table), pk_column, len(instances)],
+            )
+            for obj, (pk,) in zip(instances, cursor.fetchall()):
+                obj.pk = pk
+
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in instances:
+            values = []
+            for field in fields:
+                value = field.get_db_prep_save(field.pre_save(obj, add=True), connection)
+                values.append('\\N' if value is None else value)
+            writer.writerow(values)
+        buffer.seek(0)
+
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {connection.ops.quote_name(table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+
+    def report_progress(self, rows, start):
+        elapsed = max(time.monotonic() - start, 1e-9)
+        self.stdout.write(f'  {rows:,} rows read, {self.imported:,} imported '
+                          f'({self.imported / elapsed:,.0f} rows/sec)')
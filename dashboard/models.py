@@ -1,3 +1,20 @@
 from django.db import models
 
-# Create your models here.
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a resumable ``import_data`` run.
+
+    Updated in the same transaction as each imported batch, so a resumed
+    import never skips or duplicates rows.
+    """
+    table = models.CharField(max_length=50)
+    source = models.CharField(max_length=500)
+    rows_done = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('table', 'source')
+
+    def __str__(self):
+        return f"{self.table} <- {self.source} ({self.rows_done} rows)"
@@ -1,3 +1,160 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 
-# Create your tests here.
+from books.models import Book
+from dashboard.models import ImportCheckpoint
+from external_api.latest import latest_weather
+from external_api.models import LatestWeather, WeatherData, WeatherHourlyRollup
+from external_api.stats import read_stats
+
+
+class ImportDataTests(TestCase):
+    """
+    Imports must load every valid row, resume after their checkpoint and
+    reach the derived tables, with COPY too
+    """
+
+    def temporary_path(self, suffix):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def write_source(self, rows):
+        path = self.temporary_path('.ndjson')
+        with open(path, 'w') as stream:
+            for row in rows:
+                stream.write(json.dumps(row) + '\n')
+        return path
+
+    def write_csv(self, text):
+        path = self.temporary_path('.csv')
+        with open(path, 'w') as stream:
+            stream.write(text)
+        return path
+
+    def run_import(self, *args, **options):
+        with open(os.devnull, 'w') as devnull:
+            call_command('import_data', *args, stdout=devnull, stderr=devnull, **options)
+
+    def test_import_updates_derived_tables(self):
+        path = self.write_source([
+            {'city': city, 'country': 'GB', 'temperature': float(hour),
+             'fetched_at': f'2024-01-01T{hour:02d}:00:00Z'}
+            for hour in range(5)
+            for city in ('London', 'Leeds')
+        ] + [
+            # Same timestamp as an earlier London row
+            {'city': 'london', 'country': 'GB', 'temperature': 9.0, 'fetched_at': '2024-01-01T04:00:00Z'},
+        ])
+        self.run_import('weather', path, batch_size=4)
+
+        self.assertEqual(WeatherData.objects.count(), 11)
+        self.assertEqual(read_stats()['total_records'], 11)
+        self.assertEqual(sum(WeatherHourlyRollup.objects.values_list('count', flat=True)), 11)
+        self.assertEqual(
+            set(LatestWeather.objects.values_list('reading_id', flat=True)),
+            set(WeatherData.objects.filter(fetched_at__hour=4).exclude(city='London').values_list('id', flat=True)),
+        )
+        latest = {reading['city']: reading['temperature'] for reading in latest_weather()}
+        self.assertEqual(latest, {'london': 9.0, 'Leeds': 4.0})
+
+    def test_csv_export_round_trip(self):
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        WeatherData.objects.create(city='London', country='GB', temperature=1.5, visibility=None, fetched_at=start)
+        WeatherData.objects.create(city='Leeds', country='GB', description='fog, "thick"', visibility=800,
+                                   fetched_at=start + datetime.timedelta(hours=1))
+        fields = [field.attname for field in WeatherData._meta.concrete_fields if field.attname != 'id']
+        exported = list(WeatherData.objects.order_by('fetched_at').values_list(*fields))
+        path = self.temporary_path('.csv')
+        call_command('export_data', 'weather', output=path, stdout=open(os.devnull, 'w'))
+
+        WeatherData.objects.all().delete()
+        self.run_import('weather', path)
+        self.assertEqual(list(WeatherData.objects.order_by('fetched_at').values_list(*fields)), exported)
+
+    def test_import_books(self):
+        path = self.write_csv(
+            'title,author,published_date,description,created_at\n'
+            'Dune,Frank Herbert,1965-08-01,"Spice, sand",2024-01-01T00:00:00Z\n'
+            'Undated,Nobody,,,\n'
+            'Emma,Jane Austen,1815-12-23,,2024-01-02T00:00:00Z\n'
+        )
+        self.run_import('books', path)
+
+        books = {book.title: book for book in Book.objects.all()}
+        self.assertEqual(sorted(books), ['Dune', 'Emma'])
+        self.assertEqual(books['Dune'].description, 'Spice, sand')
+        self.assertEqual(books['Dune'].created_at.isoformat(), '2024-01-01T00:00:00+00:00')
+        checkpoint = ImportCheckpoint.objects.get(table='books', source=path)
+        self.assertEqual(checkpoint.rows_done, 3)
+
+    def test_resume_after_checkpoint(self):
+        path = self.write_source([
+            {'city': f'City {i}', 'country': 'GB', 'fetched_at': '2024-01-01T00:00:00Z'}
+            for i in range(5)
+        ])
+        ImportCheckpoint.objects.create(table='weather', source=path, rows_done=3)
+
+        self.run_import('weather', path, resume=True, batch_size=1)
+        self.assertEqual(sorted(WeatherData.objects.values_list('city', flat=True)), ['City 3', 'City 4'])
+        self.assertEqual(ImportCheckpoint.objects.get(table='weather', source=path).rows_done, 5)
+
+        # Without --resume the import starts over
+        self.run_import('weather', path)
+        self.assertEqual(WeatherData.objects.count(), 7)
+
+
+class ExportTests(TestCase):
+    """
+    Streaming exports in every format, filtered by date and validated
+    """
+
+    def setUp(self):
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        for day, city in enumerate(['London', 'Leeds', 'London']):
+            WeatherData.objects.create(city=city, country='GB', temperature=float(day),
+                                       visibility=None if day else 800,
+                                       fetched_at=start + datetime.timedelta(days=day))
+        Book.objects.create(title='Dune', author='Frank Herbert', published_date=datetime.date(1965, 8, 1))
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.export('/api/external/weather/export/', city='London')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="weather.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        # Newest first, nulls as empty fields
+        self.assertEqual([(row['city'], row['visibility']) for row in rows], [('London', ''), ('London', '800')])
+        self.assertEqual(rows[1]['fetched_at'], '2024-01-01T00:00:00Z')
+
+    def test_ndjson_gzip(self):
+        response, content = self.export('/api/books/export/', format='ndjson', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('filename="books.ndjson.gz"', response['Content-Disposition'])
+        lines = gzip.decompress(content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Dune'])
+
+    def test_date_bounds(self):
+        _, content = self.export('/api/external/weather/export/', format='ndjson',
+                                 start='2024-01-02', end='2024-01-02')
+        self.assertEqual([json.loads(line)['city'] for line in content.decode().splitlines()], ['Leeds'])
+
+        for params in ({'start': 'yesterday'}, {'end': '2024-13-01'}, {'format': 'xml'}):
+            response = self.client.get('/api/external/weather/export/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'weather', start='soon', stdout=open(os.devnull, 'w'))
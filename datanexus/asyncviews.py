@@ -0,0 +1,105 @@
+"""
+Helpers for the async (ASGI) JSON endpoints.
+
+DRF 3.14 views are synchronous, so the async endpoints are plain Django
+``async def`` views. They borrow the matching DRF view class for its
+configuration - queryset, filter backends, paginator and serializer -
+which only *builds* querysets, and evaluate those with the async ORM.
+Under an ASGI server a request waiting on the database or an upstream
+API then holds no worker thread.
+"""
+
+import asyncio
+import json
+import weakref
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .renderers import FastJSONRenderer
+
+renderer = FastJSONRenderer()
+
+_db_semaphores = weakref.WeakKeyDictionary()
+
+
+def json_response(data, status=200):
+    """
+    Render ``data`` exactly as the DRF JSON renderer would
+    """
+    content = renderer.render(data, renderer.media_type, {})
+    return HttpResponse(content, status=status, content_type=renderer.media_type)
+
+
+def async_api_view(methods):
+    """
+    Restrict an async view to ``methods``, hand it a DRF ``Request`` and
+    turn DRF exceptions and ``Http404`` into the usual JSON error responses.
+
+    Like ``@api_view``, views are exempt from CSRF checks. (Django's own
+    ``csrf_exempt``/``require_http_methods`` wrappers are sync-only in 4.2.)
+    """
+    allowed = [method.upper() for method in methods]
+    if 'GET' in allowed and 'HEAD' not in allowed:
+        allowed.append('HEAD')
+
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in allowed:
+                return HttpResponseNotAllowed(allowed)
+            try:
+                return await func(Request(request), *args, **kwargs)
+            except (APIException, Http404) as exc:
+                response = exception_handler(exc, {})
+                return json_response(response.data, status=response.status_code)
+
+        inner.csrf_exempt = True
+        return inner
+
+    return decorator
+
+
+def get_json_body(request):
+    """
+    Decode the JSON body of an async view's request
+    """
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError as exc:
+        raise ParseError(f'JSON parse error - {exc}')
+
+
+def bind_view(view_class, request, **kwargs):
+    """
+    Instantiate a DRF view class for ``request`` without dispatching it
+    """
+    view = view_class()
+    view.request = request
+    view.args = ()
+    view.kwargs = kwargs
+    view.format_kwarg = None
+    view.headers = {}
+    return view
+
+
+def db_slot():
+    """
+    Per-event-loop semaphore bounding concurrent async ORM work.
+
+    Each async ORM call runs on its request's own thread and connection,
+    so thousands of requests coming back from a slow upstream at once
+    would otherwise open thousands of database connections (and, on
+    SQLite, starve each other on the write lock). Capped by
+    ``ASYNC_DB_CONCURRENCY``.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _db_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+        _db_semaphores[loop] = semaphore
+    return semaphore
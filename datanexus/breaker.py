@@ -0,0 +1,180 @@
+"""
+Circuit breaker for calls to an external service.
+
+The breaker watches the outcome and latency of recent calls. Once at
+least ``min_calls`` calls in the last ``window`` seconds have been made
+and ``failure_rate`` of them failed or took longer than ``slow_call``
+seconds, it *opens*: calls are rejected immediately with
+``CircuitOpenError`` instead of waiting on a service that is down. After
+``open_seconds`` it goes *half-open* and lets one probe call through; the
+breaker closes again if the probe succeeds and re-opens if it fails.
+
+State is per process. ``metrics()`` reports the current state, counters
+and recent transitions.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a call while the breaker is open
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and slow-call circuit breaker.
+
+    ``is_failure(exc)`` decides whether an exception raised inside
+    ``guard()`` counts against the service (e.g. timeouts and 5xx do, a
+    404 for an unknown city does not); it may return ``None`` to ignore
+    the call altogether.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=5, window=30, slow_call=5,
+                 open_seconds=30, is_failure=None, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.is_failure = is_failure or (lambda exc: True)
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._state_since = clock()
+        self._probing = False
+        # (finished at, failed) for the calls of the last ``window`` seconds
+        self._outcomes = deque()
+        self._failures = 0
+        self._counters = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'opened': 0}
+        self._transitions = deque(maxlen=20)
+
+    @property
+    def state(self):
+        with self._lock:
+            self._check_open_timeout()
+            return self._state
+
+    def allow(self):
+        """
+        Reserve a call, or raise ``CircuitOpenError``; returns whether the
+        call is the half-open probe
+        """
+        with self._lock:
+            self._check_open_timeout()
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._counters['rejected'] += 1
+            retry_after = max(0.0, self._state_since + self.open_seconds - self.clock())
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record(self, failed, duration, probe=False):
+        """
+        Record a call reserved with ``allow()``; ``failed=None`` just releases it
+        """
+        with self._lock:
+            probe = probe and self._probing and self._state == HALF_OPEN
+            if probe:
+                self._probing = False
+            if failed is None:
+                return
+            slow = duration >= self.slow_call
+            failed = failed or slow
+            self._counters['calls'] += 1
+            self._counters['failures'] += bool(failed)
+            self._counters['slow_calls'] += slow
+
+            if probe:
+                if failed:
+                    self._transition(OPEN, 'probe failed' if not slow else 'probe too slow')
+                else:
+                    self._transition(CLOSED, 'probe succeeded')
+                return
+            if self._state != CLOSED:
+                return
+
+            now = self.clock()
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._failures -= self._outcomes.popleft()[1]
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._transition(OPEN, f'{self._failures}/{calls} calls failed or were slow')
+
+    @contextmanager
+    def guard(self):
+        """
+        Run the body as one call: rejected while open, outcome and time recorded
+        """
+        probe = self.allow()
+        start = self.clock()
+        try:
+            yield
+        except BaseException as exc:
+            failed = self.is_failure(exc) if isinstance(exc, Exception) else None
+            self.record(failed, self.clock() - start, probe)
+            raise
+        self.record(False, self.clock() - start, probe)
+
+    def metrics(self):
+        with self._lock:
+            self._check_open_timeout()
+            now = self.clock()
+            calls = len(self._outcomes)
+            return {
+                'name': self.name,
+                'state': self._state,
+                'state_seconds': round(now - self._state_since, 3),
+                'window_calls': calls,
+                'window_failure_rate': round(self._failures / calls, 4) if calls else 0.0,
+                **self._counters,
+                'transitions': [
+                    {'from': old, 'to': new, 'reason': reason, 'seconds_ago': round(now - at, 3)}
+                    for at, old, new, reason in self._transitions
+                ],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED, 'reset')
+
+    def _check_open_timeout(self):
+        if self._state == OPEN and self.clock() - self._state_since >= self.open_seconds:
+            self._transition(HALF_OPEN, f'open for {self.open_seconds}s')
+
+    def _transition(self, state, reason):
+        if state == self._state:
+            return
+        now = self.clock()
+        self._transitions.append((now, self._state, state, reason))
+        logger.warning(f"Circuit '{self.name}' {self._state} -> {state}: {reason}")
+        self._state = state
+        self._state_since = now
+        self._probing = False
+        if state == OPEN:
+            self._counters['opened'] += 1
+        if state == CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
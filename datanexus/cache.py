@@ -0,0 +1,61 @@
+"""
+In-process cache backend with a memory cap
+"""
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+# Per-cache-name bookkeeping, shared by every thread's backend instance
+# just like LocMemCache's own module-level stores
+_sizes = {}
+_usage = {}
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    ``LocMemCache`` that also caps the total size of the stored values.
+
+    Set ``OPTIONS['MAX_BYTES']``: once the pickled values exceed it, the
+    least recently used entries are evicted. ``MAX_ENTRIES`` culling still
+    applies, but evicts least recently used entries one at a time as well.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 0))
+        self._sizes = _sizes.setdefault(name, {})
+        self._usage = _usage.setdefault(name, {'bytes': 0})
+
+    @property
+    def size_bytes(self):
+        return self._usage['bytes']
+
+    def _evict_lru(self):
+        key, value = self._cache.popitem()
+        self._expire_info.pop(key, None)
+        self._usage['bytes'] -= self._sizes.pop(key, len(value))
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        while self._cache and len(self._cache) >= self._max_entries:
+            self._evict_lru()
+        self._cache[key] = value
+        self._cache.move_to_end(key, last=False)
+        self._expire_info[key] = self.get_backend_timeout(timeout)
+        self._sizes[key] = len(value)
+        self._usage['bytes'] += len(value)
+        while self._max_bytes and self._usage['bytes'] > self._max_bytes and len(self._cache) > 1:
+            self._evict_lru()
+
+    def _delete(self, key):
+        if not super()._delete(key):
+            return False
+        self._usage['bytes'] -= self._sizes.pop(key, 0)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._sizes.clear()
+            self._usage['bytes'] = 0
@@ -0,0 +1,132 @@
+"""
+Conditional GET support (ETag / Last-Modified / Cache-Control) for API views.
+
+Validators are derived from a cheap state query - e.g. ``max(updated_at)``
+plus row count - that runs before the view, so a matching
+``If-None-Match`` / ``If-Modified-Since`` is answered with 304 without
+touching the serializer.
+"""
+
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+
+
+def table_state(queryset, timestamp_field):
+    """
+    Return ``(max(timestamp_field), count)`` for ``queryset`` in one query
+    """
+    state = queryset.order_by().aggregate(last=Max(timestamp_field), count=Count('pk'))
+    return state['last'], state['count']
+
+
+async def atable_state(queryset, timestamp_field):
+    """
+    Async twin of ``table_state``
+    """
+    state = await queryset.order_by().aaggregate(last=Max(timestamp_field), count=Count('pk'))
+    return state['last'], state['count']
+
+
+def get_conditional_state(request):
+    """
+    Return the state computed by ``conditional_get`` for this request, if any
+    """
+    return getattr(request, '_conditional_state', None)
+
+
+def state_etag(request, state, media_format):
+    """
+    Build the ETag for ``state`` as rendered in ``media_format``
+    """
+    last_modified, token = state
+    # Browsable API and JSON renderings of the same URL differ byte-wise
+    stamp = last_modified.isoformat() if last_modified else ''
+    # The query string is left out on purpose: list states cover the whole
+    # table, so every filtered or paginated view of a URL changes exactly
+    # when its unfiltered state does, and sharing the tag is safe. A state
+    # function that depended on the query would have to put it in ``token``.
+    raw = f'{request.path}:{media_format}:{stamp}:{token}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_get(state_func):
+    """
+    Decorate a GET handler with conditional request handling.
+
+    ``state_func(request, *args, **kwargs)`` returns ``(last_modified, token)``
+    describing the current version of the resource, or ``None`` if it does
+    not exist. It is evaluated at most once per request.
+    """
+
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, '_conditional_state'):
+            request._conditional_state = state_func(request, *args, **kwargs)
+        return request._conditional_state
+
+    def etag_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        if state is None:
+            return None
+        renderer = getattr(request, 'accepted_renderer', None)
+        return state_etag(request, state, getattr(renderer, 'format', ''))
+
+    def last_modified_func(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state[0] if state else None
+
+    def decorator(func):
+        func = condition(etag_func=etag_func, last_modified_func=last_modified_func)(func)
+        func = vary_on_headers('Accept')(func)
+        return cache_control(public=True, max_age=settings.API_CACHE_MAX_AGE)(func)
+
+    return decorator
+
+
+def async_conditional_get(state_func, media_format='json'):
+    """
+    ``conditional_get`` for async views, which Django's ``condition``
+    decorator does not support yet.
+
+    ``state_func`` is a coroutine function with the same contract as for
+    ``conditional_get``; ``media_format`` is the view's only rendering.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            state = await state_func(request, *args, **kwargs)
+            request._conditional_state = state
+
+            etag = last_modified = None
+            if state is not None:
+                etag = quote_etag(state_etag(request, state, media_format))
+                if state[0] is not None:
+                    last_modified = timegm(state[0].utctimetuple())
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await func(request, *args, **kwargs)
+
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            patch_vary_headers(response, ('Accept',))
+            patch_cache_control(response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,110 @@
+"""
+Serializer-free list fast path for read-heavy endpoints.
+
+``ModelSerializer.to_representation`` walks every field of every instance.
+For flat serializers whose fields map 1:1 onto model columns the same
+output can be produced straight from ``QuerySet.values()`` rows, which
+skips model instantiation and per-field dispatch entirely.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Serializer fields whose representation of a plain DB value is the value
+# itself (datetimes are handled separately for timezone conversion)
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.DateField,
+    serializers.FloatField,
+    serializers.IntegerField,
+)
+
+
+class FastListMixin:
+    """
+    Serve ``list()`` from ``values()`` rows when the serializer is flat.
+
+    The rows are shaped exactly like the serializer's output, so responses
+    are byte-identical to the regular path. Disabled by setting
+    ``API_FAST_SERIALIZATION = False``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_fast_fields()
+        if not settings.API_FAST_SERIALIZATION or fields is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Keep annotations (e.g. search rank) so the paginator can build cursors
+        extra = [name for name in queryset.query.annotations if name not in fields]
+        rows = queryset.values(*fields, *extra)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.rows_to_representation(page, fields))
+
+        return Response(self.rows_to_representation(rows, fields))
+
+    async def alist(self, request):
+        """
+        Async twin of ``list()`` returning the response data, for async views
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        fields = self.get_fast_fields()
+
+        if settings.API_FAST_SERIALIZATION and fields is not None:
+            extra = [name for name in queryset.query.annotations if name not in fields]
+            page = await paginator.apaginate_queryset(queryset.values(*fields, *extra), request)
+            data = self.rows_to_representation(page, fields)
+        else:
+            page = await paginator.apaginate_queryset(queryset, request)
+            data = self.get_serializer(page, many=True).data
+
+        return paginator.get_paginated_response(data).data
+
+    def get_fast_fields(self):
+        """
+        Return the serializer's field names, or ``None`` if any field needs
+        real serializer logic (custom source, nested, method field...)
+        """
+        if not hasattr(self, '_fast_fields'):
+            fast_fields = []
+            for name, field in self.get_serializer_class()().fields.items():
+                if field.write_only:
+                    continue
+                if (
+                    field.source != name
+                    or not isinstance(field, PASSTHROUGH_FIELDS + (serializers.DateTimeField,))
+                    or getattr(field, 'format', None) is not None
+                ):
+                    fast_fields = None
+                    break
+                fast_fields.append(name)
+            self._fast_fields = fast_fields
+        return self._fast_fields
+
+    def rows_to_representation(self, rows, fields):
+        """
+        Map ``values()`` rows onto output dicts in the serializer's field order
+        """
+        current_timezone = timezone.get_current_timezone()
+        if not settings.USE_TZ or timezone.get_current_timezone_name() == 'UTC':
+            # Aware UTC datetimes already encode as the serializer would
+            return [{name: row[name] for name in fields} for row in rows]
+
+        datetime_fields = {
+            name for name, field in self.get_serializer_class()().fields.items()
+            if isinstance(field, serializers.DateTimeField)
+        }
+        data = []
+        for row in rows:
+            item = {name: row[name] for name in fields}
+            for name in datetime_fields:
+                if item[name] is not None:
+                    item[name] = item[name].astimezone(current_timezone)
+            data.append(item)
+        return data
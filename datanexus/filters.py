@@ -0,0 +1,66 @@
+"""
+Query-string filtering for the list endpoints.
+
+Views declare ``query_filters = {param: (lookup, parser)}``; each parser
+turns the raw string into a value (returning ``None`` or raising
+``ValueError`` when it is invalid). Every lookup is chosen to be served by
+one of the composite indexes on the model.
+"""
+
+import math
+from functools import partial
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .export import parse_bound
+
+parse_start = parse_bound
+parse_end = partial(parse_bound, end=True)
+
+
+def parse_finite_float(value):
+    """
+    ``float(value)``, rejecting ``nan`` and infinities, which would build
+    filters that silently match nothing
+    """
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'Not a finite number: {value}')
+    return number
+
+
+def parse_query_filters(query_params, query_filters):
+    """
+    ``{lookup: value}`` for the ``query_filters`` present in
+    ``query_params``; raises ``ValidationError`` listing the invalid ones
+    """
+    filters = {}
+    errors = {}
+    for param, (lookup, parser) in query_filters.items():
+        raw = query_params.get(param)
+        if raw in (None, ''):
+            continue
+        try:
+            value = parser(raw)
+        except (TypeError, ValueError):
+            value = None
+        if value is None:
+            errors[param] = [f'Invalid value "{raw}"']
+        else:
+            filters[lookup] = value
+
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+    Apply the view's ``query_filters`` from the request query string
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = parse_query_filters(request.query_params, getattr(view, 'query_filters', {}))
+        return queryset.filter(**filters) if filters else queryset
+
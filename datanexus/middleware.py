@@ -0,0 +1,118 @@
+"""
+Project middleware
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .routers import begin_request, choose_replica, end_request, iter_with_state, replica_aliases
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively under ASGI.
+
+    WhiteNoise's middleware is sync-only, which makes Django adapt the whole
+    chain below it and run every async view through ``async_to_sync`` on a
+    thread. Static files are looked up in memory, so only serving one (or
+    the lookup itself with ``WHITENOISE_AUTOREFRESH``) needs to leave the
+    event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests read from a replica, with read-your-writes stickiness.
+
+    A client that sends an unsafe request, or whose request writes anything,
+    gets a ``REPLICA_PIN_COOKIE`` cookie that sends its reads to the primary
+    for the next ``REPLICA_PIN_SECONDS``, covering replication lag.
+
+    Views that only read but take their input by POST (e.g. long id lists)
+    can set ``replica_safe = True`` to be treated like a GET.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = begin_request(self.use_replica(request))
+        request._db_routing = state
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = begin_request(self.use_replica(request))
+        request._db_routing = state
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.process_response(request, response, state)
+
+    def use_replica(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = request._db_routing
+        view_class = getattr(view_func, 'cls', view_func)
+        state.replica_safe = getattr(view_class, 'replica_safe', False)
+        if (
+            state.replica_safe
+            and state.read_alias is None
+            and not state.wrote
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            state.read_alias = choose_replica()
+
+    def process_response(self, request, response, state):
+        if not replica_aliases():
+            return response
+        if response.streaming and not getattr(response, 'is_async', False):
+            response.streaming_content = iter_with_state(response.streaming_content, state)
+        unsafe = request.method not in SAFE_METHODS and not state.replica_safe
+        if state.wrote or unsafe:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,187 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are located with a ``WHERE (ordering_field, id) < (value, pk)``
+seek on a composite index instead of ``OFFSET``, so every page costs the
+same no matter how deep it is and no ``COUNT(*)`` is ever issued.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination over the model's default ordering plus an
+    ``id`` tiebreaker (e.g. ``-created_at, -id``).
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, queryset):
+        """
+        Return ``(field_name, descending)`` for the leading ordering field
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        field = ordering[0] if ordering else '-pk'
+        if field.startswith('-'):
+            return field[1:], True
+        return field, False
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async twin of ``paginate_queryset`` for async views
+        """
+        queryset = self.get_page_queryset(queryset, request)
+        return self.finish_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the seek query for the requested page, one row longer than
+        the page so ``finish_page`` can tell whether another page follows
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.field, self.descending = self.get_ordering(queryset)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor.get('r'))
+
+        # Reverse pages walk the index the other way and flip back afterwards
+        descending = self.descending != self.reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+        if self.cursor is not None:
+            lookup = 'lt' if descending else 'gt'
+            value, pk = self.cursor['v'], self.cursor['id']
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'id__{lookup}': pk})
+            )
+
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            return {
+                'v': self.clean_cursor_value(cursor['v']),
+                'id': self.clean_cursor_pk(cursor['id']),
+                'r': bool(cursor.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def clean_cursor_value(self, value):
+        """
+        The cursor's ordering value as the ordering field's Python type
+        """
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise ValueError(value)
+        name = self.model._meta.pk.name if self.field == 'pk' else self.field
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    @staticmethod
+    def clean_cursor_pk(pk):
+        if not isinstance(pk, int) or isinstance(pk, bool) or not 0 < pk < 2 ** 63:
+            raise ValueError(pk)
+        return pk
+
+    def encode_cursor(self, obj, reverse=False):
+        # Rows are model instances, or dicts when the view pages over values()
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        payload = {'v': value, 'id': pk}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode('ascii')
+        token = base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
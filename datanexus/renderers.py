@@ -0,0 +1,57 @@
+"""
+JSON renderer backed by orjson when it is installed
+"""
+
+import re
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Number forms where orjson and json.dumps disagree (1e16 vs 1e+16,
+# 1.5e-7 vs 1.5e-07, 0.00001 vs 1e-05). Any match - even inside a string -
+# sends the payload through the stock encoder so output stays byte-identical.
+AMBIGUOUS_NUMBER_RE = re.compile(rb'\de-?\d|0\.0000')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in ``JSONRenderer`` that encodes with orjson.
+
+    Produces the same bytes as ``JSONRenderer`` with the default compact,
+    unicode, strict settings; any other configuration, an ``indent``
+    request, or a payload orjson cannot reproduce exactly falls back to
+    the parent implementation.
+    """
+
+    orjson_options = orjson.OPT_UTC_Z if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (
+            orjson is None
+            or not api_settings.COMPACT_JSON
+            or not api_settings.UNICODE_JSON
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=encoders.JSONEncoder().default, option=self.orjson_options
+            )
+        except (TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if AMBIGUOUS_NUMBER_RE.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer's escaping of the JavaScript line terminators
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,104 @@
+"""
+Primary / read-replica database routing.
+
+Replicas are configured with ``DATABASE_REPLICA_URLS`` and appear in
+``DATABASES`` as ``replica0``, ``replica1``... Reads are only sent to a
+replica while ``ReplicaRoutingMiddleware`` has marked the current request
+as replica-safe (a GET/HEAD/OPTIONS from a client that has not written
+recently) or a view marked ``replica_safe``; everything else - writes,
+unsafe requests, management commands, workers - uses ``default``. Once
+anything is written during a request, the rest of that request reads from
+the primary as well, as do reads inside an open transaction on
+``default``. Migrations only run on ``default``, and in tests the
+replicas mirror its test database.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """
+    Per-request routing decision shared by the middleware and the router
+    """
+
+    def __init__(self, read_alias=None):
+        self.read_alias = read_alias
+        self.wrote = False
+        self.replica_safe = False
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+def choose_replica():
+    aliases = replica_aliases()
+    return random.choice(aliases) if aliases else None
+
+
+def begin_request(use_replica):
+    """
+    Start routing for a request; returns a token for ``end_request``
+    """
+    # One replica per request so its reads see a single consistent snapshot
+    state = RoutingState(choose_replica() if use_replica else None)
+    return state, _routing.set(state)
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def iter_with_state(content, state):
+    """
+    Re-enter ``state`` around each step of a streaming response body, which
+    is consumed after the middleware has already returned
+    """
+    iterator = iter(content)
+    while True:
+        token = _routing.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _routing.reset(token)
+        yield chunk
+
+
+class ReplicaRouter:
+    """
+    Send reads to the request's replica, if any, and writes to ``default``
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or connections['default'].in_atomic_block:
+            # A replica cannot see the primary's uncommitted writes
+            return None
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Read your own writes for the rest of the request
+            state.read_alias = None
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        aliases = {'default', *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication
+        return db == 'default'
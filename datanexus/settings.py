@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,7 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'datanexus.middleware.StaticFilesMiddleware',
+    'datanexus.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,6 +95,56 @@ database_url = config('DATABASE_URL', default=None)
 if database_url:
     DATABASES['default'] = dj_database_url.parse(database_url)
 
+# Read replicas (comma-separated URLs) become "replica0", "replica1"...; safe
+# requests read from one of them and writes always go to "default". Tests
+# point them at the primary's test database instead of creating their own.
+for index, replica_url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    DATABASES[f'replica{index}'] = dj_database_url.parse(replica_url, test_options={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['datanexus.routers.ReplicaRouter']
+
+# After a client writes, its reads stay on the primary this long (replication lag)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=15, cast=int)
+REPLICA_PIN_COOKIE = 'db_primary_pin'
+
+
+# Caches
+# "api" holds rendered API responses. It defaults to a per-process LRU cache capped
+# by entries and bytes; point API_CACHE_BACKEND/API_CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) for multiple nodes.
+API_CACHE_BACKEND = config('API_CACHE_BACKEND', default='datanexus.cache.BoundedLocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': API_CACHE_BACKEND,
+        'LOCATION': config('API_CACHE_LOCATION', default='datanexus-api'),
+        'TIMEOUT': config('API_CACHE_TIMEOUT', default=3600, cast=int),
+    },
+}
+
+# "weather" holds upstream weather responses (see external_api.services)
+WEATHER_CACHE_TTL = config('WEATHER_CACHE_TTL', default=300, cast=int)
+WEATHER_CACHE_STALE_TTL = config('WEATHER_CACHE_STALE_TTL', default=60, cast=int)
+WEATHER_CACHE_COORD_PRECISION = config('WEATHER_CACHE_COORD_PRECISION', default=2, cast=int)
+
+CACHES['weather'] = {
+    'BACKEND': 'datanexus.cache.BoundedLocMemCache',
+    'LOCATION': 'datanexus-weather',
+    'TIMEOUT': WEATHER_CACHE_TTL + WEATHER_CACHE_STALE_TTL,
+    'OPTIONS': {
+        'MAX_ENTRIES': config('WEATHER_CACHE_MAX_ENTRIES', default=1000, cast=int),
+    },
+}
+
+if API_CACHE_BACKEND == 'datanexus.cache.BoundedLocMemCache':
+    CACHES['api']['OPTIONS'] = {
+        'MAX_ENTRIES': config('API_CACHE_MAX_ENTRIES', default=10000, cast=int),
+        'MAX_BYTES': config('API_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -145,8 +196,103 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST Framework
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'datanexus.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Serve flat list endpoints straight from values() rows instead of ModelSerializer
+API_FAST_SERIALIZATION = config('API_FAST_SERIALIZATION', default=True, cast=bool)
+
+# Keyset pagination for list endpoints (?page_size= is capped at API_MAX_PAGE_SIZE)
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Cache-Control max-age (seconds) on conditional GET responses; proxies revalidate after it
+API_CACHE_MAX_AGE = config('API_CACHE_MAX_AGE', default=5, cast=int)
+
+# Rows fetched per round trip when streaming exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Rows validated and written per transaction by manage.py import_data
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=5000, cast=int)
+
+# Seconds a gap in the book change-feed sequence may be an uncommitted write
+# (backends other than PostgreSQL/SQLite); compaction keeps younger entries
+CHANGE_FEED_GAP_TIMEOUT = config('CHANGE_FEED_GAP_TIMEOUT', default=30, cast=int)
+
+# Max ids per /api/books/batch/ request
+BOOK_BATCH_MAX_IDS = config('BOOK_BATCH_MAX_IDS', default=1000, cast=int)
+
+# Bulk book endpoint: max operations per request and rows per INSERT/UPDATE batch
+BOOK_BULK_MAX_ITEMS = config('BOOK_BULK_MAX_ITEMS', default=100000, cast=int)
+BOOK_BULK_BATCH_SIZE = config('BOOK_BULK_BATCH_SIZE', default=1000, cast=int)
+
 # External API Configuration
 OPENWEATHER_API_KEY = config('OPENWEATHER_API_KEY', default='')
+OPENWEATHER_BASE_URL = config(
+    'OPENWEATHER_BASE_URL', default='https://api.openweathermap.org/data/2.5/weather'
+)
+# Seconds to establish a connection / to wait for the response
+OPENWEATHER_CONNECT_TIMEOUT = config('OPENWEATHER_CONNECT_TIMEOUT', default=3.05, cast=float)
+OPENWEATHER_TIMEOUT = config('OPENWEATHER_TIMEOUT', default=10, cast=float)
+# Retries on connection errors, 429, 502, 503 and 504, with jittered
+# exponential backoff, or after Retry-After (capped at OPENWEATHER_RETRY_AFTER_MAX)
+OPENWEATHER_RETRIES = config('OPENWEATHER_RETRIES', default=3, cast=int)
+OPENWEATHER_BACKOFF_FACTOR = config('OPENWEATHER_BACKOFF_FACTOR', default=0.5, cast=float)
+OPENWEATHER_BACKOFF_MAX = config('OPENWEATHER_BACKOFF_MAX', default=8, cast=float)
+OPENWEATHER_RETRY_AFTER_MAX = config('OPENWEATHER_RETRY_AFTER_MAX', default=10, cast=float)
+# Keep-alive connections the sync client keeps per worker process
+OPENWEATHER_POOL_SIZE = config('OPENWEATHER_POOL_SIZE', default=20, cast=int)
+# Upstream connections the async client may hold open per worker
+OPENWEATHER_MAX_CONNECTIONS = config('OPENWEATHER_MAX_CONNECTIONS', default=1000, cast=int)
+# OpenWeather circuit breaker: open once at least WEATHER_BREAKER_MIN_CALLS calls
+# in the last WEATHER_BREAKER_WINDOW_SECONDS have been made and this share of
+# them failed or took WEATHER_BREAKER_SLOW_CALL_SECONDS or longer; probe again
+# after WEATHER_BREAKER_OPEN_SECONDS
+WEATHER_BREAKER_FAILURE_RATE = config('WEATHER_BREAKER_FAILURE_RATE', default=0.5, cast=float)
+WEATHER_BREAKER_MIN_CALLS = config('WEATHER_BREAKER_MIN_CALLS', default=5, cast=int)
+WEATHER_BREAKER_WINDOW_SECONDS = config('WEATHER_BREAKER_WINDOW_SECONDS', default=30, cast=int)
+WEATHER_BREAKER_SLOW_CALL_SECONDS = config('WEATHER_BREAKER_SLOW_CALL_SECONDS', default=5, cast=float)
+WEATHER_BREAKER_OPEN_SECONDS = config('WEATHER_BREAKER_OPEN_SECONDS', default=30, cast=int)
+# Cache alias shared by all workers (e.g. a Redis or database cache) used to
+# coalesce concurrent fetches of one city across processes; empty = per process
+WEATHER_SINGLE_FLIGHT_CACHE = config('WEATHER_SINGLE_FLIGHT_CACHE', default='')
+WEATHER_SINGLE_FLIGHT_TIMEOUT = config('WEATHER_SINGLE_FLIGHT_TIMEOUT', default=15, cast=int)
+# manage.py weather_ingest: upstream calls per minute (OpenWeather's free plan
+# allows 60) and burst size, cities per fetch and per bulk insert, the longest
+# a fetched reading waits to be inserted, concurrent calls, how often the
+# watchlist is re-read, and the first retry delay after a failed fetch
+# (doubling per consecutive failure, capped at the interval)
+WEATHER_INGEST_RATE_PER_MINUTE = config('WEATHER_INGEST_RATE_PER_MINUTE', default=60, cast=float)
+WEATHER_INGEST_BURST = config('WEATHER_INGEST_BURST', default=10, cast=int)
+WEATHER_INGEST_BATCH_SIZE = config('WEATHER_INGEST_BATCH_SIZE', default=50, cast=int)
+WEATHER_INGEST_FLUSH_SECONDS = config('WEATHER_INGEST_FLUSH_SECONDS', default=5, cast=int)
+WEATHER_INGEST_CONCURRENCY = config('WEATHER_INGEST_CONCURRENCY', default=10, cast=int)
+WEATHER_INGEST_RELOAD_SECONDS = config('WEATHER_INGEST_RELOAD_SECONDS', default=60, cast=int)
+WEATHER_INGEST_RETRY_SECONDS = config('WEATHER_INGEST_RETRY_SECONDS', default=30, cast=int)
+# weather/fetch/batch/: max locations per request and concurrent upstream calls
+WEATHER_BATCH_MAX_LOCATIONS = config('WEATHER_BATCH_MAX_LOCATIONS', default=500, cast=int)
+WEATHER_BATCH_CONCURRENCY = config('WEATHER_BATCH_CONCURRENCY', default=20, cast=int)
+# Keep the serialized weather/latest/ list in memory until the latest
+# readings change
+WEATHER_LATEST_SNAPSHOT = config('WEATHER_LATEST_SNAPSHOT', default=True, cast=bool)
+# weather/analytics/: memory for the per-worker NumPy columns (least recently
+# used cities are evicted beyond it) and how often a cached city is reloaded
+WEATHER_ANALYTICS_MEMORY_MB = config('WEATHER_ANALYTICS_MEMORY_MB', default=256, cast=int)
+WEATHER_ANALYTICS_RELOAD_SECONDS = config('WEATHER_ANALYTICS_RELOAD_SECONDS', default=3600, cast=int)
+# manage.py weather_retention: readings older than WEATHER_RETENTION_DAYS are
+# removed (0 keeps everything), a whole month at a time on a partitioned
+# PostgreSQL table and WEATHER_PURGE_CHUNK_SIZE rows at a time otherwise;
+# monthly partitions are created WEATHER_PARTITION_MONTHS_AHEAD months ahead
+WEATHER_RETENTION_DAYS = config('WEATHER_RETENTION_DAYS', default=0, cast=int)
+WEATHER_PURGE_CHUNK_SIZE = config('WEATHER_PURGE_CHUNK_SIZE', default=5000, cast=int)
+WEATHER_PARTITION_MONTHS_AHEAD = config('WEATHER_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+# Async ORM calls an ASGI worker runs at once (each holds a DB connection)
+ASYNC_DB_CONCURRENCY = config('ASYNC_DB_CONCURRENCY', default=10, cast=int)
 
 # Production Security Settings
 if not DEBUG:
@@ -0,0 +1,19 @@
+"""
+Signals for bulk write paths that bypass ``Model.save()``.
+
+``bulk_create``/``bulk_update`` do not send ``post_save``, so code that
+writes in bulk (the books bulk endpoint, ``import_data``...) sends these
+instead, letting apps keep derived tables in sync. Each is sent inside
+the writing transaction with ``sender=<model>`` and ``instances=<list>``.
+"""
+
+from django.dispatch import Signal
+
+# After instances have been inserted (pks are set where the backend returns them)
+post_bulk_create = Signal()
+
+# Before instances are modified in memory and written; they still hold DB values
+pre_bulk_update = Signal()
+
+# After the modified instances have been written
+post_bulk_update = Signal()
@@ -0,0 +1,137 @@
+"""
+Request coalescing ("single flight").
+
+Concurrent calls for the same key share one execution: the first caller
+runs the function and every caller that arrives while it is in flight
+gets the same result (or exception). With a ``cache_alias`` pointing at a
+cache shared by all workers (Redis, memcached or Django's database cache)
+the leaders of different processes also coordinate through a short-lived
+lock in that cache, and only one of them does the work.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+
+    ``lock_timeout`` bounds how long a cross-process lock is held, and so
+    how long callers in other processes wait for its result before doing
+    the work themselves. Results shared across processes must be picklable.
+    """
+
+    def __init__(self, cache_alias=None, lock_timeout=10, poll_interval=0.05):
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = weakref.WeakKeyDictionary()
+
+    def do(self, key, func, *args):
+        """
+        Run ``func(*args)`` unless a call for ``key`` is already in flight,
+        in which case wait for that call and return its result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_shared(key, func, *args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, func, *args):
+        """
+        Async ``do``: ``func`` is a coroutine function. Calls are coalesced
+        per event loop, and cancelling one waiter doesn't cancel the
+        shared call.
+        """
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._arun_shared(key, func, *args))
+            tasks[key] = task
+            task.add_done_callback(lambda _: tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _keys(self, key):
+        return f"singleflight:{key}:lock", f"singleflight:{key}:result"
+
+    def _run_shared(self, key, func, *args):
+        if not self.cache_alias:
+            return func(*args)
+
+        cache = caches[self.cache_alias]
+        lock_key, result_key = self._keys(key)
+        deadline = time.monotonic() + self.lock_timeout
+        while not cache.add(lock_key, 1, timeout=self.lock_timeout):
+            # Another process is running it: wait for its result, or for
+            # the lock to go away without one (it failed)
+            time.sleep(self.poll_interval)
+            result = cache.get(result_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if time.monotonic() >= deadline:
+                return func(*args)
+
+        try:
+            cache.delete(result_key)
+            result = func(*args)
+            cache.set(result_key, result, timeout=self.lock_timeout)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    async def _arun_shared(self, key, func, *args):
+        if not self.cache_alias:
+            return await func(*args)
+
+        cache = caches[self.cache_alias]
+        lock_key, result_key = self._keys(key)
+        deadline = time.monotonic() + self.lock_timeout
+        while not await cache.aadd(lock_key, 1, timeout=self.lock_timeout):
+            await asyncio.sleep(self.poll_interval)
+            result = await cache.aget(result_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if time.monotonic() >= deadline:
+                return await func(*args)
+
+        try:
+            await cache.adelete(result_key)
+            result = await func(*args)
+            await cache.aset(result_key, result, timeout=self.lock_timeout)
+            return result
+        finally:
+            await cache.adelete(lock_key)
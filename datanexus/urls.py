@@ -23,5 +23,7 @@ urlpatterns = [
     path('', dashboard_views.home, name='home'),
     path('api/books/', include('books.urls')),
     path('api/external/', include('external_api.urls')),
+    path('api/async/books/', include('books.async_urls')),
+    path('api/async/external/', include('external_api.async_urls')),
     path('dashboard/', include('dashboard.urls')),
 ]
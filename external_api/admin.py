@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import WeatherData
+from .models import WatchedCity, WeatherData
 
 @admin.register(WeatherData)
 class WeatherDataAdmin(admin.ModelAdmin):
@@ -8,3 +8,10 @@ class WeatherDataAdmin(admin.ModelAdmin):
     search_fields = ('city', 'country', 'description')
     readonly_fields = ('fetched_at',)
     ordering = ('-fetched_at',)
+
+@admin.register(WatchedCity)
+class WatchedCityAdmin(admin.ModelAdmin):
+    list_display = ('city', 'country', 'refresh_interval', 'priority', 'is_active', 'last_fetched_at', 'consecutive_failures')
+    list_filter = ('is_active', 'country')
+    search_fields = ('city', 'country')
+    readonly_fields = ('last_fetched_at', 'consecutive_failures', 'created_at')
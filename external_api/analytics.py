@@ -0,0 +1,292 @@
+"""
+Process-local columnar cache for weather analytics.
+
+``ColumnarStore`` holds the readings of recently used cities as NumPy
+arrays (fetch time plus one ``float32`` column per metric), sorted by
+time, so percentiles, moving averages and correlations are vectorized
+operations over contiguous memory instead of Python loops over ORM rows.
+
+A city is loaded with one ``values_list`` query on first use, up to the
+highest id seen so far. Before every lookup a single query on the primary
+key fetches the rows inserted since (by any process) and appends them to
+the cities in memory. Deleted readings, and rows whose transaction
+committed after a newer one was seen, are picked up when the city is
+reloaded every ``WEATHER_ANALYTICS_RELOAD_SECONDS``. Cities are evicted
+least recently used first once the arrays exceed
+``WEATHER_ANALYTICS_MEMORY_MB``; cities without readings are not kept.
+
+NumPy is optional: without it ``analytics_available()`` is false and the
+endpoint answers 503.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from datanexus.singleflight import SingleFlight
+from .models import WeatherData
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - analytics need NumPy
+    np = None
+
+ANALYTICS_METRICS = ('temperature', 'feels_like', 'humidity', 'pressure', 'wind_speed')
+# Rows read per query while loading or catching up
+CHUNK_SIZE = 20000
+
+
+def analytics_available() -> bool:
+    return np is not None
+
+
+def _to_columns(rows):
+    """
+    ``values_list`` rows of (fetched_at, *metrics) as NumPy arrays
+    """
+    times = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    values = np.array([row[1:] for row in rows], dtype=np.float32).reshape(len(rows), len(ANALYTICS_METRICS))
+    return times, {metric: values[:, i].copy() for i, metric in enumerate(ANALYTICS_METRICS)}
+
+
+class CityColumns:
+    """
+    Growable, time-sorted arrays of one city's readings
+
+    ``data`` is replaced as a whole on every change and rows are only ever
+    written past the published length, so a reader holding ``data`` sees
+    a consistent snapshot while another thread appends.
+    """
+
+    def __init__(self, city):
+        self.city = city
+        self.loaded_at = time.monotonic()
+        # (length, times, {metric: values}); arrays may have spare capacity
+        self.data = (
+            0, np.empty(0, dtype=np.float64),
+            {metric: np.empty(0, dtype=np.float32) for metric in ANALYTICS_METRICS},
+        )
+
+    @property
+    def nbytes(self) -> int:
+        _, times, columns = self.data
+        return times.nbytes + sum(values.nbytes for values in columns.values())
+
+    def append(self, times, columns):
+        """
+        Add rows, keeping the arrays sorted by time
+        """
+        if not len(times):
+            return
+        length, held_times, held_columns = self.data
+        end = length + len(times)
+        if end > len(held_times):
+            # Grow geometrically so appends are amortized O(1)
+            capacity = max(end, 2 * len(held_times), 1024)
+            held_times = self._grow(held_times, length, capacity)
+            held_columns = {metric: self._grow(values, length, capacity) for metric, values in held_columns.items()}
+
+        in_order = (not length or times.min() >= held_times[length - 1]) and not np.any(np.diff(times) < 0)
+        held_times[length:end] = times
+        for metric, values in columns.items():
+            held_columns[metric][length:end] = values
+        if not in_order:
+            # Back-filled readings: re-sort into new arrays
+            order = np.argsort(held_times[:end], kind='stable')
+            held_times = held_times[:end][order]
+            held_columns = {metric: values[:end][order] for metric, values in held_columns.items()}
+        self.data = (end, held_times, held_columns)
+
+    @staticmethod
+    def _grow(values, length, capacity):
+        grown = np.empty(capacity, dtype=values.dtype)
+        grown[:length] = values[:length]
+        return grown
+
+    def window(self, start=None, end=None):
+        """
+        ``(times, {metric: values})`` of the readings in ``[start, end)``
+        """
+        length, times, columns = self.data
+        times = times[:length]
+        lo = 0 if start is None else int(np.searchsorted(times, start.timestamp(), side='left'))
+        hi = length if end is None else int(np.searchsorted(times, end.timestamp(), side='left'))
+        return times[lo:hi], {metric: values[lo:hi] for metric, values in columns.items()}
+
+
+class ColumnarStore:
+    """
+    LRU cache of ``CityColumns`` within a memory budget
+    """
+
+    def __init__(self, memory_bytes, reload_seconds):
+        self.memory_bytes = memory_bytes
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        # Held while the high-water mark moves, so loads don't miss rows
+        self._sync_lock = threading.Lock()
+        self._cities = OrderedDict()
+        self._high_water = None
+        self._flights = SingleFlight()
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0, 'appended': 0}
+
+    def _city_rows(self, city, after, upto):
+        readings = WeatherData.objects.filter(city=city, id__gt=after, id__lte=upto)
+        return readings.order_by('fetched_at', 'id').values_list('fetched_at', *ANALYTICS_METRICS)
+
+    def get(self, city):
+        """
+        Up to date columns for ``city``
+        """
+        self._flights.do('catch-up', self._catch_up)
+        with self._lock:
+            columns = self._cities.get(city)
+            if columns is not None and time.monotonic() - columns.loaded_at < self.reload_seconds:
+                self._cities.move_to_end(city)
+                self.stats['hits'] += 1
+                return columns
+        return self._flights.do(f'load:{city}', self._load, city)
+
+    def _catch_up(self):
+        """
+        Append the rows inserted since the last call to the cities held
+        """
+        with self._sync_lock:
+            if self._high_water is None:
+                last = WeatherData.objects.order_by('-id').values_list('id', flat=True).first()
+                self._high_water = last or 0
+                return
+            while True:
+                rows = list(
+                    WeatherData.objects.filter(id__gt=self._high_water).order_by('id')
+                    .values_list('id', 'city', 'fetched_at', *ANALYTICS_METRICS)[:CHUNK_SIZE]
+                )
+                if not rows:
+                    return
+                self._high_water = rows[-1][0]
+                by_city = {}
+                for row in rows:
+                    by_city.setdefault(row[1], []).append(row[2:])
+                with self._lock:
+                    for city, city_rows in by_city.items():
+                        columns = self._cities.get(city)
+                        if columns is not None:
+                            columns.append(*_to_columns(city_rows))
+                            self.stats['appended'] += len(city_rows)
+                if len(rows) < CHUNK_SIZE:
+                    return
+
+    def _load(self, city):
+        columns = CityColumns(city)
+        bound = self._high_water
+        chunk = []
+        for row in self._city_rows(city, 0, bound).iterator(chunk_size=CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == CHUNK_SIZE:
+                columns.append(*_to_columns(chunk))
+                chunk = []
+        if chunk:
+            columns.append(*_to_columns(chunk))
+
+        with self._sync_lock:
+            if self._high_water > bound:
+                # A catch-up ran meanwhile without this city
+                rows = list(self._city_rows(city, bound, self._high_water))
+                if rows:
+                    columns.append(*_to_columns(rows))
+            if not columns.data[0]:
+                # Not kept: empty arrays cost no budget, so requests for
+                # arbitrary city names would pile up without ever being evicted
+                return columns
+            with self._lock:
+                self._cities.pop(city, None)
+                self._cities[city] = columns
+                self.stats['loads'] += 1
+                self._evict()
+        return columns
+
+    def _evict(self):
+        total = sum(columns.nbytes for columns in self._cities.values())
+        # The most recently used city stays even if it alone is over budget
+        while total > self.memory_bytes and len(self._cities) > 1:
+            _, columns = self._cities.popitem(last=False)
+            total -= columns.nbytes
+            self.stats['evictions'] += 1
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ColumnarStore:
+    """
+    This process's ``ColumnarStore``
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ColumnarStore(
+                settings.WEATHER_ANALYTICS_MEMORY_MB * 1024 * 1024,
+                settings.WEATHER_ANALYTICS_RELOAD_SECONDS,
+            )
+        return _store
+
+
+def _number(value):
+    value = float(value)
+    return round(value, 2) if np.isfinite(value) else None
+
+
+def analyze(columns, metrics, start=None, end=None, percentiles=(5, 25, 50, 75, 95),
+            window_hours=24.0, points=100):
+    """
+    Summary, percentiles, pairwise correlations and a time-windowed moving
+    average (sampled at ``points`` evenly spaced readings) of ``metrics``
+    """
+    times, values = columns.window(start, end)
+    count = len(times)
+    result = {'city': columns.city, 'count': count, 'metrics': {}, 'correlations': {}, 'moving_average': []}
+    if not count:
+        return result
+
+    series = {metric: values[metric].astype(np.float64) for metric in metrics}
+    means = {metric: data.mean() for metric, data in series.items()}
+    stds = {metric: data.std() for metric, data in series.items()}
+    for metric, data in series.items():
+        result['metrics'][metric] = {
+            'mean': _number(means[metric]),
+            'std': _number(stds[metric]),
+            'min': _number(data.min()),
+            'max': _number(data.max()),
+            'percentiles': {
+                f'p{percentile:g}': _number(value)
+                for percentile, value in zip(percentiles, np.percentile(data, percentiles))
+            },
+        }
+
+    # Pearson correlation of each pair; None when a metric is constant
+    centered = {metric: data - means[metric] for metric, data in series.items()}
+    for i, first in enumerate(metrics):
+        for second in metrics[i + 1:]:
+            scale = count * stds[first] * stds[second]
+            correlation = np.dot(centered[first], centered[second]) / scale if scale else np.nan
+            result['correlations'][f'{first}:{second}'] = _number(correlation)
+
+    # Mean over (t - window, t] at each sampled reading, from prefix sums
+    samples = np.unique(np.linspace(0, count - 1, min(points, count)).round().astype(np.int64))
+    firsts = np.searchsorted(times, times[samples] - window_hours * 3600, side='right')
+    sizes = samples + 1 - firsts
+    averages = {}
+    for metric, data in series.items():
+        sums = np.concatenate(([0.0], np.cumsum(data)))
+        averages[metric] = (sums[samples + 1] - sums[firsts]) / sizes
+    result['moving_average'] = [
+        {
+            'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(times[sample])),
+            **{metric: _number(averages[metric][position]) for metric in metrics},
+        }
+        for position, sample in enumerate(samples)
+    ]
+    return result
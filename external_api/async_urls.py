@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+app_name = 'external_api_async'
+
+urlpatterns = [
+    path('weather/', async_views.weather_list, name='weather-list'),
+    path('weather/<int:pk>/', async_views.weather_detail, name='weather-detail'),
+    path('weather/fetch/', async_views.fetch_weather_data, name='fetch-weather'),
+    path('weather/latest/', async_views.get_latest_weather, name='latest-weather'),
+]
@@ -0,0 +1,110 @@
+"""
+Async (ASGI) versions of the weather endpoints
+
+``fetch_weather_data`` is the one that matters: the upstream call goes
+through the service's non-blocking client, so a slow OpenWeather response
+no longer pins a worker for up to ``OPENWEATHER_TIMEOUT`` seconds. The read
+endpoints mirror ``external_api.views`` byte for byte on the async ORM.
+"""
+
+import math
+
+from django.http import Http404
+from rest_framework import status
+from datanexus.asyncviews import async_api_view, bind_view, get_json_body, json_response
+from datanexus.breaker import CircuitOpenError
+from datanexus.conditional import async_conditional_get, atable_state, get_conditional_state
+from .latest import alatest_state, alatest_weather
+from .models import WeatherData
+from .serializers import WeatherDataSerializer, CityWeatherRequestSerializer
+from .services import arecord_city_weather
+from .views import WeatherDataListView
+
+async def aweather_list_state(request, *args, **kwargs):
+    return await atable_state(WeatherData.objects.all(), 'fetched_at')
+
+async def alatest_weather_state(request, *args, **kwargs):
+    return await alatest_state()
+
+async def aweather_detail_state(request, pk, *args, **kwargs):
+    fetched_at = await WeatherData.objects.filter(pk=pk).values_list('fetched_at', flat=True).afirst()
+    return (fetched_at, pk) if fetched_at else None
+
+@async_api_view(['GET'])
+@async_conditional_get(aweather_list_state)
+async def weather_list(request):
+    """
+    Async ``GET /api/external/weather/`` (accepts the same query parameters)
+    """
+    view = bind_view(WeatherDataListView, request)
+    return json_response(await view.alist(request))
+
+@async_api_view(['GET'])
+@async_conditional_get(aweather_detail_state)
+async def weather_detail(request, pk):
+    """
+    Async ``GET /api/external/weather/<pk>/``
+    """
+    try:
+        record = await WeatherData.objects.aget(pk=pk)
+    except WeatherData.DoesNotExist:
+        raise Http404
+    return json_response(WeatherDataSerializer(record).data)
+
+@async_api_view(['POST'])
+async def fetch_weather_data(request):
+    """
+    Async ``POST /api/external/weather/fetch/``
+    """
+    serializer = CityWeatherRequestSerializer(data=get_json_body(request))
+    
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    city = serializer.validated_data['city']
+    country = serializer.validated_data.get('country')
+    
+    try:
+        weather_record, created, stale = await arecord_city_weather(city, country)
+    except CircuitOpenError as e:
+        response = json_response({
+            'error': 'Weather service unavailable'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = str(math.ceil(e.retry_after))
+        return response
+    
+    if not weather_record:
+        return json_response({
+            'error': 'Failed to fetch weather data'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if stale:
+        return json_response({
+            'message': 'Weather service unavailable, returning the last stored reading',
+            'stale': True,
+            'data': WeatherDataSerializer(weather_record).data
+        }, status=status.HTTP_200_OK)
+    
+    if not created:
+        return json_response({
+            'message': 'Weather data is unchanged since it was last saved',
+            'data': WeatherDataSerializer(weather_record).data
+        }, status=status.HTTP_200_OK)
+    
+    return json_response({
+        'message': 'Weather data fetched and saved successfully',
+        'data': WeatherDataSerializer(weather_record).data
+    }, status=status.HTTP_201_CREATED)
+
+@async_api_view(['GET'])
+@async_conditional_get(alatest_weather_state)
+async def get_latest_weather(request):
+    """
+    Async ``GET /api/external/weather/latest/``
+    """
+    data = await alatest_weather(get_conditional_state(request))
+    
+    return json_response({
+        'count': len(data),
+        'data': data
+    })
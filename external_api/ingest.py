@@ -0,0 +1,238 @@
+"""
+Scheduled weather ingestion for the ``WatchedCity`` watchlist.
+
+``IngestWorker`` keeps a heap of (next due time, city) entries. Each step
+it takes the cities that are due - highest priority first - as far as the
+token bucket allows, fetches them concurrently and schedules every city
+again ``refresh_interval`` seconds later (sooner, with exponential backoff,
+after a failure). Readings are buffered and stored with one
+``bulk_create`` per ``WEATHER_INGEST_BATCH_SIZE`` readings or
+``WEATHER_INGEST_FLUSH_SECONDS``, whichever comes first, and on shutdown. The
+watchlist is re-read every ``WEATHER_INGEST_RELOAD_SECONDS`` so cities
+added or changed in the admin are picked up without a restart.
+"""
+
+import heapq
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import WatchedCity
+from .services import fetch_locations, get_weather_service, store_weather_readings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: ``rate`` tokens per second, bursts of up to ``capacity``
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, count: int) -> int:
+        """
+        Take up to ``count`` whole tokens without waiting; returns how many were taken
+        """
+        self._refill()
+        taken = min(count, int(self.tokens))
+        self.tokens -= taken
+        return taken
+
+    def wait_time(self) -> float:
+        """
+        Seconds until the next whole token is available
+        """
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class IngestWorker:
+    """
+    Refresh watched cities on their own intervals until ``stop()`` is called
+    """
+
+    def __init__(self, service=None, rate_per_minute=None, burst=None, batch_size=None, progress=None):
+        # Always fetch live: the request-path cache could hand back stale readings
+        self.service = service or get_weather_service(cached=False)
+        rate_per_minute = rate_per_minute or settings.WEATHER_INGEST_RATE_PER_MINUTE
+        self.bucket = TokenBucket(rate_per_minute / 60, burst or settings.WEATHER_INGEST_BURST)
+        self.batch_size = batch_size or settings.WEATHER_INGEST_BATCH_SIZE
+        self.concurrency = settings.WEATHER_INGEST_CONCURRENCY
+        self.stats = {'batches': 0, 'fetched': 0, 'unchanged': 0, 'failed': 0}
+        # Called with a message after every batch
+        self.progress = progress or logger.info
+        self._stop = threading.Event()
+        self._heap = []
+        self._cities = {}
+        self._next_reload = 0.0
+        self._pending = []
+        self._pending_since = 0.0
+
+    def stop(self):
+        """
+        Ask the worker to exit once the batch in progress has been stored
+        """
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self, once: bool = False):
+        """
+        Ingest until stopped; with ``once``, only the cities due right now
+        """
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() >= self._next_reload:
+                self.reload()
+
+            batch = self._take_due()
+            if batch:
+                self.ingest(batch)
+            elif self._pending and self._flush_due():
+                self.flush()
+            elif once and not self._due_count():
+                break
+            else:
+                self._stop.wait(self._idle_time())
+        self.flush()
+        close_old_connections()
+
+    def reload(self):
+        """
+        Sync the schedule with the active watchlist
+        """
+        self._cities = {city.pk: city for city in WatchedCity.objects.filter(is_active=True)}
+        scheduled = {pk for _, pk in self._heap}
+        now = time.time()
+        for pk, city in self._cities.items():
+            if pk not in scheduled:
+                heapq.heappush(self._heap, (self._first_due(city, now), pk))
+        # Drop removed and deactivated cities
+        self._heap = [entry for entry in self._heap if entry[1] in self._cities]
+        heapq.heapify(self._heap)
+        self._next_reload = time.monotonic() + settings.WEATHER_INGEST_RELOAD_SECONDS
+
+    def ingest(self, batch):
+        """
+        Fetch a batch of cities and schedule them again; readings are
+        buffered and stored by ``flush``
+        """
+        locations = [
+            {'city': city.city, 'country': city.country} if city.country else {'city': city.city}
+            for city in batch
+        ]
+        readings = fetch_locations(self.service, locations, self.concurrency)
+
+        fetched_at = timezone.now()
+        for city, data in zip(batch, readings):
+            if data:
+                city.last_fetched_at = fetched_at
+                city.consecutive_failures = 0
+            else:
+                city.consecutive_failures += 1
+            heapq.heappush(self._heap, (time.time() + self._delay(city), city.pk))
+
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.extend(zip(batch, readings))
+        if len(self._pending) >= self.batch_size or self._flush_due():
+            self.flush()
+
+    def flush(self):
+        """
+        Store the buffered readings with one ``bulk_create``
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        readings = [data for _, data in pending if data]
+        created = 0
+        try:
+            # Unchanged upstream readings (same observation time) are not stored again
+            _, created = store_weather_readings(readings)
+        except Exception as e:
+            logger.error(f"Error storing ingested weather data: {e}")
+            readings = []
+            for city, _ in pending:
+                city.consecutive_failures += 1
+        try:
+            WatchedCity.objects.bulk_update(
+                [city for city, _ in pending], ['last_fetched_at', 'consecutive_failures']
+            )
+        except Exception as e:
+            logger.error(f"Error updating watched cities: {e}")
+
+        self.stats['batches'] += 1
+        self.stats['fetched'] += created
+        self.stats['unchanged'] += len(readings) - created
+        self.stats['failed'] += len(pending) - len(readings)
+        self.progress(
+            f"Stored {created}/{len(pending)} watched city readings "
+            f"({len(readings) - created} unchanged)"
+        )
+
+    def _first_due(self, city, now: float) -> float:
+        if city.last_fetched_at is None:
+            return now
+        return min(now, city.last_fetched_at.timestamp()) + self._delay(city)
+
+    def _delay(self, city) -> float:
+        if not city.consecutive_failures:
+            return city.refresh_interval
+        retry = settings.WEATHER_INGEST_RETRY_SECONDS * 2 ** (city.consecutive_failures - 1)
+        return min(city.refresh_interval, retry)
+
+    def _flush_due(self) -> bool:
+        return time.monotonic() - self._pending_since >= settings.WEATHER_INGEST_FLUSH_SECONDS
+
+    def _due_count(self) -> int:
+        now = time.time()
+        return sum(1 for due, _ in self._heap if due <= now)
+
+    def _take_due(self):
+        """
+        Pop the due cities the rate limit allows, highest priority first
+        """
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if entry[1] in self._cities:
+                due.append(entry)
+        if not due:
+            return []
+
+        due.sort(key=lambda entry: (-self._cities[entry[1]].priority, entry[0]))
+        granted = self.bucket.take(min(len(due), self.batch_size))
+        for entry in due[granted:]:
+            heapq.heappush(self._heap, entry)
+        return [self._cities[pk] for _, pk in due[:granted]]
+
+    def _idle_time(self) -> float:
+        """
+        Seconds to sleep before something can be done
+        """
+        wait = self._next_reload - time.monotonic()
+        if self._pending:
+            wait = min(wait, self._pending_since + settings.WEATHER_INGEST_FLUSH_SECONDS - time.monotonic())
+        if self._heap:
+            until_due = self._heap[0][0] - time.time()
+            wait = min(wait, max(until_due, self.bucket.wait_time()))
+        return max(0.0, wait)
@@ -0,0 +1,203 @@
+"""
+Latest reading per city.
+
+``LatestWeather`` points at the newest ``WeatherData`` row of every
+normalized (city, country). Signal receivers in ``external_api.signals``
+upsert it as readings are inserted and fall back to the next newest
+reading when the latest one is deleted, so ``/weather/latest/`` reads one
+row per city instead of sorting the readings - on every database backend.
+
+The serialized list is also kept in memory per process and rebuilt only
+when the table's state (last update, row count) changes; set
+``WEATHER_LATEST_SNAPSHOT`` to false to always read the table.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from datanexus.conditional import atable_state, table_state
+from .models import LatestWeather, WeatherCityCount, WeatherData
+from .serializers import WeatherDataSerializer
+
+
+def location_key(city, country=None):
+    """
+    Normalized ``(city, country)``: city case and whitespace insensitive,
+    country code upper-case
+    """
+    return ' '.join(city.split()).casefold(), (country or '').strip().upper()
+
+
+def newest_by_location(readings):
+    """
+    The newest of ``readings`` for each ``location_key``
+    """
+    newest = {}
+    for reading in readings:
+        key = location_key(reading.city, reading.country)
+        current = newest.get(key)
+        if current is None or (reading.fetched_at, reading.pk or 0) > (current.fetched_at, current.pk or 0):
+            newest[key] = reading
+    return newest
+
+
+# Rows per INSERT for the upsert
+UPSERT_CHUNK = 200
+
+
+def _upsert_sql(rows):
+    """
+    ``INSERT ... ON CONFLICT DO UPDATE`` that only moves an entry forward in time
+    """
+    quote = connection.ops.quote_name
+    table = quote(LatestWeather._meta.db_table)
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * rows)
+    return (
+        f"INSERT INTO {table} (city_key, country_key, reading_id, fetched_at, updated_at) "
+        f"VALUES {placeholders} "
+        f"ON CONFLICT (city_key, country_key) DO UPDATE SET "
+        f"reading_id = excluded.reading_id, fetched_at = excluded.fetched_at, "
+        f"updated_at = excluded.updated_at "
+        f"WHERE excluded.fetched_at > {table}.fetched_at "
+        f"OR (excluded.fetched_at = {table}.fetched_at AND excluded.reading_id > {table}.reading_id)"
+    )
+
+
+def _upsert_entries(newest, now):
+    """
+    Move entries forward with a few multi-row upserts
+    """
+    time_field = LatestWeather._meta.get_field('fetched_at')
+    # A stable order keeps concurrent upserts from deadlocking
+    items = sorted(newest.items())
+    with connection.cursor() as cursor:
+        for offset in range(0, len(items), UPSERT_CHUNK):
+            chunk = items[offset:offset + UPSERT_CHUNK]
+            params = []
+            for (city_key, country_key), reading in chunk:
+                params += [
+                    city_key, country_key, reading.pk,
+                    time_field.get_db_prep_value(reading.fetched_at, connection),
+                    time_field.get_db_prep_value(now, connection),
+                ]
+            cursor.execute(_upsert_sql(len(chunk)), params)
+
+
+def _merge_entries(newest, now):
+    """
+    Move entries forward, a couple of queries per location
+    """
+    for (city_key, country_key), reading in newest.items():
+        entry = LatestWeather.objects.filter(city_key=city_key, country_key=country_key)
+        values = {'reading_id': reading.pk, 'fetched_at': reading.fetched_at, 'updated_at': now}
+        older = Q(fetched_at__lt=reading.fetched_at) | Q(fetched_at=reading.fetched_at, reading_id__lt=reading.pk)
+        if entry.filter(older).update(**values) or entry.exists():
+            continue
+        try:
+            with transaction.atomic():
+                LatestWeather.objects.create(city_key=city_key, country_key=country_key, **values)
+        except IntegrityError:
+            # Another writer created the entry first
+            entry.filter(older).update(**values)
+
+
+def apply_latest(readings):
+    """
+    Point each location's entry at the newest of ``readings`` if it is newer
+    """
+    newest = newest_by_location(readings)
+    if not newest:
+        return
+    merge = _upsert_entries if connection.vendor in ('postgresql', 'sqlite') else _merge_entries
+    with transaction.atomic():
+        merge(newest, timezone.now())
+
+
+def replace_latest(city, country):
+    """
+    Re-point the entry for a location whose latest reading was deleted at
+    the next newest remaining reading
+    """
+    city_key, country_key = location_key(city, country)
+    if LatestWeather.objects.filter(city_key=city_key, country_key=country_key).exists():
+        # The deleted reading was not the latest one
+        return
+    # The spellings of the city still stored, from the per-city counts
+    spellings = [
+        name for name in WeatherCityCount.objects.values_list('city', flat=True)
+        if location_key(name)[0] == city_key
+    ]
+    if not spellings:
+        return
+    readings = WeatherData.objects.filter(city__in=spellings).order_by('-fetched_at', '-id')
+    for reading in readings.iterator(chunk_size=100):
+        if location_key(reading.city, reading.country) == (city_key, country_key):
+            apply_latest([reading])
+            return
+
+
+def latest_state():
+    """
+    ``(last update, number of cities)`` of the latest-reading table
+    """
+    return table_state(LatestWeather.objects.all(), 'updated_at')
+
+
+async def alatest_state():
+    """
+    Async twin of ``latest_state``
+    """
+    return await atable_state(LatestWeather.objects.all(), 'updated_at')
+
+
+def _entries():
+    return LatestWeather.objects.select_related('reading')
+
+
+_snapshot_lock = threading.Lock()
+_snapshot = {'state': None, 'data': None}
+
+
+def _cached(state):
+    if not settings.WEATHER_LATEST_SNAPSHOT or state is None:
+        return None
+    with _snapshot_lock:
+        return _snapshot['data'] if _snapshot['state'] == state else None
+
+
+def _remember(state, data):
+    if settings.WEATHER_LATEST_SNAPSHOT and state is not None:
+        with _snapshot_lock:
+            _snapshot.update(state=state, data=data)
+    return data
+
+
+def latest_weather(state=None):
+    """
+    Serialized latest reading of every city, ordered by city
+
+    ``state`` is the current ``latest_state()``; when it matches the
+    snapshot's, the snapshot is returned without a query.
+    """
+    data = _cached(state)
+    if data is None:
+        data = _remember(state, list(WeatherDataSerializer(
+            [entry.reading for entry in _entries()], many=True
+        ).data))
+    return data
+
+
+async def alatest_weather(state=None):
+    """
+    Async ``latest_weather``
+    """
+    data = _cached(state)
+    if data is None:
+        data = _remember(state, list(WeatherDataSerializer(
+            [entry.reading async for entry in _entries()], many=True
+        ).data))
+    return data
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from datanexus.export import ExportError, parse_bound
+from external_api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hourly and daily weather rollups from the raw readings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since',
+                            help='Only rebuild periods from this date or datetime on '
+                                 '(default: the oldest stored reading)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_bound(options['since'])
+            except ExportError as e:
+                raise CommandError(str(e))
+        written = rebuild_rollups(since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} weather rollup rows'))
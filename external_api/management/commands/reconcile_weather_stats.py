@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from external_api.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the running weather statistics from the readings table'
+
+    def handle(self, *args, **options):
+        count = reconcile_stats()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled weather statistics over {count} readings'))
@@ -0,0 +1,41 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from external_api.ingest import IngestWorker
+
+
+class Command(BaseCommand):
+    help = 'Keep refreshing the weather of watched cities (runs until SIGTERM/SIGINT)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Refresh the cities that are due now, then exit')
+        parser.add_argument('--rate', type=float,
+                            help='Upstream calls per minute (default WEATHER_INGEST_RATE_PER_MINUTE)')
+        parser.add_argument('--burst', type=int,
+                            help='Calls allowed in a burst (default WEATHER_INGEST_BURST)')
+        parser.add_argument('--batch-size', type=int,
+                            help='Cities fetched and stored per batch (default WEATHER_INGEST_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        worker = IngestWorker(
+            rate_per_minute=options['rate'],
+            burst=options['burst'],
+            batch_size=options['batch_size'],
+            progress=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping after the current batch...')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        worker.run(once=options['once'])
+        stats = worker.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stats['fetched']} readings in {stats['batches']} inserts "
+            f"({stats['unchanged']} unchanged, {stats['failed']} failed fetches)"
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from external_api.retention import (
+    apply_retention, ensure_partitions, is_partitioned, partition_table, retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = ('Create upcoming monthly weather partitions and remove readings older '
+            'than WEATHER_RETENTION_DAYS (run daily)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partition', action='store_true',
+                            help='First convert the readings table into monthly partitions '
+                                 '(PostgreSQL only; locks the table while it copies)')
+        parser.add_argument('--days', type=int,
+                            help='Retention in days (default: WEATHER_RETENTION_DAYS, 0 keeps everything)')
+        parser.add_argument('--months-ahead', type=int,
+                            help='Months of partitions to create ahead (default: WEATHER_PARTITION_MONTHS_AHEAD)')
+
+    def handle(self, *args, **options):
+        if options['partition']:
+            try:
+                months = partition_table(options['months_ahead'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'Partitioned the weather readings into {months} monthly partitions')
+
+        if is_partitioned():
+            for name in ensure_partitions(options['months_ahead']):
+                self.stdout.write(f'Created partition {name}')
+
+        cutoff = retention_cutoff(options['days'])
+        if cutoff is None:
+            self.stdout.write(self.style.SUCCESS('No retention window set; kept every reading'))
+            return
+        dropped, purged = apply_retention(cutoff)
+        for name in dropped:
+            self.stdout.write(f'Dropped partition {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed readings fetched before {cutoff:%Y-%m-%d %H:%M} UTC: '
+            f'{len(dropped)} partitions dropped, {purged} readings purged'
+        ))
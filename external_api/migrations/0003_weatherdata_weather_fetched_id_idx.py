@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0002_alter_weatherdata_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['-fetched_at', '-id'], name='weather_fetched_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0003_weatherdata_weather_fetched_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['city', '-fetched_at', '-id'], name='weather_city_fetched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['country', '-fetched_at', '-id'], name='weather_country_fetched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdata',
+            index=models.Index(fields=['temperature', 'id'], name='weather_temperature_id_idx'),
+        ),
+    ]
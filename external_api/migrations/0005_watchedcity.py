@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0004_weatherdata_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchedCity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('refresh_interval', models.PositiveIntegerField(default=900)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'watched cities',
+                'ordering': ['-priority', 'city'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='watchedcity',
+            constraint=models.UniqueConstraint(fields=('city', 'country'), name='watched_city_unique'),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:39
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Max, Min, Sum
+from django.db.models.functions import Trunc
+
+METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+
+
+def populate_rollups(apps, schema_editor):
+    WeatherData = apps.get_model('external_api', 'WeatherData')
+    db_alias = schema_editor.connection.alias
+    aggregates = {'count': Count('id')}
+    for metric in METRICS:
+        aggregates.update({
+            f'{metric}_sum': Sum(metric, output_field=FloatField()),
+            f'{metric}_sum_sq': Sum(F(metric) * F(metric), output_field=FloatField()),
+            f'{metric}_min': Min(metric, output_field=FloatField()),
+            f'{metric}_max': Max(metric, output_field=FloatField()),
+        })
+    for model_name, granularity in (('WeatherHourlyRollup', 'hour'), ('WeatherDailyRollup', 'day')):
+        model = apps.get_model('external_api', model_name)
+        rows = (
+            WeatherData.objects.using(db_alias).order_by()
+            .annotate(period_start=Trunc('fetched_at', granularity, tzinfo=timezone.utc))
+            .values('city', 'country', 'period_start')
+            .annotate(**aggregates)
+        )
+        model.objects.using(db_alias).bulk_create((model(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0005_watchedcity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('period_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_min', models.FloatField(default=0.0)),
+                ('temperature_max', models.FloatField(default=0.0)),
+                ('temperature_sum_sq', models.FloatField(default=0.0)),
+                ('humidity_sum', models.FloatField(default=0.0)),
+                ('humidity_min', models.FloatField(default=0.0)),
+                ('humidity_max', models.FloatField(default=0.0)),
+                ('humidity_sum_sq', models.FloatField(default=0.0)),
+                ('pressure_sum', models.FloatField(default=0.0)),
+                ('pressure_min', models.FloatField(default=0.0)),
+                ('pressure_max', models.FloatField(default=0.0)),
+                ('pressure_sum_sq', models.FloatField(default=0.0)),
+                ('wind_speed_sum', models.FloatField(default=0.0)),
+                ('wind_speed_min', models.FloatField(default=0.0)),
+                ('wind_speed_max', models.FloatField(default=0.0)),
+                ('wind_speed_sum_sq', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ['period_start', 'id'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='WeatherHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('period_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_min', models.FloatField(default=0.0)),
+                ('temperature_max', models.FloatField(default=0.0)),
+                ('temperature_sum_sq', models.FloatField(default=0.0)),
+                ('humidity_sum', models.FloatField(default=0.0)),
+                ('humidity_min', models.FloatField(default=0.0)),
+                ('humidity_max', models.FloatField(default=0.0)),
+                ('humidity_sum_sq', models.FloatField(default=0.0)),
+                ('pressure_sum', models.FloatField(default=0.0)),
+                ('pressure_min', models.FloatField(default=0.0)),
+                ('pressure_max', models.FloatField(default=0.0)),
+                ('pressure_sum_sq', models.FloatField(default=0.0)),
+                ('wind_speed_sum', models.FloatField(default=0.0)),
+                ('wind_speed_min', models.FloatField(default=0.0)),
+                ('wind_speed_max', models.FloatField(default=0.0)),
+                ('wind_speed_sum_sq', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ['period_start', 'id'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['period_start', 'id'], name='weather_hourly_period_idx'), models.Index(fields=['city', 'period_start', 'id'], name='weather_hourly_city_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='weatherhourlyrollup',
+            constraint=models.UniqueConstraint(fields=('city', 'country', 'period_start'), name='weather_hourly_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdailyrollup',
+            index=models.Index(fields=['period_start', 'id'], name='weather_daily_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherdailyrollup',
+            index=models.Index(fields=['city', 'period_start', 'id'], name='weather_daily_city_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weatherdailyrollup',
+            constraint=models.UniqueConstraint(fields=('city', 'country', 'period_start'), name='weather_daily_unique'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:43
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+
+def populate_stats(apps, schema_editor):
+    WeatherData = apps.get_model('external_api', 'WeatherData')
+    WeatherStats = apps.get_model('external_api', 'WeatherStats')
+    WeatherCityCount = apps.get_model('external_api', 'WeatherCityCount')
+    db_alias = schema_editor.connection.alias
+    readings = WeatherData.objects.using(db_alias).order_by()
+    city_counts = [
+        WeatherCityCount(city=row['city'], count=row['n'])
+        for row in readings.values('city').annotate(n=Count('id'))
+    ]
+    WeatherCityCount.objects.using(db_alias).bulk_create(city_counts, batch_size=1000)
+    totals = readings.aggregate(
+        count=Count('id'), temperature_sum=Sum('temperature'),
+        temperature_min=Min('temperature'), temperature_max=Max('temperature'),
+    )
+    WeatherStats.objects.using(db_alias).create(
+        pk=1, count=totals['count'], city_count=len(city_counts),
+        temperature_sum=totals['temperature_sum'] or 0.0,
+        temperature_min=totals['temperature_min'], temperature_max=totals['temperature_max'],
+        reconciled_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0006_weather_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherCityCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100, unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeatherStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.BigIntegerField(default=0)),
+                ('city_count', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'weather stats',
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def populate_latest(apps, schema_editor):
+    WeatherData = apps.get_model('external_api', 'WeatherData')
+    LatestWeather = apps.get_model('external_api', 'LatestWeather')
+    db_alias = schema_editor.connection.alias
+    newest = {}
+    readings = WeatherData.objects.using(db_alias).order_by().values_list('id', 'city', 'country', 'fetched_at')
+    for pk, city, country, fetched_at in readings.iterator(chunk_size=5000):
+        key = (' '.join(city.split()).casefold(), country.strip().upper())
+        if key not in newest or (fetched_at, pk) > newest[key]:
+            newest[key] = (fetched_at, pk)
+    now = timezone.now()
+    LatestWeather.objects.using(db_alias).bulk_create([
+        LatestWeather(
+            city_key=city_key, country_key=country_key,
+            reading_id=pk, fetched_at=fetched_at, updated_at=now,
+        )
+        for (city_key, country_key), (fetched_at, pk) in newest.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0007_weather_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestWeather',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_key', models.CharField(max_length=100)),
+                ('country_key', models.CharField(max_length=100)),
+                ('fetched_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('reading', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='latest_entry', to='external_api.weatherdata')),
+            ],
+            options={
+                'verbose_name_plural': 'latest weather',
+                'ordering': ['city_key', 'country_key'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='latestweather',
+            constraint=models.UniqueConstraint(fields=('city_key', 'country_key'), name='latest_weather_unique'),
+        ),
+        migrations.RunPython(populate_latest, migrations.RunPython.noop),
+    ]
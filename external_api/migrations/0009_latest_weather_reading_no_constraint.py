@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_api', '0008_latest_weather'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='latestweather',
+            name='reading',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='latest_entry', to='external_api.weatherdata'),
+        ),
+    ]
@@ -15,6 +15,162 @@ class WeatherData(models.Model):
     
     class Meta:
         ordering = ['-fetched_at']
+        indexes = [
+            # Keyset pagination seeks on (fetched_at, id)
+            models.Index(fields=['-fetched_at', '-id'], name='weather_fetched_id_idx'),
+            # ?city= / ?country= filters in keyset order; also latest reading per city
+            models.Index(fields=['city', '-fetched_at', '-id'], name='weather_city_fetched_idx'),
+            models.Index(fields=['country', '-fetched_at', '-id'], name='weather_country_fetched_idx'),
+            # temperature ranges and ?ordering=temperature
+            models.Index(fields=['temperature', 'id'], name='weather_temperature_id_idx'),
+        ]
         
     def __str__(self):
         return f"{self.city}, {self.country} - {self.temperature}°C"
+
+
+class WatchedCity(models.Model):
+    """
+    A city the ``weather_ingest`` worker refreshes every ``refresh_interval`` seconds
+    """
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=100, blank=True)
+    refresh_interval = models.PositiveIntegerField(default=900)  # in seconds
+    # Higher priority cities are fetched first when several are due
+    priority = models.SmallIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    last_fetched_at = models.DateTimeField(null=True, blank=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-priority', 'city']
+        verbose_name_plural = 'watched cities'
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'country'], name='watched_city_unique'),
+        ]
+        
+    def __str__(self):
+        return f"{self.city}, {self.country}" if self.country else self.city
+
+
+ROLLUP_METRICS = ('temperature', 'humidity', 'pressure', 'wind_speed')
+
+
+class WeatherRollup(models.Model):
+    """
+    Running aggregates of the readings for one city over one period.
+
+    Each metric keeps count-weighted sum, min, max and sum of squares, so
+    averages and standard deviations can be derived and periods merged.
+    """
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=100)
+    period_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0.0)
+    temperature_min = models.FloatField(default=0.0)
+    temperature_max = models.FloatField(default=0.0)
+    temperature_sum_sq = models.FloatField(default=0.0)
+    humidity_sum = models.FloatField(default=0.0)
+    humidity_min = models.FloatField(default=0.0)
+    humidity_max = models.FloatField(default=0.0)
+    humidity_sum_sq = models.FloatField(default=0.0)
+    pressure_sum = models.FloatField(default=0.0)
+    pressure_min = models.FloatField(default=0.0)
+    pressure_max = models.FloatField(default=0.0)
+    pressure_sum_sq = models.FloatField(default=0.0)
+    wind_speed_sum = models.FloatField(default=0.0)
+    wind_speed_min = models.FloatField(default=0.0)
+    wind_speed_max = models.FloatField(default=0.0)
+    wind_speed_sum_sq = models.FloatField(default=0.0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['period_start', 'id']
+        
+    def __str__(self):
+        return f"{self.city}, {self.country} @ {self.period_start:%Y-%m-%d %H:%M} ({self.count} readings)"
+
+
+class WeatherHourlyRollup(WeatherRollup):
+    class Meta(WeatherRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'country', 'period_start'], name='weather_hourly_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period_start', 'id'], name='weather_hourly_period_idx'),
+            models.Index(fields=['city', 'period_start', 'id'], name='weather_hourly_city_period_idx'),
+        ]
+
+
+class WeatherDailyRollup(WeatherRollup):
+    class Meta(WeatherRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'country', 'period_start'], name='weather_daily_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period_start', 'id'], name='weather_daily_period_idx'),
+            models.Index(fields=['city', 'period_start', 'id'], name='weather_daily_city_period_idx'),
+        ]
+
+
+class WeatherStats(models.Model):
+    """
+    Running totals over every stored reading (a single row, pk=1)
+
+    Kept up to date by signal receivers as readings are inserted and
+    deleted; ``reconcile_weather_stats`` recomputes it from the table.
+    """
+    count = models.BigIntegerField(default=0)
+    city_count = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0.0)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'weather stats'
+        
+    def __str__(self):
+        return f"{self.count} readings from {self.city_count} cities"
+
+
+class WeatherCityCount(models.Model):
+    """
+    Number of stored readings per city, behind ``WeatherStats.city_count``
+    """
+    city = models.CharField(max_length=100, unique=True)
+    count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.city}: {self.count}"
+
+
+class LatestWeather(models.Model):
+    """
+    The most recent reading per normalized (city, country)
+
+    Upserted as readings are inserted, so the latest reading of every city
+    is one indexed read on every database backend.
+    """
+    # Case- and whitespace-insensitive city, upper-case country code
+    city_key = models.CharField(max_length=100)
+    country_key = models.CharField(max_length=100)
+    # No database constraint: a partitioned readings table can't be the
+    # target of a foreign key on ``id`` alone
+    reading = models.OneToOneField(
+        WeatherData, on_delete=models.CASCADE, related_name='latest_entry', db_constraint=False
+    )
+    fetched_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['city_key', 'country_key']
+        verbose_name_plural = 'latest weather'
+        constraints = [
+            models.UniqueConstraint(fields=['city_key', 'country_key'], name='latest_weather_unique'),
+        ]
+        
+    def __str__(self):
+        return f"{self.city_key}, {self.country_key} @ {self.fetched_at:%Y-%m-%d %H:%M}"
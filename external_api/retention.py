@@ -0,0 +1,250 @@
+"""
+Retention for the weather readings, with monthly partitions on PostgreSQL.
+
+On PostgreSQL ``partition_table`` converts ``WeatherData`` once into a
+table partitioned by range on ``fetched_at``: one partition per UTC month
+plus a default partition for readings outside them. ``ensure_partitions``
+creates the coming months ahead of time, and expired months are removed
+with ``DROP TABLE`` instead of a bulk ``DELETE`` - no dead rows to vacuum
+and no index churn. Everywhere else (SQLite, or a table that was never
+converted) old readings are deleted in chunks ordered by ``fetched_at``,
+each chunk in its own short transaction.
+
+Purges bypass the model signals. The running statistics are reconciled
+afterwards, ``LatestWeather`` entries of purged locations are removed,
+and the rollups keep the history of the purged readings.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import LatestWeather, WeatherData
+from .stats import reconcile_stats
+
+
+def _table():
+    return WeatherData._meta.db_table
+
+
+def month_start(moment):
+    """
+    Start of the UTC month containing ``moment``
+    """
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, months):
+    """
+    Start of the month ``months`` after the month starting at ``month``
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{_table()}_p{month:%Y%m}'
+
+
+def default_partition_name():
+    return f'{_table()}_default'
+
+
+def retention_cutoff(days=None):
+    """
+    Readings fetched before this are expired; ``None`` keeps everything
+    """
+    days = settings.WEATHER_RETENTION_DAYS if days is None else days
+    if not days:
+        return None
+    return timezone.now() - timedelta(days=days)
+
+
+def is_partitioned():
+    """
+    Whether the readings table is a partitioned PostgreSQL table
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [_table()])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions():
+    """
+    ``{month start: partition name}`` of the monthly partitions
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    pattern = re.compile(re.escape(_table()) + r'_p(\d{4})(\d{2})$')
+    months = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return months
+
+
+def _create_partition(cursor, month):
+    """
+    Attach the partition for ``month``, moving any of its readings out of
+    the default partition (which would otherwise block the attach)
+    """
+    quote = connection.ops.quote_name
+    table, name, default = quote(_table()), quote(partition_name(month)), quote(default_partition_name())
+    bounds = [month, add_months(month, 1)]
+    cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {default} WHERE fetched_at >= %s AND fetched_at < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved',
+        bounds,
+    )
+    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds)
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Create the partitions from the current month to ``months_ahead``
+    months later; returns the names created
+    """
+    if months_ahead is None:
+        months_ahead = settings.WEATHER_PARTITION_MONTHS_AHEAD
+    existing = partitions()
+    current = month_start(timezone.now())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                _create_partition(cursor, month)
+                created.append(partition_name(month))
+    return created
+
+
+def partition_table(months_ahead=None):
+    """
+    Convert the readings table into monthly partitions (PostgreSQL only)
+
+    Copies every reading under an exclusive lock, so run it in a
+    maintenance window. Returns the number of partitions created.
+    """
+    if connection.vendor != 'postgresql':
+        raise ValueError('Partitioning needs PostgreSQL')
+    if is_partitioned():
+        raise ValueError(f'{_table()} is already partitioned')
+    if months_ahead is None:
+        months_ahead = settings.WEATHER_PARTITION_MONTHS_AHEAD
+
+    quote = connection.ops.quote_name
+    table = quote(_table())
+    old = quote(f'{_table()}_unpartitioned')
+    sequence = quote(f'{_table()}_id_seq')
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN(fetched_at), MAX(id) FROM {table}')
+        oldest, last_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (fetched_at)'
+        )
+        cursor.execute(f'CREATE TABLE {quote(default_partition_name())} PARTITION OF {table} DEFAULT')
+        first = month_start(oldest or timezone.now())
+        last = add_months(month_start(timezone.now()), months_ahead)
+        months = 0
+        month = first
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {quote(partition_name(month))} PARTITION OF {table} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+            months += 1
+            month = add_months(month, 1)
+
+        # Load before indexing; dropping the old table drops its identity sequence
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+        cursor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {table}.id')
+        cursor.execute('SELECT setval(%s, %s, %s)', [_table() + '_id_seq', last_id or 1, last_id is not None])
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        # A partitioned table's primary key must include the partition key
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, fetched_at)')
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in WeatherData._meta.indexes:
+                schema_editor.add_index(WeatherData, index)
+    return months
+
+
+def drop_expired_partitions(cutoff):
+    """
+    Drop the monthly partitions that end at or before ``cutoff``; returns their names
+    """
+    dropped = []
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        for month, name in sorted(partitions().items()):
+            if add_months(month, 1) > cutoff:
+                break
+            cursor.execute(f'DROP TABLE {quote(name)}')
+            dropped.append(name)
+    return dropped
+
+
+def purge_readings(cutoff, chunk_size=None, table=None):
+    """
+    Delete readings fetched before ``cutoff``, ``chunk_size`` oldest at a
+    time; returns how many were deleted
+    """
+    chunk_size = chunk_size or settings.WEATHER_PURGE_CHUNK_SIZE
+    table = connection.ops.quote_name(table or _table())
+    time_field = WeatherData._meta.get_field('fetched_at')
+    sql = (
+        f'DELETE FROM {table} WHERE id IN ('
+        f'SELECT id FROM {table} WHERE fetched_at < %s ORDER BY fetched_at, id LIMIT %s)'
+    )
+    params = [time_field.get_db_prep_value(cutoff, connection), chunk_size]
+    deleted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            count = cursor.rowcount
+        deleted += count
+        if count < chunk_size:
+            return deleted
+
+
+def apply_retention(cutoff):
+    """
+    Remove the readings fetched before ``cutoff``
+
+    Partitioned tables lose whole expired months (readings of the
+    partially expired month stay until it has expired too) and the expired
+    readings of the default partition; other tables are purged in chunks.
+    Returns ``(dropped partition names, readings deleted by purging)``.
+    """
+    dropped = []
+    if is_partitioned():
+        cutoff = month_start(cutoff)
+        dropped = drop_expired_partitions(cutoff)
+        purged = purge_readings(cutoff, table=default_partition_name())
+    else:
+        purged = purge_readings(cutoff)
+
+    # Entries older than the cutoff point at purged readings, and so did
+    # every other reading of their location
+    LatestWeather.objects.filter(fetched_at__lt=cutoff).delete()
+    reconcile_stats()
+    return dropped, purged
@@ -0,0 +1,217 @@
+"""
+Hourly and daily rollups of the weather time series.
+
+``WeatherHourlyRollup`` and ``WeatherDailyRollup`` hold one row per
+(city, country, period) with the count, sum, min, max and sum of squares
+of each metric. Signal receivers in ``external_api.signals`` fold new
+readings in as they are inserted, so a year-long trend reads a few hundred
+rollup rows instead of every raw reading.
+
+Rollups keep the history they have seen: deleting raw readings (e.g. by
+retention) does not change them. ``rebuild_rollups`` recomputes the
+periods that still have raw readings.
+"""
+
+import math
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, FloatField, Max, Min, Sum
+from django.db.models.functions import Greatest, Least, Trunc
+
+from .models import ROLLUP_METRICS, WeatherDailyRollup, WeatherData, WeatherHourlyRollup
+
+GRANULARITIES = {
+    'hour': WeatherHourlyRollup,
+    'day': WeatherDailyRollup,
+}
+
+
+def period_start(moment, granularity):
+    """
+    Start of the UTC hour or day containing ``moment``
+    """
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def summarize(readings, granularity):
+    """
+    Aggregate ``readings`` into ``{(city, country, period_start): totals}``
+    """
+    buckets = {}
+    for reading in readings:
+        key = (reading.city, reading.country, period_start(reading.fetched_at, granularity))
+        totals = buckets.get(key)
+        if totals is None:
+            totals = buckets[key] = {'count': 0}
+            for metric in ROLLUP_METRICS:
+                value = float(getattr(reading, metric))
+                totals.update({
+                    f'{metric}_sum': 0.0, f'{metric}_sum_sq': 0.0,
+                    f'{metric}_min': value, f'{metric}_max': value,
+                })
+        totals['count'] += 1
+        for metric in ROLLUP_METRICS:
+            value = float(getattr(reading, metric))
+            totals[f'{metric}_sum'] += value
+            totals[f'{metric}_sum_sq'] += value * value
+            totals[f'{metric}_min'] = min(totals[f'{metric}_min'], value)
+            totals[f'{metric}_max'] = max(totals[f'{metric}_max'], value)
+    return buckets
+
+
+# Two-argument min/max per backend for the upsert
+UPSERT_FUNCTIONS = {
+    'postgresql': ('LEAST', 'GREATEST'),
+    'sqlite': ('MIN', 'MAX'),
+}
+# Rows per INSERT, keeping SQLite under its bound-parameter limit
+UPSERT_CHUNK = 40
+
+
+def _upsert_sql(model, rows):
+    """
+    ``INSERT ... ON CONFLICT DO UPDATE`` adding ``rows`` to existing periods
+    """
+    least, greatest = UPSERT_FUNCTIONS[connection.vendor]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ['city', 'country', 'period_start', 'count']
+    updates = [f'count = {table}.count + excluded.count']
+    for metric in ROLLUP_METRICS:
+        columns += [f'{metric}_sum', f'{metric}_sum_sq', f'{metric}_min', f'{metric}_max']
+        updates += [
+            f'{metric}_sum = {table}.{metric}_sum + excluded.{metric}_sum',
+            f'{metric}_sum_sq = {table}.{metric}_sum_sq + excluded.{metric}_sum_sq',
+            f'{metric}_min = {least}({table}.{metric}_min, excluded.{metric}_min)',
+            f'{metric}_max = {greatest}({table}.{metric}_max, excluded.{metric}_max)',
+        ]
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    sql = (
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES {', '.join([placeholders] * rows)} "
+        f"ON CONFLICT (city, country, period_start) DO UPDATE SET {', '.join(updates)}"
+    )
+    return sql, columns
+
+
+def _merge_expressions(totals):
+    updates = {'count': F('count') + totals['count']}
+    for metric in ROLLUP_METRICS:
+        updates[f'{metric}_sum'] = F(f'{metric}_sum') + totals[f'{metric}_sum']
+        updates[f'{metric}_sum_sq'] = F(f'{metric}_sum_sq') + totals[f'{metric}_sum_sq']
+        updates[f'{metric}_min'] = Least(F(f'{metric}_min'), totals[f'{metric}_min'])
+        updates[f'{metric}_max'] = Greatest(F(f'{metric}_max'), totals[f'{metric}_max'])
+    return updates
+
+
+def _merge_buckets(model, buckets):
+    """
+    Add ``buckets`` to ``model``'s rows, one query per period
+    """
+    for (city, country, start), totals in buckets.items():
+        bucket = model.objects.filter(city=city, country=country, period_start=start)
+        if bucket.update(**_merge_expressions(totals)):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(city=city, country=country, period_start=start, **totals)
+        except IntegrityError:
+            # Another writer created the row first
+            bucket.update(**_merge_expressions(totals))
+
+
+def _upsert_buckets(model, buckets):
+    """
+    Add ``buckets`` to ``model``'s rows with a few multi-row upserts
+    """
+    period_field = model._meta.get_field('period_start')
+    # A stable order keeps concurrent upserts from deadlocking
+    items = sorted(buckets.items())
+    with connection.cursor() as cursor:
+        for offset in range(0, len(items), UPSERT_CHUNK):
+            chunk = items[offset:offset + UPSERT_CHUNK]
+            sql, columns = _upsert_sql(model, len(chunk))
+            params = []
+            for (city, country, start), totals in chunk:
+                params += [city, country, period_field.get_db_prep_value(start, connection)]
+                params += [totals[column] for column in columns[3:]]
+            cursor.execute(sql, params)
+
+
+def apply_rollups(readings):
+    """
+    Fold newly inserted ``readings`` into the hourly and daily rollups
+    """
+    merge = _upsert_buckets if connection.vendor in UPSERT_FUNCTIONS else _merge_buckets
+    with transaction.atomic():
+        for granularity, model in GRANULARITIES.items():
+            buckets = summarize(readings, granularity)
+            if buckets:
+                merge(model, buckets)
+
+
+def rollup_aggregates():
+    """
+    Aggregate expressions producing a rollup row's totals from raw readings
+    """
+    aggregates = {'count': Count('id')}
+    for metric in ROLLUP_METRICS:
+        aggregates.update({
+            f'{metric}_sum': Sum(metric, output_field=FloatField()),
+            f'{metric}_sum_sq': Sum(F(metric) * F(metric), output_field=FloatField()),
+            f'{metric}_min': Min(metric, output_field=FloatField()),
+            f'{metric}_max': Max(metric, output_field=FloatField()),
+        })
+    return aggregates
+
+
+def rebuild_rollups(since=None):
+    """
+    Recompute the rollups from the raw readings
+
+    Only periods from ``since`` (default: the oldest raw reading) on are
+    replaced, so history whose readings were purged is kept. Returns the
+    number of rollup rows written.
+    """
+    readings = WeatherData.objects.order_by()
+    if since is None:
+        since = readings.aggregate(oldest=Min('fetched_at'))['oldest']
+        if since is None:
+            return 0
+
+    written = 0
+    with transaction.atomic():
+        for granularity, model in GRANULARITIES.items():
+            start = period_start(since, granularity)
+            rows = (
+                readings.filter(fetched_at__gte=start)
+                .annotate(period_start=Trunc('fetched_at', granularity, tzinfo=dt_timezone.utc))
+                .values('city', 'country', 'period_start')
+                .annotate(**rollup_aggregates())
+            )
+            model.objects.filter(period_start__gte=start).delete()
+            rollups = model.objects.bulk_create(
+                (model(**row) for row in rows.iterator()), batch_size=1000
+            )
+            written += len(rollups)
+    return written
+
+
+def metric_summary(rollup, metric):
+    """
+    ``{avg, min, max, stddev}`` of one metric of a rollup row
+    """
+    count = rollup.count
+    total = getattr(rollup, f'{metric}_sum')
+    mean = total / count
+    variance = max(0.0, getattr(rollup, f'{metric}_sum_sq') / count - mean * mean)
+    return {
+        'avg': round(mean, 2),
+        'min': getattr(rollup, f'{metric}_min'),
+        'max': getattr(rollup, f'{metric}_max'),
+        'stddev': round(math.sqrt(variance), 2),
+    }
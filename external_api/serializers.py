@@ -1,5 +1,10 @@
+import math
+
 from rest_framework import serializers
-from .models import WeatherData
+from datanexus.filters import parse_end, parse_start
+from .analytics import ANALYTICS_METRICS
+from .models import ROLLUP_METRICS, WeatherData
+from .rollups import metric_summary
 
 class WeatherDataSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,4 +13,80 @@ class WeatherDataSerializer(serializers.ModelSerializer):
         
 class CityWeatherRequestSerializer(serializers.Serializer):
     city = serializers.CharField(max_length=100)
-    country = serializers.CharField(max_length=100, required=False)
\ No newline at end of file
+    country = serializers.CharField(max_length=100, required=False)
+
+class WeatherLocationSerializer(serializers.Serializer):
+    city = serializers.CharField(max_length=100, required=False)
+    country = serializers.CharField(max_length=100, required=False)
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    lon = serializers.FloatField(min_value=-180, max_value=180, required=False)
+
+    def validate(self, attrs):
+        has_city = bool(attrs.get('city'))
+        has_coordinates = 'lat' in attrs and 'lon' in attrs
+        if has_city == has_coordinates:
+            raise serializers.ValidationError('Provide either "city" or both "lat" and "lon"')
+        return attrs
+
+
+class WeatherRollupSerializer(serializers.Serializer):
+    """
+    An hourly or daily rollup with avg/min/max/stddev per metric
+    """
+    city = serializers.CharField()
+    country = serializers.CharField()
+    period_start = serializers.DateTimeField()
+    count = serializers.IntegerField()
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for metric in ROLLUP_METRICS:
+            data[metric] = metric_summary(instance, metric)
+        return data
+
+
+class WeatherAnalyticsQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of the analytics endpoint; lists are comma separated
+    """
+    city = serializers.CharField(max_length=100)
+    start = serializers.CharField(required=False)
+    end = serializers.CharField(required=False)
+    metrics = serializers.CharField(required=False, default='temperature,humidity')
+    percentiles = serializers.CharField(required=False, default='5,25,50,75,95')
+    # Moving average window, in hours
+    window = serializers.FloatField(required=False, default=24.0, min_value=0.0)
+    points = serializers.IntegerField(required=False, default=100, min_value=1, max_value=1000)
+
+    def validate_start(self, value):
+        try:
+            return parse_start(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_end(self, value):
+        try:
+            return parse_end(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_window(self, value):
+        if not math.isfinite(value):
+            raise serializers.ValidationError('A finite number of hours is required.')
+        return value
+
+    def validate_metrics(self, value):
+        metrics = [metric.strip() for metric in value.split(',') if metric.strip()]
+        unknown = sorted(set(metrics) - set(ANALYTICS_METRICS))
+        if not metrics or unknown:
+            raise serializers.ValidationError(f'Choose from: {", ".join(ANALYTICS_METRICS)}')
+        return list(dict.fromkeys(metrics))
+
+    def validate_percentiles(self, value):
+        try:
+            percentiles = [float(percentile) for percentile in value.split(',') if percentile.strip()]
+        except ValueError:
+            percentiles = None
+        if not percentiles or any(not 0 <= percentile <= 100 for percentile in percentiles):
+            raise serializers.ValidationError('Comma separated numbers from 0 to 100')
+        return percentiles
@@ -1,20 +1,208 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+import weakref
+from datetime import datetime, timezone as dt_timezone
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
 from typing import Dict, Optional
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+from datanexus.asyncviews import db_slot
+from datanexus.breaker import CircuitBreaker, CircuitOpenError
+from datanexus.signals import post_bulk_create
+from datanexus.singleflight import SingleFlight
+from .latest import location_key
+from .models import WeatherData
 import logging
 
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - async calls fall back to a thread
+    aiohttp = None
+
 logger = logging.getLogger(__name__)
 
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def observed_at(timestamp=None):
+    """
+    ``fetched_at`` of a reading: the upstream observation time (unix
+    seconds) when given, otherwise now. Stamped into the payload when it is
+    fetched, so a cached payload always maps to the same reading.
+    """
+    if timestamp:
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+    return timezone.now()
+
+
+def backoff_delay(retry_number: int) -> float:
+    """
+    Seconds to wait before retry ``retry_number`` (1-based): exponential
+    backoff with full jitter, capped at ``OPENWEATHER_BACKOFF_MAX``
+    """
+    ceiling = settings.OPENWEATHER_BACKOFF_FACTOR * (2 ** (retry_number - 1))
+    return random.uniform(0, min(ceiling, settings.OPENWEATHER_BACKOFF_MAX))
+
+
+def retry_after_delay(header: Optional[str]) -> Optional[float]:
+    """
+    Seconds asked for by a ``Retry-After`` header (a delay or an HTTP
+    date), capped at ``OPENWEATHER_RETRY_AFTER_MAX`` so an upstream can't
+    park a worker for long; ``None`` when the header is missing or invalid
+    """
+    if header is None:
+        return None
+    try:
+        seconds = Retry(0).parse_retry_after(header)
+    except InvalidHeader:
+        return None
+    return min(seconds, settings.OPENWEATHER_RETRY_AFTER_MAX)
+
+
+class JitteredRetry(Retry):
+    """
+    ``Retry`` whose backoff is randomized so clients don't retry in lockstep
+    """
+    
+    def get_backoff_time(self):
+        retries = len(self.history)
+        if retries == 0:
+            return 0
+        return backoff_delay(retries)
+    
+    def get_retry_after(self, response):
+        return retry_after_delay(response.headers.get('Retry-After'))
+
+
+# One pooled keep-alive session per process. Connection pools must not be
+# shared with a forked child (e.g. gunicorn --preload), so the session is
+# rebuilt whenever the PID changes.
+_http_session = None
+_http_session_pid = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Return this process's pooled ``requests.Session`` for upstream calls
+    """
+    global _http_session, _http_session_pid
+    pid = os.getpid()
+    if _http_session is None or _http_session_pid != pid:
+        with _http_session_lock:
+            if _http_session is None or _http_session_pid != pid:
+                # Read timeouts are not retried: a hung upstream would hold
+                # the worker for every attempt before the breaker saw a failure
+                retry = JitteredRetry(
+                    total=settings.OPENWEATHER_RETRIES,
+                    read=0,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset(['GET']),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=settings.OPENWEATHER_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session, _http_session_pid = session, pid
+    return _http_session
+
+
+# One pooled session per event loop; aiohttp sessions are bound to their loop
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+async def _close_at_shutdown(session):
+    """
+    Parked async generator that closes ``session`` when its loop finalizes
+    async generators on shutdown (``asyncio.run``, ``async_to_sync`` and
+    uvicorn all do), so the per-request loops of a WSGI worker don't leak
+    sessions
+    """
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+async def _start(generator):
+    await generator.asend(None)
+
+
+def is_upstream_failure(exc) -> bool:
+    """
+    Whether an error means OpenWeather itself is unhealthy, as opposed to
+    it rejecting this request (unknown city, bad API key...)
+    """
+    status = None
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+    elif aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+        status = exc.status
+    if status is not None:
+        return status in RETRY_STATUSES or status >= 500
+    return True
+
+
+# Stops calling OpenWeather while it is failing or too slow
+upstream_breaker = CircuitBreaker(
+    'openweather',
+    failure_rate=settings.WEATHER_BREAKER_FAILURE_RATE,
+    min_calls=settings.WEATHER_BREAKER_MIN_CALLS,
+    window=settings.WEATHER_BREAKER_WINDOW_SECONDS,
+    slow_call=settings.WEATHER_BREAKER_SLOW_CALL_SECONDS,
+    open_seconds=settings.WEATHER_BREAKER_OPEN_SECONDS,
+    is_failure=is_upstream_failure,
+)
+
+
+def get_async_session():
+    """
+    Return the shared ``aiohttp.ClientSession`` for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    session, _ = _async_sessions.get(loop, (None, None))
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.OPENWEATHER_MAX_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=settings.OPENWEATHER_CONNECT_TIMEOUT,
+                sock_read=settings.OPENWEATHER_TIMEOUT,
+            ),
+        )
+        closer = _close_at_shutdown(session)
+        # Run it to its yield so the loop tracks it; the loop only holds it weakly
+        loop.create_task(_start(closer))
+        _async_sessions[loop] = session, closer
+    return session
+
 
 class OpenWeatherService:
     """
     Service to interact with OpenWeather API
     """
     
-    BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
-    
     def __init__(self):
         self.api_key = settings.OPENWEATHER_API_KEY
+        self.base_url = settings.OPENWEATHER_BASE_URL
+        # (connect, read) so a dead host fails fast but slow responses get time
+        self.timeout = (settings.OPENWEATHER_CONNECT_TIMEOUT, settings.OPENWEATHER_TIMEOUT)
         if not self.api_key:
             logger.warning("OpenWeather API key not configured")
     
@@ -34,25 +222,19 @@ class OpenWeatherService:
             return None
         
         try:
-            # Prepare query parameter
-            query = city
-            if country_code:
-                query = f"{city},{country_code}"
+            params = self._city_params(city, country_code)
             
-            params = {
-                'q': query,
-                'appid': self.api_key,
-                'units': 'metric'  # Use Celsius
-            }
-            
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
+            with upstream_breaker.guard():
+                response = get_http_session().get(self.base_url, params=params, timeout=self.timeout)
+                response.raise_for_status()
             
             data = response.json()
             
             # Transform the data to match our model
             return self._transform_weather_data(data)
             
+        except CircuitOpenError:
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching weather data for {city}: {e}")
             return None
@@ -76,21 +258,19 @@ class OpenWeatherService:
             return None
         
         try:
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric'  # Use Celsius
-            }
+            params = self._coordinate_params(lat, lon)
             
-            response = requests.get(self.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
+            with upstream_breaker.guard():
+                response = get_http_session().get(self.base_url, params=params, timeout=self.timeout)
+                response.raise_for_status()
             
             data = response.json()
             
             # Transform the data to match our model
             return self._transform_weather_data(data)
             
+        except CircuitOpenError:
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching weather data for coordinates {lat}, {lon}: {e}")
             return None
@@ -98,6 +278,90 @@ class OpenWeatherService:
             logger.error(f"Unexpected error fetching weather data for coordinates {lat}, {lon}: {e}")
             return None
     
+    async def aget_weather_by_city(self, city: str, country_code: str = None) -> Optional[Dict]:
+        """
+        Async version of ``get_weather_by_city`` for async views
+        
+        Waits on the upstream without holding a thread, so one ASGI worker
+        can have thousands of these in flight.
+        """
+        if aiohttp is None:
+            return await sync_to_async(self.get_weather_by_city, thread_sensitive=False)(
+                city, country_code
+            )
+        if not self.api_key:
+            logger.error("OpenWeather API key not configured")
+            return None
+        
+        return await self._aget(self._city_params(city, country_code), city)
+    
+    async def aget_weather_by_coordinates(self, lat: float, lon: float) -> Optional[Dict]:
+        """
+        Async version of ``get_weather_by_coordinates`` for async views
+        """
+        if aiohttp is None:
+            return await sync_to_async(self.get_weather_by_coordinates, thread_sensitive=False)(
+                lat, lon
+            )
+        if not self.api_key:
+            logger.error("OpenWeather API key not configured")
+            return None
+        
+        return await self._aget(self._coordinate_params(lat, lon), f"coordinates {lat}, {lon}")
+    
+    async def _aget(self, params: Dict, label: str) -> Optional[Dict]:
+        # Same policy as the sync session's JitteredRetry: connection errors
+        # and RETRY_STATUSES are retried after the (capped) Retry-After or a
+        # jittered backoff; read timeouts are not retried
+        try:
+            with upstream_breaker.guard():
+                for retry_number in range(1, settings.OPENWEATHER_RETRIES + 2):
+                    can_retry = retry_number <= settings.OPENWEATHER_RETRIES
+                    try:
+                        async with get_async_session().get(self.base_url, params=params) as response:
+                            if response.status in RETRY_STATUSES and can_retry:
+                                delay = retry_after_delay(response.headers.get('Retry-After'))
+                                await asyncio.sleep(delay or backoff_delay(retry_number))
+                                continue
+                            response.raise_for_status()
+                            data = await response.json(content_type=None)
+                    except aiohttp.ClientConnectorError:
+                        if not can_retry:
+                            raise
+                        await asyncio.sleep(backoff_delay(retry_number))
+                        continue
+                    break
+            
+            return self._transform_weather_data(data)
+            
+        except CircuitOpenError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error fetching weather data for {label}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error fetching weather data for {label}: {e}")
+            return None
+    
+    def _city_params(self, city: str, country_code: str = None) -> Dict:
+        query = city
+        if country_code:
+            query = f"{city},{country_code}"
+        
+        return {
+            'q': query,
+            'appid': self.api_key,
+            'units': 'metric'  # Use Celsius
+        }
+    
+    def _coordinate_params(self, lat: float, lon: float) -> Dict:
+        return {
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric'  # Use Celsius
+        }
+    
     def _transform_weather_data(self, api_data: Dict) -> Dict:
         """
         Transform OpenWeather API response to our model format
@@ -124,6 +388,7 @@ class OpenWeatherService:
                 'description': weather.get('description', ''),
                 'wind_speed': wind.get('speed', 0),
                 'visibility': api_data.get('visibility'),
+                'fetched_at': observed_at(api_data.get('dt')),
             }
         except Exception as e:
             logger.error(f"Error transforming weather data: {e}")
@@ -155,6 +420,7 @@ class MockWeatherService:
             ]),
             'wind_speed': round(random.uniform(0, 15), 1),
             'visibility': random.randint(5000, 10000),
+            'fetched_at': observed_at(),
         }
     
     def get_weather_by_coordinates(self, lat: float, lon: float) -> Dict:
@@ -162,14 +428,305 @@ class MockWeatherService:
         Return mock weather data for coordinates
         """
         return self.get_weather_by_city("MockCity")
+    
+    async def aget_weather_by_city(self, city: str, country_code: str = None) -> Dict:
+        return self.get_weather_by_city(city, country_code)
+    
+    async def aget_weather_by_coordinates(self, lat: float, lon: float) -> Dict:
+        return self.get_weather_by_coordinates(lat, lon)
+
+
+def city_key(city: str, country_code: str = None) -> str:
+    """
+    Normalized key for a city lookup: case and whitespace insensitive
+    """
+    city, country = location_key(city, country_code)
+    return f"weather:city:{city}:{country}"
+
+
+# Coalesce concurrent upstream lookups of the same location in this process
+_lookups = SingleFlight()
+# Coalesce concurrent "fetch and record" calls, optionally across workers;
+# sequential ones are deduplicated by save_weather_reading
+_recordings = SingleFlight(
+    cache_alias=settings.WEATHER_SINGLE_FLIGHT_CACHE or None,
+    lock_timeout=settings.WEATHER_SINGLE_FLIGHT_TIMEOUT,
+)
+
+# Per-process cache counters, exposed by the weather cache stats endpoint
+_cache_stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+_cache_lock = threading.Lock()
+_refreshing = set()
+
+
+def _count(name):
+    with _cache_lock:
+        _cache_stats[name] += 1
+
+
+def get_cache_stats() -> Dict:
+    """
+    Return this process's weather cache counters
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+    stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else None
+    return stats
+
+
+class CachedWeatherService:
+    """
+    TTL + LRU cache in front of another weather service
+    
+    Entries are keyed by normalized (city, country) or by coordinates
+    rounded to ``WEATHER_CACHE_COORD_PRECISION`` decimals and live in the
+    size-capped ``weather`` cache, which evicts least recently used
+    entries. Within ``WEATHER_CACHE_TTL`` seconds an entry is served as
+    is; for the following ``WEATHER_CACHE_STALE_TTL`` seconds it is still
+    served immediately while a background thread refreshes it. Failed
+    fetches are not cached.
+    """
+    
+    def __init__(self, service):
+        self.service = service
+        self.cache = caches['weather']
+        self.ttl = settings.WEATHER_CACHE_TTL
+        self.stale_ttl = settings.WEATHER_CACHE_STALE_TTL
+    
+    def get_weather_by_city(self, city: str, country_code: str = None) -> Optional[Dict]:
+        key = self._city_key(city, country_code)
+        return self._get(key, self.service.get_weather_by_city, city, country_code)
+    
+    def get_weather_by_coordinates(self, lat: float, lon: float) -> Optional[Dict]:
+        key = self._coordinate_key(lat, lon)
+        return self._get(key, self.service.get_weather_by_coordinates, lat, lon)
+    
+    async def aget_weather_by_city(self, city: str, country_code: str = None) -> Optional[Dict]:
+        key = self._city_key(city, country_code)
+        cached = self._lookup(key, self.service.get_weather_by_city, city, country_code)
+        if cached is not None:
+            return cached
+        return await _lookups.ado(key, self._astore, key, self.service.aget_weather_by_city, city, country_code)
+    
+    async def aget_weather_by_coordinates(self, lat: float, lon: float) -> Optional[Dict]:
+        key = self._coordinate_key(lat, lon)
+        cached = self._lookup(key, self.service.get_weather_by_coordinates, lat, lon)
+        if cached is not None:
+            return cached
+        return await _lookups.ado(key, self._astore, key, self.service.aget_weather_by_coordinates, lat, lon)
+    
+    def _city_key(self, city: str, country_code: str = None) -> str:
+        return city_key(city, country_code)
+    
+    def _coordinate_key(self, lat: float, lon: float) -> str:
+        precision = settings.WEATHER_CACHE_COORD_PRECISION
+        return f"weather:coord:{round(float(lat), precision)}:{round(float(lon), precision)}"
+    
+    def _get(self, key, fetch, *args):
+        cached = self._lookup(key, fetch, *args)
+        if cached is not None:
+            return cached
+        # Concurrent misses for the same key make a single upstream call
+        return _lookups.do(key, self._fetch_and_store, key, fetch, *args)
+    
+    def _lookup(self, key, fetch, *args) -> Optional[Dict]:
+        entry = self.cache.get(key)
+        if entry is None:
+            _count('misses')
+            return None
+        
+        stored_at, data = entry
+        if time.time() - stored_at < self.ttl:
+            _count('hits')
+        else:
+            _count('stale_hits')
+            self._refresh_in_background(key, fetch, *args)
+        return data
+    
+    def _store(self, key, data: Optional[Dict]) -> Optional[Dict]:
+        if data:
+            self.cache.set(key, (time.time(), data), timeout=self.ttl + self.stale_ttl)
+        return data
+    
+    def _fetch_and_store(self, key, fetch, *args) -> Optional[Dict]:
+        return self._store(key, fetch(*args))
+    
+    async def _astore(self, key, fetch, *args) -> Optional[Dict]:
+        return self._store(key, await fetch(*args))
+    
+    def _refresh_in_background(self, key, fetch, *args):
+        with _cache_lock:
+            if key in _refreshing:
+                return
+            _refreshing.add(key)
+        
+        def refresh():
+            try:
+                if self._store(key, fetch(*args)):
+                    _count('refreshes')
+                else:
+                    _count('refresh_errors')
+            except Exception as e:
+                _count('refresh_errors')
+                logger.error(f"Error refreshing cached weather data for {key}: {e}")
+            finally:
+                with _cache_lock:
+                    _refreshing.discard(key)
+        
+        threading.Thread(target=refresh, name=f"weather-refresh {key}", daemon=True).start()
 
 
-def get_weather_service():
+def last_known_weather(city: str, country_code: str = None):
+    """
+    Queryset of the most recently stored reading for a city (in any
+    country unless ``country_code`` is given), from ``LatestWeather``
+    """
+    city_key, country_key = location_key(city, country_code)
+    readings = WeatherData.objects.filter(latest_entry__city_key=city_key)
+    if country_key:
+        readings = readings.filter(latest_entry__country_key=country_key)
+    return readings.order_by('-fetched_at', '-id')
+
+
+def record_city_weather(city: str, country_code: str = None):
+    """
+    Fetch the weather for a city and store it as a ``WeatherData`` row
+    
+    Returns ``(record, created, stale)``. Concurrent calls for the same
+    city share one upstream request, and a payload whose reading is
+    already stored (served from the cache, or not yet updated upstream)
+    returns that row with ``created`` false. While the upstream circuit
+    breaker is open the last stored reading is returned instead, with
+    ``stale`` true; ``CircuitOpenError`` is raised if there is none.
+    ``(None, False, False)`` means the fetch failed.
+    """
+    def fetch_and_record():
+        try:
+            weather_data = get_weather_service().get_weather_by_city(city, country_code)
+        except CircuitOpenError:
+            record = last_known_weather(city, country_code).first()
+            if record is None:
+                raise
+            return record, False, True
+        if not weather_data:
+            return None, False, False
+        return (*save_weather_reading(weather_data), False)
+    
+    return _recordings.do(city_key(city, country_code), fetch_and_record)
+
+
+async def arecord_city_weather(city: str, country_code: str = None):
+    """
+    Async ``record_city_weather``
+    """
+    async def fetch_and_record():
+        try:
+            weather_data = await get_weather_service().aget_weather_by_city(city, country_code)
+        except CircuitOpenError:
+            async with db_slot():
+                record = await last_known_weather(city, country_code).afirst()
+            if record is None:
+                raise
+            return record, False, True
+        if not weather_data:
+            return None, False, False
+        async with db_slot():
+            return (*await sync_to_async(save_weather_reading)(weather_data), False)
+    
+    return await _recordings.ado(city_key(city, country_code), fetch_and_record)
+
+
+def save_weather_reading(data):
+    """
+    Save one fetched reading unless the same (city, country, fetched_at)
+    is already stored; the derived tables are updated in the same
+    transaction. Returns ``(record, created)``.
+    """
+    with transaction.atomic():
+        if data.get('fetched_at') is not None:
+            stored = WeatherData.objects.filter(
+                city=data['city'], country=data['country'], fetched_at=data['fetched_at'],
+            ).order_by('id').first()
+            if stored is not None:
+                return stored, False
+        return WeatherData.objects.create(**data), True
+
+
+def store_weather_readings(readings):
+    """
+    Save fetched readings as ``WeatherData`` rows in one ``bulk_create``
+    
+    As in ``save_weather_reading``, a reading whose location (by
+    ``location_key``) and ``fetched_at`` are already stored, or repeated
+    earlier in ``readings``, is not inserted again. Returns
+    ``(records, created)``: the row of each reading, in order, and how
+    many rows were inserted.
+    """
+    def reading_key(city, country, fetched_at):
+        return location_key(city, country), fetched_at
+    
+    with transaction.atomic():
+        times = {data['fetched_at'] for data in readings if data.get('fetched_at') is not None}
+        seen = {}
+        # Oldest row last, so it is the one kept for its key
+        for record in WeatherData.objects.filter(fetched_at__in=times).order_by('-id'):
+            seen[reading_key(record.city, record.country, record.fetched_at)] = record
+        
+        records, new = [], []
+        for data in readings:
+            key = None
+            if data.get('fetched_at') is not None:
+                key = reading_key(data['city'], data.get('country'), data['fetched_at'])
+            record = seen.get(key)
+            if record is None:
+                record = WeatherData(**data)
+                new.append(record)
+                if key is not None:
+                    seen[key] = record
+            records.append(record)
+        
+        WeatherData.objects.bulk_create(new)
+        post_bulk_create.send(sender=WeatherData, instances=new)
+    return records, len(new)
+
+
+def fetch_locations(service, locations, concurrency: int):
+    """
+    Fetch weather for many locations concurrently
+    
+    ``locations`` are dicts with ``city`` (and optional ``country``) or
+    ``lat``/``lon``. At most ``concurrency`` upstream calls run at once;
+    returns one result (``None`` on failure) per location, in order.
+    """
+    def fetch(location):
+        try:
+            if location.get('city'):
+                return service.get_weather_by_city(location['city'], location.get('country'))
+            return service.get_weather_by_coordinates(location['lat'], location['lon'])
+        except Exception as e:
+            logger.error(f"Unexpected error fetching weather data for {location}: {e}")
+            return None
+    
+    if not locations:
+        return []
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(locations))) as executor:
+        return list(executor.map(fetch, locations))
+
+
+def get_weather_service(cached: bool = True):
     """
     Factory function to get appropriate weather service
+    
+    The service is wrapped in ``CachedWeatherService`` unless ``cached``
+    is false or ``WEATHER_CACHE_TTL`` is 0.
     """
     if settings.OPENWEATHER_API_KEY:
-        return OpenWeatherService()
+        service = OpenWeatherService()
     else:
         logger.info("Using mock weather service (no API key configured)")
-        return MockWeatherService()
\ No newline at end of file
+        service = MockWeatherService()
+    
+    if cached and settings.WEATHER_CACHE_TTL > 0:
+        return CachedWeatherService(service)
+    return service
\ No newline at end of file
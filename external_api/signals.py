@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from datanexus.signals import post_bulk_create
+from .latest import apply_latest, replace_latest
+from .models import WeatherData
+from .rollups import apply_rollups
+from .stats import add_readings, remove_readings
+
+
+@receiver(post_save, sender=WeatherData)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply_rollups([instance])
+
+
+@receiver(post_bulk_create, sender=WeatherData)
+def update_rollups_on_bulk_create(sender, instances, **kwargs):
+    apply_rollups(instances)
+
+
+@receiver(post_save, sender=WeatherData)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_readings([instance])
+
+
+@receiver(post_bulk_create, sender=WeatherData)
+def update_stats_on_bulk_create(sender, instances, **kwargs):
+    add_readings(instances)
+
+
+@receiver(post_delete, sender=WeatherData)
+def update_stats_on_delete(sender, instance, **kwargs):
+    remove_readings([instance])
+
+
+@receiver(post_save, sender=WeatherData)
+def update_latest_on_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply_latest([instance])
+
+
+@receiver(post_bulk_create, sender=WeatherData)
+def update_latest_on_bulk_create(sender, instances, **kwargs):
+    apply_latest(instances)
+
+
+@receiver(post_delete, sender=WeatherData)
+def update_latest_on_delete(sender, instance, **kwargs):
+    replace_latest(instance.city, instance.country)
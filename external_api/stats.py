@@ -0,0 +1,237 @@
+"""
+Constant-time weather statistics.
+
+``WeatherStats`` is a single row of running totals (count, temperature
+sum/min/max, number of distinct cities) and ``WeatherCityCount`` counts
+readings per city so the distinct-city total can move as cities appear and
+disappear. Signal receivers in ``external_api.signals`` apply deltas inside
+the writing transaction; ``reconcile_stats`` recomputes both tables from
+scratch (run it periodically, and after bulk deletes that bypass signals).
+
+Filtered statistics are answered from the rollups when both bounds of the
+range fall on whole days or hours, and otherwise with an indexed query on
+the readings.
+"""
+
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import WeatherCityCount, WeatherData, WeatherStats
+from .rollups import GRANULARITIES
+
+
+def _stats_row():
+    return WeatherStats.objects.filter(pk=1)
+
+
+def _missing_stats_row():
+    """
+    Whether there are no running totals to update yet
+    """
+    return not _stats_row().exists()
+
+
+def apply_city_deltas(deltas):
+    """
+    Add ``deltas`` ({city: delta}) to the per-city counts; returns the
+    change in the number of distinct cities
+    """
+    appeared = disappeared = 0
+    for city, delta in deltas.items():
+        if not delta:
+            continue
+        updated = WeatherCityCount.objects.filter(city=city).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    WeatherCityCount.objects.create(city=city, count=delta)
+                appeared += 1
+            except IntegrityError:
+                # Another writer created the row first
+                WeatherCityCount.objects.filter(city=city).update(count=F('count') + delta)
+        if delta < 0:
+            disappeared += WeatherCityCount.objects.filter(city=city, count__lte=0).delete()[0]
+    return appeared - disappeared
+
+
+def add_readings(readings):
+    """
+    Fold newly inserted ``readings`` into the running totals
+    """
+    if not readings:
+        return
+    temperatures = [float(reading.temperature) for reading in readings]
+    lowest, highest = min(temperatures), max(temperatures)
+    with transaction.atomic():
+        if _missing_stats_row():
+            reconcile_stats()
+            return
+        city_change = apply_city_deltas(Counter(reading.city for reading in readings))
+        _stats_row().update(
+            count=F('count') + len(readings),
+            city_count=F('city_count') + city_change,
+            temperature_sum=F('temperature_sum') + sum(temperatures),
+            temperature_min=Least(Coalesce(F('temperature_min'), lowest), lowest),
+            temperature_max=Greatest(Coalesce(F('temperature_max'), highest), highest),
+        )
+
+
+def remove_readings(readings):
+    """
+    Take deleted ``readings`` out of the running totals
+    """
+    if not readings:
+        return
+    temperatures = [float(reading.temperature) for reading in readings]
+    deltas = Counter()
+    deltas.subtract(reading.city for reading in readings)
+    with transaction.atomic():
+        if _missing_stats_row():
+            reconcile_stats()
+            return
+        city_change = apply_city_deltas(deltas)
+        _stats_row().update(
+            count=F('count') - len(readings),
+            city_count=F('city_count') + city_change,
+            temperature_sum=F('temperature_sum') - sum(temperatures),
+        )
+        # Removing an extreme needs the next one, which the temperature
+        # index finds without a scan
+        stats = _stats_row().only('temperature_min', 'temperature_max').get()
+        if (
+            stats.temperature_min is None
+            or min(temperatures) <= stats.temperature_min
+            or max(temperatures) >= stats.temperature_max
+        ):
+            _stats_row().update(**_temperature_extremes())
+
+
+def _temperature_extremes():
+    readings = WeatherData.objects.order_by()
+    return {
+        'temperature_min': readings.aggregate(value=Min('temperature'))['value'],
+        'temperature_max': readings.aggregate(value=Max('temperature'))['value'],
+    }
+
+
+def reconcile_stats():
+    """
+    Recompute the running totals and per-city counts from the readings
+    """
+    readings = WeatherData.objects.order_by()
+    with transaction.atomic():
+        city_counts = [
+            WeatherCityCount(city=row['city'], count=row['n'])
+            for row in readings.values('city').annotate(n=Count('id'))
+        ]
+        WeatherCityCount.objects.all().delete()
+        WeatherCityCount.objects.bulk_create(city_counts, batch_size=1000)
+
+        totals = readings.aggregate(count=Count('id'), temperature_sum=Sum('temperature'))
+        WeatherStats.objects.update_or_create(pk=1, defaults={
+            'count': totals['count'],
+            'city_count': len(city_counts),
+            'temperature_sum': totals['temperature_sum'] or 0.0,
+            'reconciled_at': timezone.now(),
+            **_temperature_extremes(),
+        })
+    return totals['count']
+
+
+def _result(count, cities, temperature_avg, temperature_min, temperature_max):
+    return {
+        'total_records': count,
+        'unique_cities': cities,
+        'average_temperature': round(temperature_avg, 2) if temperature_avg is not None else None,
+        'max_temperature': temperature_max if count else None,
+        'min_temperature': temperature_min if count else None,
+    }
+
+
+def read_stats():
+    """
+    Statistics over every stored reading, from the running totals
+    """
+    stats = _stats_row().first()
+    if stats is None or not stats.count:
+        return _result(0, 0, None, None, None)
+    return _result(
+        stats.count, stats.city_count, stats.temperature_sum / stats.count,
+        stats.temperature_min, stats.temperature_max,
+    )
+
+
+def _aligned_granularity(start, end):
+    """
+    The coarsest rollup whose periods tile ``[start, end)``, or ``None``
+
+    Open ranges are never aligned: rollups are not decremented when readings
+    are deleted, so only an explicit period asks for their history.
+    """
+    if start is None or end is None:
+        return None
+    for granularity in ('day', 'hour'):
+        if all(
+            bound.minute == bound.second == bound.microsecond == 0
+            and (granularity == 'hour' or bound.hour == 0)
+            for bound in (start, end)
+        ):
+            return granularity
+    return None
+
+
+def filtered_stats(city=None, country=None, start=None, end=None):
+    """
+    Statistics for a city/country and/or ``[start, end)`` range
+
+    Served from the rollups when both bounds fall on whole UTC days or hours
+    (rollups also cover readings since deleted), otherwise from the
+    readings with the (city, fetched_at) / fetched_at indexes.
+    """
+    start = start.astimezone(dt_timezone.utc) if start else None
+    end = end.astimezone(dt_timezone.utc) if end else None
+    filters = Q()
+    if city:
+        filters &= Q(city=city)
+    if country:
+        filters &= Q(country=country)
+
+    granularity = _aligned_granularity(start, end)
+    if granularity is not None:
+        if start:
+            filters &= Q(period_start__gte=start)
+        if end:
+            filters &= Q(period_start__lt=end)
+        totals = GRANULARITIES[granularity].objects.filter(filters).order_by().aggregate(
+            count=Sum('count'),
+            cities=Count('city', distinct=True),
+            temperature_sum=Sum('temperature_sum'),
+            temperature_min=Min('temperature_min'),
+            temperature_max=Max('temperature_max'),
+        )
+        count = totals['count'] or 0
+        return _result(
+            count, totals['cities'], totals['temperature_sum'] / count if count else None,
+            totals['temperature_min'], totals['temperature_max'],
+        )
+
+    if start:
+        filters &= Q(fetched_at__gte=start)
+    if end:
+        filters &= Q(fetched_at__lt=end)
+    totals = WeatherData.objects.filter(filters).order_by().aggregate(
+        count=Count('id'),
+        cities=Count('city', distinct=True),
+        temperature_avg=Avg('temperature'),
+        temperature_min=Min('temperature'),
+        temperature_max=Max('temperature'),
+    )
+    return _result(
+        totals['count'], totals['cities'], totals['temperature_avg'],
+        totals['temperature_min'], totals['temperature_max'],
+    )
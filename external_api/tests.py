@@ -1,3 +1,562 @@
+import datetime
+import io
+import unittest
+from unittest import mock
+
+import aiohttp
+import requests
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from urllib3 import HTTPResponse
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+from datanexus.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+from .analytics import ColumnarStore, analytics_available, analyze
+from .ingest import IngestWorker, TokenBucket
+from .latest import latest_weather
+from .retention import apply_retention
+from .models import LatestWeather, WatchedCity, WeatherDailyRollup, WeatherData, WeatherHourlyRollup
+from .rollups import rebuild_rollups
+from .services import OpenWeatherService, get_http_session, save_weather_reading, store_weather_readings
+from .stats import filtered_stats, read_stats, reconcile_stats
+from .views import WeatherDataListView
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Query plans are PostgreSQL specific')
+class WeatherDataFilterIndexTests(TestCase):
+    """
+    Every list filter/ordering must be answerable from a composite index
+    """
+
+    def filtered_queryset(self, query):
+        request = Request(APIRequestFactory().get('/api/external/weather/', query))
+        view = WeatherDataListView(request=request, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def assertUsesIndex(self, query, index_name):
+        queryset = self.filtered_queryset(query)
+        with connection.cursor() as cursor:
+            # Empty test tables would otherwise always get a sequential scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_default_ordering(self):
+        self.assertUsesIndex({}, 'weather_fetched_id_idx')
+
+    def test_fetched_at_range(self):
+        self.assertUsesIndex({'start': '2024-01-01', 'end': '2024-02-01'}, 'weather_fetched_id_idx')
+
+    def test_city_filter(self):
+        self.assertUsesIndex({'city': 'London'}, 'weather_city_fetched_idx')
+
+    def test_country_filter(self):
+        self.assertUsesIndex({'country': 'GB'}, 'weather_country_fetched_idx')
+
+    def test_temperature_range(self):
+        self.assertUsesIndex(
+            {'min_temperature': '10', 'max_temperature': '20', 'ordering': 'temperature'},
+            'weather_temperature_id_idx',
+        )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class WeatherListFilterTests(TestCase):
+    """
+    Temperature bounds must be finite numbers
+    """
+
+    def test_temperature_bounds(self):
+        WeatherData.objects.create(city='Oslo', country='NO', temperature=-3.5)
+        WeatherData.objects.create(city='Cairo', country='EG', temperature=31.0)
+        response = self.client.get('/api/external/weather/', {'max_temperature': '0'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([reading['city'] for reading in response.json()['results']], ['Oslo'])
+
+        for value in ('nan', 'inf', '-Infinity', 'warm'):
+            response = self.client.get('/api/external/weather/', {'min_temperature': value},
+                                       HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 400, value)
+            self.assertEqual(response.json(), {'min_temperature': [f'Invalid value "{value}"']})
+
+
+class WeatherFastListTests(TestCase):
+    """
+    The values() fast path renders the same bytes as the serializers
+    """
+
+    def test_same_bytes(self):
+        self.assertIsNotNone(WeatherDataListView().get_fast_fields())
+        start = datetime.datetime(2024, 1, 1, 0, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        WeatherData.objects.create(city='Zürich', country='CH', temperature=0.1 + 0.2, visibility=None,
+                                   fetched_at=start)
+        WeatherData.objects.create(city='Oslo', country='NO', temperature=-3.5, visibility=10000,
+                                   fetched_at=start + datetime.timedelta(hours=1))
+        for query in ({}, {'ordering': 'temperature', 'page_size': 1}):
+            contents = []
+            for fast in (True, False):
+                caches['api'].clear()
+                with self.settings(API_FAST_SERIALIZATION=fast):
+                    response = self.client.get('/api/external/weather/', query, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.status_code, 200)
+                contents.append(response.content)
+            self.assertEqual(contents[0], contents[1], query)
+
+
+class CircuitBreakerTests(TestCase):
+    """
+    The breaker opens on failures, probes after a pause and closes again
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            'test', failure_rate=0.5, min_calls=4, window=10, slow_call=2,
+            open_seconds=30, clock=self.clock,
+        )
+
+    def call(self, fail=False, seconds=0.1):
+        with self.breaker.guard():
+            self.clock.now += seconds
+            if fail:
+                raise ConnectionError('upstream down')
+
+    def failing_call(self, **kwargs):
+        with self.assertRaises(ConnectionError):
+            self.call(fail=True, **kwargs)
+
+    def test_open_half_open_closed(self):
+        self.call()
+        self.call()
+        self.failing_call()
+        self.assertEqual(self.breaker.state, CLOSED)
+        # Slow calls count as failures: 2 of 4
+        self.call(seconds=3)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        with self.assertRaises(CircuitOpenError) as rejected:
+            self.call()
+        self.assertAlmostEqual(rejected.exception.retry_after, 30)
+
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # The probe fails: open again for another pause
+        self.failing_call()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now += 29
+        self.assertRaises(CircuitOpenError, self.call)
+
+        self.clock.now += 1
+        with self.breaker.guard():
+            # Only one probe at a time
+            self.assertRaises(CircuitOpenError, self.call)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.metrics()['opened'], 2)
+
+    def test_old_failures_leave_the_window(self):
+        for _ in range(3):
+            self.failing_call()
+        self.clock.now += 11
+        self.call()
+        self.call()
+        self.failing_call()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class IngestSchedulingTests(TestCase):
+    """
+    The ingest worker takes due cities by priority within the rate limit
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('external_api.ingest.time', time=self.clock, monotonic=self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.worker = IngestWorker(service=object(), batch_size=10)
+        # One token a second, bursts of two
+        self.worker.bucket = TokenBucket(1.0, 2, clock=self.clock)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(0.5, 3, clock=self.clock)
+        self.assertEqual(bucket.take(5), 3)
+        self.assertEqual(bucket.take(1), 0)
+        self.assertAlmostEqual(bucket.wait_time(), 2)
+        self.clock.now += 1
+        self.assertEqual(bucket.take(1), 0)
+        self.assertAlmostEqual(bucket.wait_time(), 1)
+        self.clock.now += 1
+        self.assertEqual(bucket.take(2), 1)
+        # Idle time never saves up more than the burst
+        self.clock.now += 60
+        self.assertEqual(bucket.take(5), 3)
+
+    def test_priority_order_and_rate_limit(self):
+        for city, priority in [('Leeds', 0), ('London', 5), ('York', 1)]:
+            WatchedCity.objects.create(city=city, priority=priority, refresh_interval=600)
+        self.worker.reload()
+
+        self.assertEqual([city.city for city in self.worker._take_due()], ['London', 'York'])
+        self.assertEqual(self.worker._take_due(), [])
+        self.assertAlmostEqual(self.worker._idle_time(), 1)
+        self.clock.now += 1
+        self.assertEqual([city.city for city in self.worker._take_due()], ['Leeds'])
+        self.assertEqual(self.worker._heap, [])
+
+    def test_reschedule_after_fetch(self):
+        london = WatchedCity.objects.create(city='London', refresh_interval=600)
+        leeds = WatchedCity.objects.create(city='Leeds', refresh_interval=600)
+        self.worker.reload()
+        batch = self.worker._take_due()
+        with mock.patch('external_api.ingest.fetch_locations', return_value=[{'city': 'London'}, None]), \
+                self.settings(WEATHER_INGEST_RETRY_SECONDS=30):
+            self.worker.ingest(batch)
+            self.assertEqual(sorted(self.worker._heap), [(1030.0, leeds.pk), (1600.0, london.pk)])
+
+            # Failures back off exponentially, up to the refresh interval
+            leeds = self.worker._cities[leeds.pk]
+            self.assertEqual(leeds.consecutive_failures, 1)
+            for failures, delay in [(2, 60), (5, 480), (6, 600)]:
+                leeds.consecutive_failures = failures
+                self.assertEqual(self.worker._delay(leeds), delay)
+
+    def test_unchanged_reading_stored_once(self):
+        WatchedCity.objects.create(city='Oslo', refresh_interval=600)
+        reading = {'city': 'Oslo', 'country': 'NO', 'temperature': -3.5,
+                   'fetched_at': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)}
+        self.worker.reload()
+        with mock.patch('external_api.ingest.fetch_locations', side_effect=lambda *args: [dict(reading)]):
+            for _ in range(2):
+                self.worker.ingest(self.worker._take_due())
+                self.worker.flush()
+                self.clock.now += 600
+
+        self.assertEqual(WeatherData.objects.count(), 1)
+        self.assertEqual(self.worker.stats, {'batches': 2, 'fetched': 1, 'unchanged': 1, 'failed': 0})
+
+
+class UpstreamRetryTests(TestCase):
+    """
+    Connection errors are retried, read timeouts are not, Retry-After is
+    capped and the async client follows the same policy
+    """
+
+    def attempts(self, error):
+        pool_error = error(HTTPConnectionPool('upstream.invalid'), '/weather', 'timed out')
+        with self.settings(OPENWEATHER_BACKOFF_FACTOR=0), \
+                mock.patch.object(HTTPConnectionPool, '_make_request', side_effect=pool_error) as make_request:
+            with self.assertRaises(requests.exceptions.RequestException):
+                get_http_session().get('http://upstream.invalid/weather', timeout=1)
+        return make_request.call_count
+
+    def test_read_timeout_not_retried(self):
+        self.assertEqual(self.attempts(ReadTimeoutError), 1)
+
+    def test_connect_timeout_retried(self):
+        self.assertEqual(self.attempts(ConnectTimeoutError), 4)
+
+    def test_retry_after_capped(self):
+        def unavailable(*args, **kwargs):
+            return HTTPResponse(body=io.BytesIO(b''), headers={'Retry-After': '3600'}, status=503,
+                                preload_content=False)
+
+        with self.settings(OPENWEATHER_RETRY_AFTER_MAX=2), \
+                mock.patch.object(HTTPConnectionPool, '_make_request', side_effect=unavailable), \
+                mock.patch('urllib3.util.retry.time.sleep') as sleep:
+            response = get_http_session().get('http://upstream.invalid/weather', timeout=1)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [2, 2, 2])
+
+    def test_async_policy_matches(self):
+        payload = {
+            'name': 'Oslo', 'sys': {'country': 'NO'}, 'dt': 1704067200,
+            'main': {'temp': -3.5}, 'weather': [{'description': 'snow'}],
+        }
+        session = FakeUpstreamSession([
+            aiohttp.ClientConnectorError(mock.Mock(), OSError('connection refused')),
+            FakeUpstreamResponse(503, {'Retry-After': '3600'}),
+            FakeUpstreamResponse(502),
+            FakeUpstreamResponse(200, body=payload),
+        ])
+        upstream = self.settings(OPENWEATHER_API_KEY='key', OPENWEATHER_RETRY_AFTER_MAX=2, OPENWEATHER_BACKOFF_FACTOR=0)
+        with upstream, \
+                mock.patch('external_api.services.get_async_session', return_value=session), \
+                mock.patch('external_api.services.asyncio.sleep') as sleep:
+            data = async_to_sync(OpenWeatherService().aget_weather_by_city)('Oslo')
+        self.assertEqual(data['temperature'], -3.5)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0, 2, 0])
+
+
+class FakeUpstreamResponse:
+    def __init__(self, status, headers=None, body=None):
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(mock.Mock(), (), status=self.status)
+
+    async def json(self, content_type=None):
+        return self.body
+
+
+class FakeUpstreamSession:
+    """
+    Hands out the queued responses, raising the queued errors
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def get(self, url, params=None):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class WeatherFetchDedupTests(TestCase):
+    """
+    Fetching a reading that is already stored must not store it again
+    """
+
+    def setUp(self):
+        caches['weather'].clear()
+
+    def test_sequential_fetches_store_one_row(self):
+        first = self.client.post('/api/external/weather/fetch/', {'city': 'Oslo'}, content_type='application/json')
+        second = self.client.post('/api/external/weather/fetch/', {'city': ' oslo'}, content_type='application/json')
+
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(second.json()['data'], first.json()['data'])
+        self.assertEqual(WeatherData.objects.count(), 1)
+
+    def test_upstream_observation_time(self):
+        payload = {
+            'name': 'Oslo', 'sys': {'country': 'NO'}, 'dt': 1704067200,
+            'main': {'temp': -3.5}, 'weather': [{'description': 'snow'}],
+        }
+        readings = [OpenWeatherService()._transform_weather_data(payload) for _ in range(2)]
+        record, created = save_weather_reading(readings[0])
+        self.assertEqual((save_weather_reading(readings[1]), created), ((record, False), True))
+        self.assertEqual(record.fetched_at, datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def test_repeated_batch_stores_nothing_new(self):
+        locations = [{'city': 'Paris', 'country': 'FR'}, {'city': 'paris', 'country': 'FR'}, {'lat': 48.86, 'lon': 2.35}]
+        first = self.client.post('/api/external/weather/fetch/batch/', locations, content_type='application/json')
+        self.assertEqual((first.status_code, first.json()['created']), (201, 2))
+        self.assertEqual(WeatherData.objects.count(), 2)
+
+        second = self.client.post('/api/external/weather/fetch/batch/', locations, content_type='application/json')
+        self.assertEqual((second.status_code, second.json()['created']), (200, 0))
+        self.assertEqual(second.json()['results'], first.json()['results'])
+        self.assertEqual(WeatherData.objects.count(), 2)
+        self.assertEqual(read_stats()['total_records'], 2)
+
+
+class WeatherRollupTests(TestCase):
+    """
+    Rollups maintained at insert time must match a rebuild from raw rows
+    """
+
+    def snapshot(self):
+        return {
+            model.__name__: sorted(
+                model.objects.values_list(
+                    'city', 'period_start', 'count', 'temperature_sum', 'temperature_min',
+                    'temperature_max', 'pressure_sum_sq',
+                )
+            )
+            for model in (WeatherHourlyRollup, WeatherDailyRollup)
+        }
+
+    def test_incremental_matches_rebuild(self):
+        start = datetime.datetime(2024, 1, 1, 22, 30, tzinfo=datetime.timezone.utc)
+        readings = [
+            {
+                'city': city, 'country': 'GB', 'temperature': float(i % 7),
+                'humidity': i % 100, 'pressure': 1000 + i % 20, 'wind_speed': i / 10,
+                'fetched_at': start + datetime.timedelta(minutes=17 * i),
+            }
+            for i in range(60)
+            for city in ('London', 'Leeds')
+        ]
+        store_weather_readings(readings[:50])
+        store_weather_readings(readings[50:])
+        WeatherData.objects.create(**readings[0])
+
+        incremental = self.snapshot()
+        self.assertEqual(WeatherDailyRollup.objects.filter(city='London').count(), 2)
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+
+class WeatherStatsTests(TestCase):
+    """
+    Running totals maintained by the signals must match a reconcile
+    """
+
+    def test_running_totals_match_reconcile(self):
+        fetched_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        store_weather_readings([
+            {
+                'city': city, 'country': 'GB', 'temperature': float(i - 5), 'humidity': 50,
+                'pressure': 1000, 'wind_speed': 1.0, 'fetched_at': fetched_at + datetime.timedelta(minutes=i),
+            }
+            for i in range(10)
+            for city in ('London', 'Leeds')
+        ])
+        WeatherData.objects.filter(temperature__in=[-5.0, 4.0]).delete()
+        WeatherData.objects.filter(city='Leeds').delete()
+
+        running = read_stats()
+        self.assertEqual(running['total_records'], 8)
+        self.assertEqual(running['unique_cities'], 1)
+        self.assertEqual((running['min_temperature'], running['max_temperature']), (-4.0, 3.0))
+        reconcile_stats()
+        self.assertEqual(read_stats(), running)
+
+    def test_filtered_stats_follow_deletes(self):
+        fetched_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        store_weather_readings([
+            {'city': city, 'country': 'GB', 'temperature': float(i),
+             'fetched_at': fetched_at + datetime.timedelta(minutes=i)}
+            for i in range(10)
+            for city in ('London', 'Leeds')
+        ])
+        WeatherData.objects.filter(temperature__gte=5.0).delete()
+        WeatherData.objects.filter(city='Leeds').delete()
+
+        self.assertEqual(filtered_stats(country='GB'), read_stats())
+        self.assertEqual(filtered_stats(city='London')['total_records'], 5)
+        self.assertEqual(filtered_stats(city='Leeds')['total_records'], 0)
+        # An explicit whole-day period is answered from the rollups
+        day = filtered_stats(start=fetched_at, end=fetched_at + datetime.timedelta(days=1))
+        self.assertEqual(day['total_records'], 20)
+
+    def test_filters_validated_like_the_list(self):
+        query = {'city': 'London', 'start': 'yesterday', 'end': '2024-01-02'}
+        stats = self.client.get('/api/external/weather/stats/', query, HTTP_ACCEPT='application/json')
+        listed = self.client.get('/api/external/weather/', query, HTTP_ACCEPT='application/json')
+        self.assertEqual((stats.status_code, listed.status_code), (400, 400))
+        self.assertEqual(stats.json(), listed.json())
+        self.assertEqual(stats.json(), {'start': ['Invalid value "yesterday"']})
+
+
+class LatestWeatherTests(TestCase):
+    """
+    The latest-reading table must follow inserts and deletes
+    """
+
+    def test_latest_per_location(self):
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        store_weather_readings([
+            {'city': city, 'country': 'GB', 'fetched_at': start + datetime.timedelta(hours=i)}
+            for i, city in enumerate(['London', 'Leeds', ' london', 'LONDON', 'Leeds'])
+        ])
+        WeatherData.objects.create(city='London', country='gb', fetched_at=start)
+
+        latest = {reading['city']: reading['fetched_at'] for reading in latest_weather()}
+        self.assertEqual(latest, {'LONDON': '2024-01-01T03:00:00Z', 'Leeds': '2024-01-01T04:00:00Z'})
+
+        WeatherData.objects.filter(city='LONDON').delete()
+        latest = {reading['city']: reading['fetched_at'] for reading in latest_weather()}
+        self.assertEqual(latest, {' london': '2024-01-01T02:00:00Z', 'Leeds': '2024-01-01T04:00:00Z'})
+
+
+class WeatherRetentionTests(TestCase):
+    """
+    Purging expired readings must leave the derived tables consistent
+    """
+
+    def test_purge_in_chunks(self):
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        store_weather_readings([
+            {
+                'city': city, 'country': 'GB', 'temperature': float(day),
+                'fetched_at': start + datetime.timedelta(days=day),
+            }
+            for day in range(10)
+            for city in ('London', 'Leeds')
+        ])
+        store_weather_readings([{'city': 'York', 'country': 'GB', 'fetched_at': start}])
+        rollups = WeatherDailyRollup.objects.count()
+
+        with self.settings(WEATHER_PURGE_CHUNK_SIZE=3):
+            dropped, purged = apply_retention(start + datetime.timedelta(days=5))
+
+        self.assertEqual((dropped, purged), ([], 11))
+        self.assertEqual(WeatherData.objects.count(), 10)
+        self.assertEqual(read_stats()['total_records'], 10)
+        self.assertEqual(read_stats()['min_temperature'], 5.0)
+        self.assertEqual(sorted(LatestWeather.objects.values_list('city_key', flat=True)), ['leeds', 'london'])
+        self.assertEqual(WeatherDailyRollup.objects.count(), rollups)
+
+
+@unittest.skipUnless(analytics_available(), 'Weather analytics need NumPy')
+class WeatherAnalyticsTests(TestCase):
+    """
+    The columnar store must follow inserts and evict within its budget
+    """
+
+    def readings(self, city, count, start):
+        return [
+            {
+                'city': city, 'country': 'GB', 'temperature': float(i), 'feels_like': 2.0 * i,
+                'humidity': 50, 'fetched_at': start + datetime.timedelta(hours=i),
+            }
+            for i in range(count)
+        ]
+
+    def test_analytics(self):
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        store_weather_readings(self.readings('London', 100, start))
+        store = ColumnarStore(memory_bytes=10 ** 6, reload_seconds=3600)
+
+        result = analyze(store.get('London'), ['temperature', 'feels_like', 'humidity'], window_hours=4, points=2)
+        self.assertEqual(result['count'], 100)
+        self.assertEqual(result['metrics']['temperature']['percentiles']['p50'], 49.5)
+        self.assertEqual(result['correlations'], {
+            'temperature:feels_like': 1.0, 'temperature:humidity': None, 'feels_like:humidity': None,
+        })
+        self.assertEqual([point['temperature'] for point in result['moving_average']], [0.0, 97.5])
+
+        # Rows stored after the load are appended, back-filled ones sorted in
+        WeatherData.objects.create(city='London', country='GB', temperature=-50.0,
+                                   fetched_at=start - datetime.timedelta(days=1))
+        result = analyze(store.get('London'), ['temperature'], end=start)
+        self.assertEqual((result['count'], result['metrics']['temperature']['min']), (1, -50.0))
+
+        store.memory_bytes = 1
+        store_weather_readings(self.readings('Leeds', 10, start))
+        store.get('Leeds')
+        self.assertEqual(list(store._cities), ['Leeds'])
+
+        # Unknown cities are answered but not kept
+        self.assertEqual(analyze(store.get('Atlantis'), ['temperature'])['count'], 0)
+        self.assertEqual(list(store._cities), ['Leeds'])
 
-# Create your tests here.
+    def test_window_must_be_finite(self):
+        for window in ('nan', 'inf', '-1'):
+            response = self.client.get('/api/external/weather/analytics/', {'city': 'London', 'window': window})
+            self.assertEqual(response.status_code, 400, window)
+            self.assertIn('window', response.json())
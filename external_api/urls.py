@@ -7,6 +7,12 @@ urlpatterns = [
     path('weather/', views.WeatherDataListView.as_view(), name='weather-list'),
     path('weather/<int:pk>/', views.WeatherDataDetailView.as_view(), name='weather-detail'),
     path('weather/fetch/', views.fetch_weather_data, name='fetch-weather'),
+    path('weather/fetch/batch/', views.fetch_weather_batch, name='fetch-weather-batch'),
     path('weather/latest/', views.get_latest_weather, name='latest-weather'),
     path('weather/stats/', views.weather_statistics, name='weather-stats'),
+    path('weather/rollups/', views.WeatherRollupListView.as_view(), name='weather-rollups'),
+    path('weather/analytics/', views.weather_analytics, name='weather-analytics'),
+    path('weather/cache/', views.weather_cache_stats, name='weather-cache-stats'),
+    path('weather/breaker/', views.weather_breaker_state, name='weather-breaker-state'),
+    path('weather/export/', views.export_weather_data, name='weather-export'),
 ]
\ No newline at end of file
@@ -1,18 +1,71 @@
+import math
+
 from rest_framework import generics, status
+from rest_framework.filters import OrderingFilter
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.conf import settings
 from django.shortcuts import render
-from django.db import models
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
+from datanexus.breaker import CircuitOpenError
+from datanexus.conditional import conditional_get, get_conditional_state, table_state
+from datanexus.export import export_response
+from datanexus.fastpath import FastListMixin
+from datanexus.filters import (
+    QueryParamFilterBackend, parse_end, parse_finite_float, parse_query_filters, parse_start,
+)
+from datanexus.pagination import KeysetPagination
+from .analytics import analytics_available, analyze, get_store
+from .latest import latest_state, latest_weather
 from .models import WeatherData
-from .serializers import WeatherDataSerializer, CityWeatherRequestSerializer
-from .services import get_weather_service
+from .rollups import GRANULARITIES
+from .stats import filtered_stats, read_stats
+from .serializers import (
+    WeatherDataSerializer, CityWeatherRequestSerializer, WeatherLocationSerializer,
+    WeatherRollupSerializer, WeatherAnalyticsQuerySerializer,
+)
+from .services import (
+    fetch_locations, get_cache_stats, get_weather_service, record_city_weather,
+    store_weather_readings, upstream_breaker,
+)
+
+def weather_list_state(request, *args, **kwargs):
+    return table_state(WeatherData.objects.all(), 'fetched_at')
+
+def latest_weather_state(request, *args, **kwargs):
+    return latest_state()
+
+def weather_detail_state(request, pk, *args, **kwargs):
+    fetched_at = WeatherData.objects.filter(pk=pk).values_list('fetched_at', flat=True).first()
+    return (fetched_at, pk) if fetched_at else None
 
-class WeatherDataListView(generics.ListAPIView):
+class WeatherDataListView(FastListMixin, generics.ListAPIView):
     """
     List all weather data records
+
+    Filter with ``city``, ``country``, ``start``/``end`` (on ``fetched_at``)
+    and ``min_temperature``/``max_temperature``; reorder with ``ordering``
+    (``fetched_at`` or ``temperature``, ``-`` for descending).
     """
     queryset = WeatherData.objects.all()
     serializer_class = WeatherDataSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilterBackend, OrderingFilter]
+    query_filters = {
+        'city': ('city', str),
+        'country': ('country', str),
+        'start': ('fetched_at__gte', parse_start),
+        'end': ('fetched_at__lt', parse_end),
+        'min_temperature': ('temperature__gte', parse_finite_float),
+        'max_temperature': ('temperature__lte', parse_finite_float),
+    }
+    ordering_fields = ['fetched_at', 'temperature']
+
+    @method_decorator(conditional_get(weather_list_state))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 class WeatherDataDetailView(generics.RetrieveAPIView):
     """
@@ -21,6 +74,33 @@ class WeatherDataDetailView(generics.RetrieveAPIView):
     queryset = WeatherData.objects.all()
     serializer_class = WeatherDataSerializer
 
+    @method_decorator(conditional_get(weather_detail_state))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class WeatherRollupListView(generics.ListAPIView):
+    """
+    Hourly or daily weather aggregates per city, oldest period first
+
+    ``granularity`` is ``hour`` or ``day`` (the default). Filter with
+    ``city``, ``country`` and ``start``/``end`` (on ``period_start``).
+    """
+    serializer_class = WeatherRollupSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilterBackend]
+    query_filters = {
+        'city': ('city', str),
+        'country': ('country', str),
+        'start': ('period_start__gte', parse_start),
+        'end': ('period_start__lt', parse_end),
+    }
+
+    def get_queryset(self):
+        granularity = self.request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': [f'Must be one of: {", ".join(GRANULARITIES)}']})
+        return GRANULARITIES[granularity].objects.all()
+
 @api_view(['POST'])
 def fetch_weather_data(request):
     """
@@ -32,12 +112,30 @@ def fetch_weather_data(request):
         city = serializer.validated_data['city']
         country = serializer.validated_data.get('country')
         
-        weather_service = get_weather_service()
-        weather_data = weather_service.get_weather_by_city(city, country)
+        # Fetch and save to database; concurrent requests for the same
+        # city share one upstream call and one record
+        try:
+            weather_record, created, stale = record_city_weather(city, country)
+        except CircuitOpenError as e:
+            return Response({
+                'error': 'Weather service unavailable'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+               headers={'Retry-After': str(math.ceil(e.retry_after))})
         
-        if weather_data:
-            # Save to database
-            weather_record = WeatherData.objects.create(**weather_data)
+        if weather_record and stale:
+            # Upstream is down: the last stored reading, flagged as stale
+            return Response({
+                'message': 'Weather service unavailable, returning the last stored reading',
+                'stale': True,
+                'data': WeatherDataSerializer(weather_record).data
+            }, status=status.HTTP_200_OK)
+        elif weather_record and not created:
+            # Same reading as the one already stored (e.g. served from the cache)
+            return Response({
+                'message': 'Weather data is unchanged since it was last saved',
+                'data': WeatherDataSerializer(weather_record).data
+            }, status=status.HTTP_200_OK)
+        elif weather_record:
             response_serializer = WeatherDataSerializer(weather_record)
             
             return Response({
@@ -51,47 +149,148 @@ def fetch_weather_data(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+def fetch_weather_batch(request):
+    """
+    Fetch weather for many cities and/or coordinates at once
+
+    Body: ``{"locations": [{"city": "Paris", "country": "FR"}, {"lat": 51.5, "lon": -0.1}]}``
+    (or the bare list). Upstream calls run concurrently, up to
+    ``WEATHER_BATCH_CONCURRENCY`` at a time, and every successful reading
+    is stored with a single ``bulk_create``.
+    """
+    locations = request.data.get('locations') if isinstance(request.data, dict) else request.data
+    if not isinstance(locations, list) or not locations:
+        return Response({
+            'error': 'Expected a non-empty list of locations'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(locations) > settings.WEATHER_BATCH_MAX_LOCATIONS:
+        return Response({
+            'error': f'At most {settings.WEATHER_BATCH_MAX_LOCATIONS} locations per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = WeatherLocationSerializer(data=locations, many=True)
+    if not serializer.is_valid():
+        return Response({
+            'errors': [
+                {'index': index, 'errors': errors}
+                for index, errors in enumerate(serializer.errors) if errors
+            ]
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    locations = serializer.validated_data
+    readings = fetch_locations(
+        get_weather_service(), locations, settings.WEATHER_BATCH_CONCURRENCY
+    )
+    
+    fetched = [(index, data) for index, data in enumerate(readings) if data]
+    failures = [
+        {'index': index, 'location': locations[index], 'error': 'Failed to fetch weather data'}
+        for index, data in enumerate(readings) if not data
+    ]
+    
+    records, created = store_weather_readings([data for _, data in fetched])
+    
+    results = [
+        {'index': index, 'data': data}
+        for (index, _), data in zip(fetched, WeatherDataSerializer(records, many=True).data)
+    ]
+    if created:
+        response_status = status.HTTP_201_CREATED
+    else:
+        # Nothing new: every reading was already stored, or every fetch failed
+        response_status = status.HTTP_200_OK if records else status.HTTP_400_BAD_REQUEST
+    return Response({
+        'created': created,
+        'results': results,
+        'failures': failures,
+    }, status=response_status)
+
 @api_view(['GET'])
+@conditional_get(latest_weather_state)
 def get_latest_weather(request):
     """
     Get the latest weather data for each city
     """
-    # Get the latest record for each unique city
-    latest_weather = WeatherData.objects.order_by('city', '-fetched_at').distinct('city')
-    serializer = WeatherDataSerializer(latest_weather, many=True)
+    data = latest_weather(get_conditional_state(request))
     
     return Response({
-        'count': len(serializer.data),
-        'data': serializer.data
+        'count': len(data),
+        'data': data
     })
 
+# The list's parsers, keyed by ``filtered_stats`` argument
+STATS_QUERY_FILTERS = {
+    param: (param, WeatherDataListView.query_filters[param][1])
+    for param in ('city', 'country', 'start', 'end')
+}
+
 @api_view(['GET'])
 def weather_statistics(request):
     """
     Get basic weather statistics
+
+    Unfiltered statistics come from running totals in constant time. Narrow
+    them with ``city``, ``country`` and ``start``/``end`` (on ``fetched_at``),
+    validated like the list filters.
+    """
+    filters = parse_query_filters(request.query_params, STATS_QUERY_FILTERS)
+    return Response(filtered_stats(**filters) if filters else read_stats())
+
+@api_view(['GET'])
+def weather_cache_stats(request):
+    """
+    Hit/miss counters of the upstream weather cache (this worker process only)
+    """
+    return Response(get_cache_stats())
+
+@api_view(['GET'])
+def weather_breaker_state(request):
+    """
+    State, counters and recent transitions of the OpenWeather circuit breaker
+    (this worker process only)
+    """
+    return Response(upstream_breaker.metrics())
+
+@api_view(['GET'])
+def weather_analytics(request):
+    """
+    Percentiles, correlations and a moving average of a city's readings
+
+    Computed with NumPy from this worker's in-memory columns; narrow with
+    ``start``/``end`` and choose ``metrics``, ``percentiles``, the moving
+    average ``window`` (hours) and its number of ``points``.
     """
-    total_records = WeatherData.objects.count()
-    unique_cities = WeatherData.objects.values('city').distinct().count()
+    if not analytics_available():
+        return Response({
+            'error': 'Weather analytics need NumPy'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
-    if total_records > 0:
-        avg_temp = WeatherData.objects.aggregate(
-            avg_temp=models.Avg('temperature')
-        )['avg_temp']
-        
-        max_temp = WeatherData.objects.aggregate(
-            max_temp=models.Max('temperature')
-        )['max_temp']
-        
-        min_temp = WeatherData.objects.aggregate(
-            min_temp=models.Min('temperature')
-        )['min_temp']
-    else:
-        avg_temp = max_temp = min_temp = None
+    serializer = WeatherAnalyticsQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response({
-        'total_records': total_records,
-        'unique_cities': unique_cities,
-        'average_temperature': round(avg_temp, 2) if avg_temp else None,
-        'max_temperature': max_temp,
-        'min_temperature': min_temp
-    })
+    query = serializer.validated_data
+    return Response(analyze(
+        get_store().get(query['city']), query['metrics'],
+        start=query.get('start'), end=query.get('end'), percentiles=query['percentiles'],
+        window_hours=query['window'], points=query['points'],
+    ))
+
+@require_GET
+def export_weather_data(request):
+    """
+    Stream weather history as CSV or NDJSON
+
+    Query params: ``format`` (csv|ndjson), ``gzip``, ``start``/``end`` on
+    ``fetched_at``, ``city`` and ``country``.
+    """
+    return export_response(
+        request,
+        WeatherData.objects.all(),
+        fields=[field.attname for field in WeatherData._meta.concrete_fields],
+        name='weather',
+        time_field='fetched_at',
+        filter_fields=('city', 'country'),
+    )